@@ -1,106 +1,158 @@
 # --- IMPORTS ---
-import sqlite3
-import matplotlib.pyplot as plt
 from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from constants import table_names
-from util import get_people, add_debt, get_items, add_item, show_person_options, show_item_options, add_household_need, show_unresolved_debts, delete_debt, show_needs_to_be_purchased, set_need_as_purchased, get_total_owed_per_person, get_household_needs
+from database import get_connection
+from migrations import migrate
+from money import Dollars, Money
+from util import check_date, get_people, add_debt, add_split_expense, get_items, add_item, show_person_options, show_item_options, add_household_need, show_unresolved_debts, settle_debt, show_needs_to_be_purchased, set_need_as_purchased, get_total_owed_per_person, get_household_needs, apply_settlement_plan, get_monthly_spending, get_budget_vs_actual, get_unresolved_debts_page
+from settlement import get_net_balances, plan_settlement, split_amount
+from item_catalog import item_exists, find_items
+from search import search_items, search_people, search_needs, find_similar_items
 
 
 # --- Database Operations ---
 def initialise_database() -> None:
     """
     Initialising the SQLite database to store all sharehouse needs.
+    The tables and indexes themselves live in migrations.py; this only runs the ones the database hasn't seen yet.
     
-    Time complexity: O(n) where n is the number of tables created
+    Time complexity: O(1) when the schema is already current, otherwise O(s) where s is the number of pending migration statements
     Space complexity: O(1) as there isn't really anything in the tables...yet!
     """
+    with get_connection() as conn:  # creates the file if it does not exist yet
+        migrate(conn)
 
-    conn = sqlite3.connect("sharehouse.db")  # create file
-    cursor = conn.cursor()      # intermediary between python and the sqlite database
-
-    ####### CREATING TABLES ########
-    # table to identify people
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS People (
-        person_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        first_name TEXT NOT NULL,
-        last_name TEXT NOT NULL,
-        allergies TEXT,
-        misc_info TEXT
-    );
-    """)
-
-    # table for total amount of money owed. this may not be necessary so temporarily keeping this here
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS OwedMoney (
-        person_id INTEGER NOT NULL,
-        total_owed REAL DEFAULT 0,
-        FOREIGN KEY (person_id) REFERENCES People(person_id)
-    );
-    """)
-
-    # table of owed money where you can see transactions happening
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS OriginOfOwedMoney (
-        origin_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        item_id INTEGER NOT NULL,
-        purchase_date TEXT,
-        purchased_by INTEGER NOT NULL,
-        FOREIGN KEY (purchased_by) REFERENCES People(person_id)
-    );
-    """)
-
-    # table of items that are purchased_state
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Items (
-        item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        item_name TEXT NOT NULL,
-        default_cost REAL
-    );
-    """)
-
-    # table to directly view who owes what to who
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS DebtMapping (
-        origin_id INTEGER NOT NULL,
-        owed_by INTEGER NOT NULL,
-        owed_to INTEGER NOT NULL,
-        amount REAL NOT NULL,
-        FOREIGN KEY (origin_id) REFERENCES OriginOfOwedMoney(origin_id),
-        FOREIGN KEY (owed_by) REFERENCES People(person_id),
-        FOREIGN KEY (owed_to) REFERENCES People(person_id)
-    );
-    """)
-
-    # table for what is needed in the household
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS HouseholdNeeds (
-        need_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        item_id INTEGER NOT NULL,
-        budget REAL NOT NULL,
-        purchased_by INTEGER,
-        purchase_date TEXT,
-        is_purchased INTEGER DEFAULT 0,
-        FOREIGN KEY (item_id) REFERENCES Items(item_id),
-        FOREIGN KEY (purchased_by) REFERENCES People(person_id)
-    );
-    """)
-
-    # the passwords table...don't leak this
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Passwords (
-        password_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        password_name TEXT NOT NULL,
-        password_value TEXT NOT NULL,
-        person_id INTEGER,
-        FOREIGN KEY (person_id) REFERENCES People(person_id)
-    );
-    """)
-
-    conn.commit()
-    conn.close()
+######################### FUNCTIONS THAT DON'T PROMPT ##############################
+# the menu below and the command line (commands.py) both go through these, so nothing here calls input() or print()
+
+def find_or_add_item(item: str, cost: Optional[Dollars] = None) -> int:
+    """
+    Works out which item is meant without asking. An item's number is used as is, a name matching an existing item
+    (ignoring case) gives that item, and any other name is added as a new item.
+
+    Args:
+        item (str): an item's number or name
+        cost (Money or dollars, optional): default cost for the item if it has to be added
+
+    Raises:
+        ValueError: if a number is given that isn't an item
+
+    Time complexity: O(log m + k) where m is the number of items and k is the number of name matches
+    """
+    item = item.strip()
+    if item.isdigit():
+        if not item_exists(int(item)):
+            raise ValueError(f"There is no item number {item}.")
+        return int(item)
+
+    for match in find_items(item):
+        if match["item_name"].lower() == item.lower():
+            return match["item_id"]
+    return add_item(item, cost or Money(0))
+
+def record_debt(owed_by: int, owed_to: int, item_id: int, amount: Dollars, purchase_date: str) -> int:
+    """
+    Logs that owed_by owes owed_to the amount for an item.
+
+    Returns:
+        int: the new debt's number
+
+    Raises:
+        ValueError: if someone would owe themselves, the amount isn't positive or the date isn't YYYY-MM-DD
+
+    Time complexity: O(1)
+    """
+    if owed_by == owed_to:
+        raise ValueError("Someone can't owe money to themselves.")
+    amount = Money.from_dollars(amount)
+    if amount <= 0:
+        raise ValueError("The amount owed has to be more than 0.")
+    return add_debt(owed_to, item_id, owed_by, owed_to, amount, check_date(purchase_date))
+
+def record_split_expense(paid_by: int, item_id: int, amount: Dollars, purchase_date: str, shares: Union[Sequence[int], Dict[int, Dollars]], method: str = "equal") -> Dict[str, object]:
+    """
+    Logs a purchase paid_by made that several people share, so each of them owes paid_by their part.
+
+    Returns:
+        dict: the new debt's number, and how much each person's share came to
+
+    Raises:
+        ValueError: if nobody other than the payer shares it, the shares don't work out (see settlement.split_amount)
+            or the date isn't YYYY-MM-DD
+
+    Time complexity: O(p log p) where p is the number of people sharing it
+    """
+    if not any(person != paid_by for person in shares):
+        raise ValueError("Split it with at least one person other than whoever paid.")
+    debt_id = add_split_expense(item_id, paid_by, amount, check_date(purchase_date), shares, method)
+    return {"debt_id": debt_id, "shares": split_amount(amount, shares, method)}
+
+def record_household_need(item_id: int, budget: Dollars, assigned_to: Optional[int] = None, purchase_date: Optional[str] = None, is_purchased: int = 0) -> int:
+    """
+    Adds something the sharehouse needs.
+
+    Returns:
+        int: the new need's number
+
+    Raises:
+        ValueError: if a purchase date is given that isn't YYYY-MM-DD
+
+    Time complexity: O(1)
+    """
+    return add_household_need(item_id, budget, assigned_to, check_date(purchase_date, required=False), is_purchased)
+
+def describe_settlement(plan: List[Tuple[int, int, int]]) -> List[Dict[str, Union[int, str, Money]]]:
+    """
+    Puts names and dollar amounts to the transfers in a settlement plan.
+
+    Time complexity: O(n + t) where n is the number of people and t the number of transfers
+    """
+    names = {person["person_id"]: person["full_name"] for person in get_people()}
+    return [{"payer_id": payer, "payer": names.get(payer, str(payer)), "payee_id": payee, "payee": names.get(payee, str(payee)),
+             "amount": Money(cents)} for payer, payee, cents in plan]
+
+def settle(apply: bool = False) -> Dict[str, object]:
+    """
+    Works out the fewest transfers that settle every unresolved debt, and if apply is set, marks everything as settled
+    (even when the debts cancel each other out and there are no transfers).
+
+    Returns:
+        dict: the transfers, and how many debts were settled (0 unless applied)
+
+    Time complexity: O(b + n log n + d) where b is the number of owing pairs, n the number of people and d the number of debts
+    """
+    plan = plan_settlement(get_net_balances())
+    settled = apply_settlement_plan(plan) if apply else 0
+    return {"transfers": describe_settlement(plan), "settled": settled}
+
+def household_report() -> Dict[str, List[Dict[str, Union[str, Money]]]]:
+    """
+    Everything visualise_household_data shows: the total each person owes, the unpurchased and purchased needs,
+    and what was budgeted and spent each month.
+
+    Time complexity: O(n+h+s) where n is the total number of people, h is the total number of household needs items
+        and s the number of MonthlySpending rows
+    """
+    return {
+        "total_owed": [{"name": name, "amount": amount} for name, amount in get_total_owed_per_person()],
+        "unpurchased_needs": [{"item": item, "budget": budget} for item, budget in get_household_needs(is_purchased=0)],
+        "purchased_needs": [{"item": item, "budget": budget} for item, budget in get_household_needs(is_purchased=1)],
+        "monthly": [{"month": month, "budgeted": budgeted, "spent": spent} for month, budgeted, spent in get_budget_vs_actual()],
+    }
 
 ######################### FUNCTIONS THE USER CALLS UPON ##############################
+def input_date(prompt: str, required: bool = True) -> Optional[str]:
+    """
+    Asks for a YYYY-MM-DD date until a real one is given (or nothing, if it isn't required).
+
+    Time complexity: O(1) per attempt
+    """
+    while True:
+        try:
+            return check_date(input(prompt), required)
+        except ValueError as error:
+            print(error)
 
 def input_debt() -> None:
     """
@@ -113,17 +165,50 @@ def input_debt() -> None:
 
     show_person_options()
     person_id = int(input("Enter the person ID who owes money: "))
-    amount = float(input("How much do they owe? "))
+    amount = Money.from_dollars(input("How much do they owe? "))
     show_item_options()
-    item_try = input("If none, type a random number not in the list. ")
-    item_id = add_new_item(int(item_try))
+    item_try = input("Enter the item's number, or type its name to search for it or add it. ")
+    item_id = add_new_item(item_try)
     show_person_options()
     owed_to_id = int(input("Who do they owe it to (enter person ID)? "))
-    date = input("What is the date (YYYY-MM-DD)? ")
+    date = input_date("What is the date (YYYY-MM-DD)? ")
 
-    add_debt(item_id, person_id, owed_to_id, amount, date)
+    record_debt(person_id, owed_to_id, item_id, amount, date)
     print("Debt has been successfully logged.")
 
+def input_split_expense() -> None:
+    """
+    Prompts for a purchase shared between several people and how to split it, then logs what everyone owes whoever paid.
+
+    Time complexity: O(n+m) where n is the number of people and m is the number of items, from the option listings
+    """
+    print("\nSplit an Expense")
+    show_person_options()
+    paid_by = int(input("Enter the person ID who paid: "))
+    amount = Money.from_dollars(input("How much was it altogether? "))
+    show_item_options()
+    item_try = input("Enter the item's number, or type its name to search for it or add it. ")
+    item_id = add_new_item(item_try)
+    date = input_date("What is the date (YYYY-MM-DD)? ")
+    method = input("How should it be split? Enter equal, weighted, percentage or exact (blank for equal): ").strip().lower() or "equal"
+
+    show_person_options()
+    if method == "equal":
+        entries = input("Enter the IDs of everyone sharing it, separated by commas (include whoever paid if they share it too): ")
+        shares = [int(entry) for entry in entries.split(",") if entry.strip()]
+    else:
+        entries = input("Enter everyone's ID and share as ID=share, separated by commas (e.g. 1=2, 3=1): ")
+        shares = {int(person): share.strip() for person, share in (entry.split("=") for entry in entries.split(",") if entry.strip())}
+
+    try:
+        result = record_split_expense(paid_by, item_id, amount, date, shares, method)
+    except ValueError as error:
+        print(error)
+        return
+    for person, share in result["shares"].items():
+        print(f"  person {person}: ${share:.2f}" + (" (paid)" if person == paid_by else ""))
+    print(f"Expense has been successfully split (debt number {result['debt_id']}).")
+
 def input_sharehouse_needs() -> None:
     """
     Prompts user to input what the sharehouse requires with the item and the cost, and stores that into the database for later referral.
@@ -134,15 +219,15 @@ def input_sharehouse_needs() -> None:
     
     print("\nInput Sharehouse Needs")
     show_item_options()
-    item_try = input("What is the item? Enter the associated number. ")
-    item_id = add_new_item(int(item_try))
-    budget = float(input("What is the approximate cost/budget for the household item? "))
+    item_try = input("What is the item? Enter the associated number, or type its name to search for it or add it. ")
+    item_id = add_new_item(item_try)
+    budget = Money.from_dollars(input("What is the approximate cost/budget for the household item? "))
     assigned_try = input("Are you assigning it to anyone? Enter 'N' if not. ")
-    assigned_person_id = assigned_try if assigned_try.upper() != "N" else 0
-    purchase_date = input("What is the desired purchase date (YYYY-MM-DD)? ")
+    assigned_person_id = int(assigned_try) if assigned_try.upper() != "N" else None
+    purchase_date = input_date("What is the desired purchase date (YYYY-MM-DD, or leave it blank)? ", required=False)
     purchased_state = int(input("Has it been purchased yet? Enter 0 for no, and 1 for yes. "))
 
-    add_household_need(int(item_id), float(budget), int(assigned_person_id), purchase_date, int(purchased_state)) 
+    record_household_need(int(item_id), budget, assigned_person_id, purchase_date, int(purchased_state))
 
     print("Sharehouse need has been successfully added.")
 
@@ -156,10 +241,12 @@ def confirm_debt_payment() -> None:
     print("\nConfirm Debt Payment")
     show_unresolved_debts()
     debt_id = input("Input the associated number to the debt. ")
+    person_try = input("If only one person's share of a split purchase was paid, enter their person ID. Otherwise press enter. ").strip()
 
-    delete_debt(int(debt_id))
-
-    print("Debt payment confirmed.")
+    if settle_debt(int(debt_id), int(person_try) if person_try else None):
+        print("Debt payment confirmed.")
+    else:
+        print("There's no open debt with that number. It may already have been settled, maybe by someone else.")
 
 def confirm_houseneed_payment() -> None:
     """
@@ -172,9 +259,39 @@ def confirm_houseneed_payment() -> None:
     show_needs_to_be_purchased()
     needs_id = input("What is the number of the associated need that has been purchased? ")
 
-    set_need_as_purchased(needs_id)
+    if set_need_as_purchased(int(needs_id)):
+        print("Sharehouse need payment confirmed.")
+    else:
+        print("There's no unpurchased need with that number. It may already have been bought, maybe by someone else.")
 
-    print("Sharehouse need payment confirmed.")
+def settle_debts() -> None:
+    """
+    Works out the fewest transfers that settle every unresolved debt, shows them, and marks everything as settled once confirmed.
+
+    Time complexity: O(b + n log n) where b is the number of pairs of people with a debt between them and n is the number of people
+        Netting reads every pair once, and planning uses two heaps over the people with a balance.
+    """
+    print("\nSettle All Debts")
+    plan = plan_settlement(get_net_balances())
+
+    if not plan:
+        if not get_unresolved_debts_page(0, 1):
+            print("Everyone is square, there is nothing to settle.")
+            return
+        # the open debts cancel each other out, so they can be settled without anyone paying anything
+        print("The unresolved debts cancel each other out, so no money needs to change hands.")
+        confirm = input("Enter 'Y' to settle every debt. ").strip()
+    else:
+        print(f"Everything can be settled with {len(plan)} transfer(s):")
+        for transfer in describe_settlement(plan):
+            print(f"{transfer['payer']} pays {transfer['payee']} ${transfer['amount']:.2f}")
+        confirm = input("Have all of these been paid? Enter 'Y' to settle every debt. ").strip()
+    if confirm.upper() != "Y":
+        print("Nothing has been settled.")
+        return
+
+    settled = apply_settlement_plan(plan)
+    print(f"{settled} debt(s) settled.")
 
 def visualise_household_data() -> None:
     """
@@ -182,10 +299,17 @@ def visualise_household_data() -> None:
         - A bar chart for the total amount owed by each person.
         - A table for unpurchased household needs.
         - A table for purchased household needs.
+        - A line chart of spending over time.
+        - A bar chart of budget against actual spending per month.
 
-    Time complexity: O(n+h) where n is the total number of people and h is the total number of household needs items
+    Time complexity: O(n+h+s) where n is the total number of people, h is the total number of household needs items
+        and s the number of MonthlySpending rows
 
     """
+    # imported here rather than at the top since matplotlib takes most of a second to import,
+    # and nothing else in the menu needs it
+    from visualise import plot_total_owed, display_needs_table, plot_spending_over_time, plot_budget_vs_actual
+
     # total owed per person graph (bar graph)
     total_owed = get_total_owed_per_person()
     plot_total_owed(total_owed)
@@ -198,81 +322,70 @@ def visualise_household_data() -> None:
     purchased_needs = get_household_needs(is_purchased=1)
     display_needs_table(purchased_needs, "Purchased Household Needs")
 
+    # spending charts, read from the monthly rollup rather than every debt
+    plot_spending_over_time(get_monthly_spending())
+    plot_budget_vs_actual(get_budget_vs_actual())
 
-######################## HELPER FUNCTIONS ##############################
+def search_household() -> None:
+    """
+    Asks what to look for and shows the items, people and unpurchased household needs that match, with their numbers,
+    so they can be picked without paging through everything.
 
-def add_new_item(item_try: int) -> int:
+    Time complexity: O(k log k) where k is the number of matches, found through the search indexes (see search.py)
     """
-    Adds new item to the item list if it does not exist and returns the new item's id. Otherwise, returns current item id choice
+    print("\nSearch")
+    show_search_results(input("What are you looking for (any part of a name, or someone's notes)? "))
 
-    Args: 
-        item_try (int): the initial input of the item id that the user submitted
 
-    Time complexity: O(m) where m is the number of items in the database.
-    """
-    items = get_items()
-    item = item_try
-    print(items[-1]['item_id'])
-    if item > int(items[-1]['item_id']):
-        item_name = input("What is the name of the item? ")
-        item_cost = input("What is the cost of the item? ")
-        add_item(item_name, item_cost)
-        item = int(items[-1]['item_id']) + 1 # due to auto incrementing, the latest item added will just be the last item's id + 1
-    return item
+######################## HELPER FUNCTIONS ##############################
 
-def plot_total_owed(total_owed: list[tuple[str, float]]) -> None:
+def show_search_results(text: str) -> None:
     """
-    A bar chart for the total amount owed by each person in the sharehouse
+    Prints the items, people and unpurchased household needs matching some text.
 
-    Args:
-        total_owed (list[tuple[str, float]]): A list of tuples containing person's full name and amount owed.
-    
-    Time complexity: O(n) where n is the number of total people in the sharehouse
+    Time complexity: O(k log k) where k is the number of matches
+    """
+    results = {
+        "Items": [f"{item_id}: {item_name}" for item_id, item_name, _ in search_items(text)],
+        "People": [f"{person_id}: {full_name}" + (f" ({misc_info})" if misc_info else "") for person_id, full_name, misc_info in search_people(text)],
+        "Needs to be purchased": [f"{need_id}: {item_name} (${budget:.2f})" for need_id, item_name, budget in search_needs(text)],
+    }
+    for title, lines in results.items():
+        print(f"{title}:")
+        for line in lines or ["nothing found"]:
+            print(f"  {line}")
+
+def add_new_item(item_try: str) -> int:
     """
-    names = [entry[0] for entry in total_owed]
-    amounts = [entry[1] for entry in total_owed]
+    Works out which item the user meant and returns its id. They can type an existing item's number, or part of its name
+    to search for it. If nothing matches, the item is added and the new item's id is returned.
 
-    plt.figure(figsize=(8, 6))
-    plt.bar(names, amounts, color='skyblue')
-    plt.title('Total Amount Owed by Each Person')
-    plt.xlabel('Person')
-    plt.ylabel('Total Owed ($)')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.show()
+    Args: 
+        item_try (str): what the user typed when asked for the item
 
-def display_needs_table(needs: list[tuple[str, float]], title: str) -> None:
+    Time complexity: O(k log k) where k is the number of items sharing part of the name, found through the search index
+        rather than by loading every item (see search.py)
     """
-    Displays a table for household needs and specifically household needs.
-
-    Args:
-        needs (list[tuple[str, float]]): A list of tuples containing item names and their budgets.
-        title (str): Title for the table.
-    
-    Time complexity: O(h) where h is the total number of household needs
-    """
-    # collecting data
-    headers = ["Item Name", "Budget ($)"]
-    table_data = [[entry[0], f"${entry[1]:.2f}"] for entry in needs]
-    total_budget = sum(entry[1] for entry in needs)
-
-    # creating table
-    plt.figure(figsize=(6, len(table_data) + 2))
-    plt.axis("off")  # Remove axes
-    plt.title(title, fontsize=14, weight='bold')
-
-    # adding data to table
-    table = plt.table(
-        cellText=table_data + [["Total", f"${total_budget:.2f}"]],
-        colLabels=headers,
-        loc="center",
-        cellLoc="center",
-        colLoc="center"
-    )
-
-    # formatting 
-    table.auto_set_font_size(False)
-    table.set_fontsize(12)
-    table.auto_set_column_width(col=list(range(len(headers))))
-
-    plt.show()
\ No newline at end of file
+    item_try = item_try.strip()
+    if item_try.isdigit():
+        if item_exists(int(item_try)):
+            return int(item_try)
+        item_name = input("That item doesn't exist yet. What is the name of the item? ").strip()
+    else:
+        item_name = item_try
+
+    # look for something similar before making a new item, so the same thing doesn't end up in the list twice:
+    # names containing what was typed, then names that only look like it ("Toilet papr", "toilet paper 24pk")
+    matches = {item_id: name for item_id, name, _ in search_items(item_name, 10)}
+    for item_id, name, _ in find_similar_items(item_name):
+        matches.setdefault(item_id, name)
+    if matches:
+        print("These items already exist:")
+        for item_id, name in matches.items():
+            print(f"{item_id}: {name}")
+        choice = input(f"Enter the number of one of them, or press Enter to add '{item_name}' as a new item. ").strip()
+        if choice.isdigit() and item_exists(int(choice)):
+            return int(choice)
+
+    item_cost = Money.from_dollars(input("What is the cost of the item? "))
+    return add_item(item_name, item_cost)  # sqlite hands back the id it actually used, even if items were deleted
@@ -0,0 +1,210 @@
+"""
+Async facade over util.py, for embedding the ledger in an asyncio service (a small web front end, say).
+Everything in util.py blocks, so each call is run on a thread and awaited:
+
+    reads   go to a bounded pool of reader threads. database.py gives every thread its own connection, so each worker
+            reads on a connection of its own, and under WAL they all read at once, even while something is being written.
+    writes  go through one writer thread, a queue run in the order they were awaited, each in a transaction of its own.
+            sqlite only ever lets one connection write, so queueing them here means they never wait on each other's
+            locks or fail with "database is locked".
+
+Every call has a timeout. A call that times out or is cancelled is taken off its queue if it hasn't started yet,
+and interrupted (sqlite3's Connection.interrupt) if it has, so an abandoned slow query doesn't hold a thread.
+An interrupted write is rolled back. A write that had already finished its last statement still commits.
+
+Usage:
+    async with AsyncUtil(readers=8) as house:
+        people = await house.get_people()
+        debt_id = await house.add_debt(1, 3, 1, 2, "4.50", "2024-03-01")
+        page = await house.read(util.get_unresolved_debts_page, 0, 50, "milk", timeout=2)
+"""
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+import database
+import util
+from constants import async_readers, async_timeout_seconds
+
+# the util.py functions an AsyncUtil has as awaitable methods, and whether each reads or writes
+read_functions = ("get_people", "get_owed_amounts", "get_debt_details", "get_items", "get_item_cost",
+                  "get_unresolved_debts_with_details", "get_needs_to_be_purchased", "get_total_owed_per_person",
+                  "get_pairwise_balances", "get_household_needs", "get_monthly_spending", "get_budget_vs_actual",
+                  "get_people_page", "get_items_page", "get_unresolved_debts_page", "get_needs_to_be_purchased_page",
+                  "get_debt_version", "get_need_version")
+write_functions = ("add_person", "delete_person", "add_item", "delete_item", "add_debt", "add_split_expense", "delete_debt",
+                   "settle_debt", "archive_settled_debts", "add_household_need", "add_people_bulk", "add_items_bulk",
+                   "add_debts_bulk", "add_household_needs_bulk", "set_need_as_purchased", "apply_settlement_plan")
+
+
+############################ ONE CALL #######################################
+class _Call:
+    """
+    One util.py call on its way through a worker thread. Remembers which connection it is running on,
+    so the event loop's thread can interrupt it.
+    """
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, path: str, write: bool):
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.path = path
+        self.write = write
+        self.conn = None  # set while the call is running
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def run(self):
+        """
+        Runs the call on the worker thread's own connection, in a transaction if it writes.
+
+        Time complexity: whatever the call costs
+        """
+        with database.using_database(self.path):
+            with self.lock:
+                if self.cancelled:  # given up on after a worker picked it up, but before it got this far
+                    raise asyncio.CancelledError()
+                self.conn = database.connect()
+            try:
+                if self.write:
+                    with database.transaction():
+                        return self.func(*self.args, **self.kwargs)
+                return self.func(*self.args, **self.kwargs)
+            finally:
+                with self.lock:
+                    self.conn = None
+
+    def interrupt(self) -> None:
+        """
+        Stops the call: any statement it is running fails with sqlite3.OperationalError, and it won't start if it hasn't.
+
+        Time complexity: O(1)
+        """
+        with self.lock:
+            self.cancelled = True
+            if self.conn is not None:
+                self.conn.interrupt()
+
+
+############################ THE FACADE #######################################
+class AsyncUtil:
+    """
+    Awaitable versions of util.py's functions (see read_functions and write_functions) on one database,
+    plus read() and write() for anything else that takes no more than util.py's functions do.
+    Use it with `async with`, or call close() when done, so the worker threads and their connections are let go of.
+    """
+    def __init__(self, path: Optional[str] = None, readers: int = async_readers, timeout: Optional[float] = async_timeout_seconds):
+        """
+        Args:
+            path (str, optional): the database file. Defaults to the one in use when this is made.
+            readers (int, optional): reader threads, and so the most reads that run at once
+            timeout (float, optional): seconds a call may take (queueing included) before it is cancelled. None for no limit.
+        """
+        if readers < 1:
+            raise ValueError("There has to be at least one reader thread.")
+        self.path = path or database.get_database_path()
+        self.readers = readers
+        self.timeout = timeout
+        self._reader_pool = ThreadPoolExecutor(readers, thread_name_prefix="sharehouse-reader", initializer=self._open_connection)
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="sharehouse-writer", initializer=self._open_connection)
+        self._closed = False
+
+    def _open_connection(self) -> None:
+        """
+        Opens a worker thread's connection as the thread starts, so the first call on it doesn't pay for that.
+
+        Time complexity: O(1)
+        """
+        database.connect(self.path)
+
+    async def _run(self, pool: ThreadPoolExecutor, func: Callable, args: tuple, kwargs: dict, write: bool, timeout: Optional[float]):
+        """
+        Queues a call on a pool and waits for it, cancelling or interrupting it if the wait is given up on.
+
+        Raises:
+            TimeoutError: if it took longer than the timeout
+            RuntimeError: if the facade has been closed
+
+        Time complexity: whatever the call costs
+        """
+        if self._closed:
+            raise RuntimeError("This AsyncUtil has been closed.")
+        call = _Call(func, args, kwargs, self.path, write)
+        future = pool.submit(call.run)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.cancel():
+                call.interrupt()
+            raise TimeoutError(f"{getattr(func, '__name__', 'The call')} took longer than {timeout}s.") from None
+        except asyncio.CancelledError:
+            if not future.cancel():
+                call.interrupt()
+            raise
+
+    async def read(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Runs a function that only reads on a reader thread.
+
+        Args:
+            func (Callable): usually a util.py getter
+            timeout (float, optional): overrides the facade's timeout for this call
+
+        Time complexity: whatever func costs, plus waiting for a free reader
+        """
+        return await self._run(self._reader_pool, func, args, kwargs, False, self.timeout if timeout is None else timeout)
+
+    async def write(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Runs a function that writes on the writer thread, after every write queued before it, in one transaction.
+
+        Args:
+            func (Callable): usually a util.py setter
+            timeout (float, optional): overrides the facade's timeout for this call
+
+        Time complexity: whatever func costs, plus waiting for the writes queued ahead of it
+        """
+        return await self._run(self._writer, func, args, kwargs, True, self.timeout if timeout is None else timeout)
+
+    def __getattr__(self, name: str) -> Callable:
+        if name in read_functions:
+            return partial(self.read, getattr(util, name))
+        if name in write_functions:
+            return partial(self.write, getattr(util, name))
+        raise AttributeError(f"AsyncUtil has no attribute '{name}'")
+
+    def _shut_down(self) -> None:
+        """
+        Waits for every queued call to finish, then closes each worker's connection on its own thread
+        (sqlite connections can only be closed by the thread that made them) and stops the threads.
+
+        Time complexity: O(w) where w is the number of worker threads, once the queued calls are done
+        """
+        for pool, workers in ((self._reader_pool, self.readers), (self._writer, 1)):
+            # every worker has to take exactly one of these, so each waits at the barrier until they all have one
+            barrier = threading.Barrier(workers)
+
+            def close_connection() -> None:
+                barrier.wait()
+                database.close_connection(self.path)
+
+            for _ in range(workers):
+                pool.submit(close_connection)
+            pool.shutdown(wait=True)
+
+    async def close(self) -> None:
+        """
+        Stops taking calls, lets the ones already queued finish, and closes the workers' connections.
+
+        Time complexity: O(w) where w is the number of worker threads, once the queued calls are done
+        """
+        if self._closed:
+            return
+        self._closed = True
+        await asyncio.get_running_loop().run_in_executor(None, self._shut_down)
+
+    async def __aenter__(self) -> "AsyncUtil":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,157 @@
+"""
+Consistency checks for the tables the triggers in migrations.py keep up to date: the balances (OwedMoney and
+PairwiseBalances) and the monthly spending rollup (MonthlySpending). This recomputes them from scratch
+to make sure they haven't drifted, and can rebuild them if they have.
+
+Usage:
+    python balances.py            # report any differences
+    python balances.py --repair   # report and rebuild
+"""
+import sqlite3
+import sys
+
+from typing import Dict, List, Tuple
+from database import get_connection
+
+# MonthlySpending from every purchase (what it cost, by whoever paid) and every bought need with a purchase date.
+# spent and budgeted are checked as if they were two tables, each with its own count
+_spending_sql = {
+    "MonthlySpending.spent": """
+        SELECT strftime('%Y-%m', purchase_date), purchased_by, item_id, SUM(amount_cents), COUNT(*) FROM OriginOfOwedMoney
+        WHERE strftime('%Y-%m', purchase_date) IS NOT NULL AND amount_cents IS NOT NULL
+        GROUP BY 1, 2, 3;
+    """,
+    "MonthlySpending.budgeted": """
+        SELECT strftime('%Y-%m', purchase_date), COALESCE(purchased_by, 0), item_id, SUM(budget_cents), COUNT(*) FROM HouseholdNeeds
+        WHERE strftime('%Y-%m', purchase_date) IS NOT NULL AND is_purchased = 1
+        GROUP BY 1, 2, 3;
+    """,
+}
+
+
+############################ RECOMPUTING #######################################
+def _stored_balances(conn: sqlite3.Connection) -> Dict[str, Dict[tuple, Tuple[int, int]]]:
+    """
+    Reads what the balance and spending tables currently hold.
+
+    Returns:
+        dict: table name -> {key: (total cents, count)}
+
+    Time complexity: O(n+b+s) where n is the number of people who owe money, b the number of owing pairs
+        and s the number of MonthlySpending rows
+    """
+    return {
+        "OwedMoney": {
+            (person_id,): (total, count)
+            for person_id, total, count in conn.execute("SELECT person_id, total_cents, debt_count FROM OwedMoney;")
+        },
+        "PairwiseBalances": {
+            (owed_by, owed_to): (total, count)
+            for owed_by, owed_to, total, count in conn.execute("SELECT owed_by, owed_to, total_cents, debt_count FROM PairwiseBalances;")
+        },
+        "MonthlySpending.spent": {
+            (month, person_id, item_id): (total, count)
+            for month, person_id, item_id, total, count in conn.execute("SELECT month, person_id, item_id, spent_cents, debt_count FROM MonthlySpending WHERE debt_count != 0;")
+        },
+        "MonthlySpending.budgeted": {
+            (month, person_id, item_id): (total, count)
+            for month, person_id, item_id, total, count in conn.execute("SELECT month, person_id, item_id, budgeted_cents, need_count FROM MonthlySpending WHERE need_count != 0;")
+        },
+    }
+
+def _recomputed_balances(conn: sqlite3.Connection) -> Dict[str, Dict[tuple, Tuple[int, int]]]:
+    """
+    Works out what the balance tables should hold by summing every open debt, and the spending table every debt and need.
+
+    Returns:
+        dict: table name -> {key: (total cents, count)}
+
+    Time complexity: O(d+h) where d is the number of debts and h the number of household needs
+    """
+    return {
+        "OwedMoney": {
+            (person_id,): (total, count)
+            for person_id, total, count in conn.execute("SELECT owed_by, SUM(amount_cents), COUNT(*) FROM DebtMapping WHERE settled = 0 GROUP BY owed_by;")
+        },
+        "PairwiseBalances": {
+            (owed_by, owed_to): (total, count)
+            for owed_by, owed_to, total, count in conn.execute("""
+                SELECT owed_by, owed_to, SUM(amount_cents), COUNT(*) FROM DebtMapping WHERE settled = 0 GROUP BY owed_by, owed_to;
+            """)
+        },
+        **{
+            table: {(month, person_id, item_id): (total, count) for month, person_id, item_id, total, count in conn.execute(sql)}
+            for table, sql in _spending_sql.items()
+        },
+    }
+
+
+############################ CHECKING AND REPAIRING #######################################
+def check_balances() -> List[Tuple[str, tuple, Tuple[int, int], Tuple[int, int]]]:
+    """
+    Compares the balance and spending tables against a full recompute from the debts and needs.
+
+    Returns:
+        list of (table name, key, stored (total, count), expected (total, count)) for every row that differs.
+        A missing row shows up as (0, 0). An empty list means everything is consistent.
+
+    Time complexity: O(d+h) where d is the number of debts and h the number of household needs
+    """
+    with get_connection() as conn:
+        stored = _stored_balances(conn)
+        expected = _recomputed_balances(conn)
+
+    differences = []
+    for table in expected:
+        for key in stored[table].keys() | expected[table].keys():
+            stored_total, stored_count = stored[table].get(key, (0, 0))
+            expected_total, expected_count = expected[table].get(key, (0, 0))
+            if (stored_total, stored_count) != (expected_total, expected_count):
+                differences.append((table, key, (stored_total, stored_count), (expected_total, expected_count)))
+    return differences
+
+def rebuild_balances() -> None:
+    """
+    Throws away the balance and spending tables and rebuilds them from the debts and needs in one transaction.
+
+    Time complexity: O(d+h) where d is the number of debts and h the number of household needs
+    """
+    with get_connection() as conn:
+        conn.execute("DELETE FROM OwedMoney;")
+        conn.execute("""
+            INSERT INTO OwedMoney (person_id, total_cents, debt_count)
+            SELECT owed_by, SUM(amount_cents), COUNT(*) FROM DebtMapping WHERE settled = 0 GROUP BY owed_by;
+        """)
+        conn.execute("DELETE FROM PairwiseBalances;")
+        conn.execute("""
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_cents, debt_count)
+            SELECT owed_by, owed_to, SUM(amount_cents), COUNT(*) FROM DebtMapping WHERE settled = 0 GROUP BY owed_by, owed_to;
+        """)
+        conn.execute("DELETE FROM MonthlySpending;")
+        conn.execute(f"""
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            {_spending_sql["MonthlySpending.spent"]}
+        """)
+        conn.execute(f"""
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+            {_spending_sql["MonthlySpending.budgeted"].rstrip().rstrip(";")}
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = excluded.budgeted_cents, need_count = excluded.need_count;
+        """)
+
+
+if __name__ == "__main__":
+    from actions import initialise_database
+
+    initialise_database()
+    differences = check_balances()
+    for table, key, stored, expected in differences:
+        print(f"{table} {key}: stored total {stored[0]} cents over {stored[1]} debts, expected {expected[0]} cents over {expected[1]}")
+
+    if not differences:
+        print("Balances are consistent.")
+    elif "--repair" in sys.argv:
+        rebuild_balances()
+        print(f"Rebuilt balances ({len(differences)} rows were wrong).")
+    else:
+        print(f"{len(differences)} rows differ. Run with --repair to rebuild them.")
+        sys.exit(1)
@@ -0,0 +1,613 @@
+"""
+Benchmarks for the data layer. Run with `python benchmark.py`.
+Uses its own throwaway databases so your real sharehouse.db is never touched.
+
+    python benchmark.py                                   # quick checks: connection reuse, settlement, caching, ...
+    python benchmark.py --suite --sizes small,medium      # time every getter, setter and report at each size
+    python benchmark.py --suite --output new.json --compare old.json
+"""
+import argparse
+import asyncio
+import contextlib
+import inspect
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+os.environ.setdefault("MPLBACKEND", "Agg")  # reports render off-screen instead of opening windows
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import async_util
+import constants
+import database
+import households
+import ledger
+import result_cache
+import search
+import settlement
+import util
+from actions import initialise_database, visualise_household_data
+from generate_data import generate
+from util import add_person, get_people, get_owed_amounts, get_debt_details, get_unresolved_debts_with_details, get_needs_to_be_purchased, get_total_owed_per_person, get_household_needs
+
+
+############################ HELPERS #######################################
+def time_per_call(func: Callable[[], object], calls: int) -> float:
+    """
+    Runs func the given number of times and returns the average time per call in microseconds.
+
+    Time complexity: O(c) where c is the number of calls
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+############################ BENCHMARKS #######################################
+def bench_connection_reuse(calls: int = 2000) -> Dict[str, float]:
+    """
+    Compares opening a fresh connection for every query (how util.py used to work)
+    against reusing the pooled connection from database.py.
+
+    Returns:
+        dict: microseconds per call for each approach, plus the speedup
+
+    Time complexity: O(c) where c is the number of calls
+    """
+    path = database.get_database_path()
+
+    def fresh_connection() -> None:
+        conn = sqlite3.connect(path)
+        conn.execute("SELECT person_id, first_name, last_name FROM People;").fetchall()
+        conn.close()
+
+    fresh = time_per_call(fresh_connection, calls)
+    pooled = time_per_call(inspect.unwrap(get_people), calls)  # unwrapped so the result cache doesn't answer instead
+    return {"fresh_us": fresh, "pooled_us": pooled, "speedup": fresh / pooled}
+
+
+def bench_settlement(people: int = 10_000, debts: int = 1_000_000, seed: int = 0) -> Dict[str, float]:
+    """
+    Times netting and planning a settlement for random debts, without touching the database.
+
+    Returns:
+        dict: seconds spent netting and planning, and the number of transfers in the plan
+
+    Time complexity: O(d + n log n) where d is the number of debts and n the number of people
+    """
+    rng = random.Random(seed)
+    owed_by = [rng.randrange(people) for _ in range(debts)]
+    owed_to = [rng.randrange(people) for _ in range(debts)]
+    cents = [rng.randrange(1, 10_000) for _ in range(debts)]
+
+    start = time.perf_counter()
+    net = settlement.net_debts(owed_by, owed_to, cents)
+    netted = time.perf_counter()
+    plan = settlement.plan_settlement(net)
+    planned = time.perf_counter()
+
+    assert settlement.plan_settles(plan, net)
+    return {"net_seconds": netted - start, "plan_seconds": planned - netted, "transfers": len(plan)}
+
+
+def bench_result_cache(calls: int = 200) -> Dict[str, float]:
+    """
+    Times the getters behind visualise_household_data when every call goes to the database
+    against when the data hasn't changed and result_cache.py answers.
+
+    Returns:
+        dict: microseconds per report for each, the speedup, and the cache hit rate
+
+    Time complexity: O(c) where c is the number of calls
+    """
+    getters = [get_total_owed_per_person, lambda: get_household_needs(0), lambda: get_household_needs(1)]
+
+    def report() -> None:
+        for getter in getters:
+            getter()
+
+    def uncached_report() -> None:
+        result_cache.invalidate_results()
+        report()
+
+    result_cache.reset_cache_stats()
+    uncached = time_per_call(uncached_report, calls)
+    cached = time_per_call(report, calls)
+    return {"uncached_us": uncached, "cached_us": cached, "speedup": uncached / cached,
+            "hit_rate": result_cache.get_cache_stats()["hit_rate"]}
+
+
+def bench_write_modes(writes: int = 500) -> Dict[str, Dict[str, float]]:
+    """
+    Measures add_debt throughput in every durability mode, both committing after each write
+    and grouping all of them into one database.transaction().
+
+    Returns:
+        dict: durability mode -> writes per second for "each_commits" and "one_transaction"
+
+    Time complexity: O(k*w) where k is the number of durability modes and w the number of writes
+    """
+    original_path, original_mode = database.get_database_path(), database.get_durability()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in constants.durability_modes:
+            database.set_durability(mode)
+            database.set_database_path(os.path.join(tmp, f"{mode}.db"))
+            initialise_database()
+            add_person("Writer", "One")
+            add_person("Writer", "Two")
+            util.add_item("Bench item", 1.0)
+
+            each = time_per_call(lambda: util.add_debt(0, 1, 1, 2, 1.0, "2024-01-01"), writes)
+            start = time.perf_counter()
+            with database.transaction():
+                for _ in range(writes):
+                    util.add_debt(0, 1, 1, 2, 1.0, "2024-01-01")
+            grouped = (time.perf_counter() - start) / writes * 1_000_000
+
+            results[mode] = {"each_commits": 1_000_000 / each, "one_transaction": 1_000_000 / grouped}
+            database.close_connection()
+
+    database.set_durability(original_mode)
+    database.set_database_path(original_path)
+    return results
+
+
+def bench_households(shards: int = 300, debts: int = 200, workers: int = 8) -> Dict[str, float]:
+    """
+    Fills hundreds of household databases, then times summing balances across all of them
+    with ATTACH batches against a pool of reader threads.
+
+    Returns:
+        dict: seconds taken by each method, and the number of households
+
+    Time complexity: O(k*d) where k is the number of households and d the debts in each
+    """
+    original_directory = constants.households_directory
+    with tempfile.TemporaryDirectory() as tmp:
+        households.households_directory = tmp
+        names = [f"house-{number:04d}" for number in range(shards)]
+        for number, name in enumerate(names):
+            with households.household(name) as path:
+                generate(people=8, items=20, debts=debts, needs=10, seed=number)
+            database.close_connection(path)
+
+        attached = households.balances_by_attach(names)
+        parallel = households.balances_in_parallel(names, workers)
+        assert attached["total_owed"] == parallel["total_owed"]
+    households.households_directory = original_directory
+    return {"households": shards, "attach_seconds": attached["seconds"], "parallel_seconds": parallel["seconds"]}
+
+
+def bench_ledger(debts: int = 100_000) -> Dict[str, float]:
+    """
+    Compares totalling every debt per person from get_debt_details (one dictionary per debt) with the column
+    snapshot in ledger.py, loaded from the database and opened from a saved file.
+
+    Returns:
+        dict: memory used by each representation, and milliseconds to load and to total from each
+
+    Time complexity: O(d) where d is the number of debts
+    """
+    original_path = database.get_database_path()
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "ledger.db"))
+        generate(people=50, items=500, debts=debts, needs=100)
+
+        start = time.perf_counter()
+        totals: Dict[str, int] = {}
+        for debt in inspect.unwrap(get_debt_details)():
+            totals[debt["owed_by"]] = totals.get(debt["owed_by"], 0) + debt["amount"]
+        dicts_ms = (time.perf_counter() - start) * 1000
+
+        tracemalloc.start()  # measured separately, since tracing slows everything down
+        details = inspect.unwrap(get_debt_details)()
+        dicts_bytes = tracemalloc.get_traced_memory()[0]
+        del details
+        tracemalloc.stop()
+
+        settlement.load_numpy()  # so importing numpy isn't counted in the totalling
+
+        start = time.perf_counter()
+        snapshot = ledger.load_ledger()
+        load_ms = (time.perf_counter() - start) * 1000
+        snapshot_bytes = sum(len(column) * column.itemsize for column in snapshot.columns.values())
+
+        path = os.path.join(tmp, "ledger.snapshot")
+        ledger.save_snapshot(snapshot, path)
+        start = time.perf_counter()
+        opened = ledger.open_snapshot(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        grouped = ledger.group_totals(opened, "owed_by")
+        group_ms = (time.perf_counter() - start) * 1000
+        assert sum(cents for _, cents, _ in grouped) == sum(totals.values())  # names can repeat, so only the sum is compared
+        database.close_connection()
+
+    database.set_database_path(original_path)
+    return {"dicts_mb": dicts_bytes / 1e6, "dicts_ms": dicts_ms, "snapshot_mb": snapshot_bytes / 1e6, "load_ms": load_ms,
+            "open_ms": open_ms, "group_ms": group_ms}
+
+
+def bench_journal(debts: int = 50_000, changes: int = 1000) -> Dict[str, float]:
+    """
+    Times copying a database through its change journal (journal.py): a full replay into an empty database,
+    then an incremental one after `changes` debts are settled, against the whole-file copy an incremental sync replaces,
+    then compacting the journal.
+
+    Returns:
+        dict: milliseconds for each, and how many journal entries compaction removed
+
+    Time complexity: O(d) where d is the number of debts
+    """
+    import journal
+
+    original_path = database.get_database_path()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.db")
+        database.set_database_path(path)
+        generate(people=50, items=500, debts=debts, needs=1000)
+
+        start = time.perf_counter()
+        since = journal.replay_into(os.path.join(tmp, "copy.db"))
+        full = time.perf_counter() - start
+        with database.transaction():
+            for debt_id in range(1, changes + 1):
+                util.settle_debt(debt_id)
+        start = time.perf_counter()
+        journal.replay_into(os.path.join(tmp, "copy.db"), since)
+        incremental = time.perf_counter() - start
+        start = time.perf_counter()
+        with contextlib.closing(sqlite3.connect(os.path.join(tmp, "backup.db"))) as backup:
+            database.connect().backup(backup)
+        whole_file = time.perf_counter() - start
+        start = time.perf_counter()
+        removed = journal.compact_journal()
+        compact = time.perf_counter() - start
+        database.close_connection()
+
+    database.set_database_path(original_path)
+    return {"full_ms": full * 1000, "incremental_ms": incremental * 1000, "whole_file_ms": whole_file * 1000,
+            "compact_ms": compact * 1000, "removed": removed}
+
+def bench_search(items: int = 100_000, calls: int = 200) -> Dict[str, float]:
+    """
+    Times looking things up among `items` items (search.py): a search for part of a name, the near-duplicate
+    check add_new_item runs, and a page of the items list filtered by a search for a common and a rare bit of text,
+    against the LIKE over every name that the filter did before migration 9.
+
+    Returns:
+        dict: milliseconds per call for each
+
+    Time complexity: O(c * k) where c is the number of calls and k the cost of one search
+    """
+    original_path = database.get_database_path()
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "search.db"))
+        generate(people=50, items=items, debts=1000, needs=1000)
+        conn = database.connect()
+        common = conn.execute("SELECT item_name FROM Items ORDER BY item_id LIMIT 1;").fetchone()[0].split()[0].lower()
+        rare = conn.execute("SELECT item_name FROM Items ORDER BY item_id DESC LIMIT 1;").fetchone()[0]
+
+        def like_page(text: str) -> list:
+            return conn.execute("SELECT item_id, item_name, default_cost_cents FROM Items WHERE item_id > 0 AND item_name LIKE ? "
+                                "ORDER BY item_id LIMIT 20;", (f"%{text}%",)).fetchall()
+
+        timings = {
+            "search_ms": time_per_call(lambda: inspect.unwrap(search.search_items)(common, 20), calls),
+            "similar_ms": time_per_call(lambda: inspect.unwrap(search.find_similar_items)(rare[:-1]), calls),
+            "page_common_ms": time_per_call(lambda: inspect.unwrap(util.get_items_page)(0, 20, common), calls),
+            "like_common_ms": time_per_call(lambda: like_page(common), calls),
+            "page_rare_ms": time_per_call(lambda: inspect.unwrap(util.get_items_page)(0, 20, rare), calls),
+            "like_rare_ms": time_per_call(lambda: like_page(rare), calls),
+        }
+        database.close_connection()
+
+    database.set_database_path(original_path)
+    return {name: micros / 1000 for name, micros in timings.items()}
+
+def bench_async(debts: int = 50_000, reads: int = 2000, concurrency: int = 64, reader_counts: Tuple[int, ...] = (1, 2, 4, 8)) -> Dict[int, Dict[str, float]]:
+    """
+    Load test for async_util: `concurrency` coroutines share `reads` page searches over the unresolved debts
+    (past the result cache, so every one reaches sqlite) through an AsyncUtil with each number of reader threads,
+    while another coroutine keeps adding debts through the writer queue.
+
+    Returns:
+        dict: reader threads -> reads and writes per second, and the slowest read in milliseconds
+
+    Time complexity: O(r*d) where r is the number of reads and d the number of debts
+    """
+    search = inspect.unwrap(util.get_unresolved_debts_page)
+    original_path = database.get_database_path()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "async.db")
+        database.set_database_path(path)
+        generate(people=50, items=500, debts=debts, needs=100)
+        database.close_connection()
+
+        async def load_test(readers: int) -> Dict[str, float]:
+            async with async_util.AsyncUtil(path, readers=readers, timeout=None) as house:
+                queue = list(range(reads))
+                slowest = 0.0
+                writes = 0
+                reading = True
+
+                async def reader() -> None:
+                    nonlocal slowest
+                    while queue:
+                        number = queue.pop()
+                        start = time.perf_counter()
+                        await house.read(search, number * 10, 50, "Milk")
+                        slowest = max(slowest, time.perf_counter() - start)
+
+                async def writer() -> None:
+                    nonlocal writes
+                    while reading:
+                        await house.add_debt(1, 1, 1, 2, "1.00", "2024-03-01")
+                        writes += 1
+
+                writing = asyncio.create_task(writer())
+                start = time.perf_counter()
+                await asyncio.gather(*(reader() for _ in range(concurrency)))
+                seconds = time.perf_counter() - start
+                reading = False
+                await writing
+            return {"reads_per_second": reads / seconds, "writes_per_second": writes / seconds, "slowest_ms": slowest * 1000}
+
+        for readers in reader_counts:
+            results[readers] = asyncio.run(load_test(readers))
+
+    database.set_database_path(original_path)
+    return results
+
+
+############################ SUITE #######################################
+# how many rows of each kind the suite generates at each size
+suite_sizes = {
+    "small": {"people": 10, "items": 100, "debts": 1_000, "needs": 200},
+    "medium": {"people": 100, "items": 1_000, "debts": 100_000, "needs": 5_000},
+    "large": {"people": 1_000, "items": 10_000, "debts": 1_000_000, "needs": 50_000},
+}
+
+def measure(func: Callable[[], object], min_seconds: float = 0.2, max_calls: int = 50) -> Dict[str, float]:
+    """
+    Calls func repeatedly (at least once, then until min_seconds have passed or max_calls is reached)
+    with anything it prints thrown away, and summarises how long each call took.
+
+    Returns:
+        dict: number of calls, and the mean/median/min/max milliseconds per call
+
+    Time complexity: O(c) where c is the number of calls made
+    """
+    timings = []
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # e.g. matplotlib complaining show() does nothing off-screen
+        while not timings or (time.perf_counter() - started < min_seconds and len(timings) < max_calls):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "calls": len(timings),
+        "mean_ms": statistics.fmean(timings),
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+    }
+
+def _close_figures() -> None:
+    """
+    Closes every matplotlib figure so reports don't pile up in memory between calls.
+
+    Time complexity: O(f) where f is the number of open figures
+    """
+    import matplotlib.pyplot as plt
+    plt.close("all")
+
+def suite_benchmarks(counts: Dict[str, int]) -> Dict[str, Callable[[], object]]:
+    """
+    Every getter, setter and report to time, ready to call against a database filled with the given counts.
+    Setters are listed after getters so the getters see exactly the generated data.
+    Getters are timed past the result cache, so they measure the queries; the reports go through it, as they would in use.
+
+    Time complexity: O(1)
+    """
+    people, items, needs = counts["people"], counts["items"], counts["needs"]
+    debt_ids = itertools.count(1)
+    need_ids = itertools.count(1)
+    rng = random.Random(1)
+
+    return {
+        # getters
+        "get_people": inspect.unwrap(get_people),
+        "get_items": inspect.unwrap(util.get_items),
+        "get_item_cost": lambda: inspect.unwrap(util.get_item_cost)(rng.randint(1, items)),
+        "get_owed_amounts": inspect.unwrap(get_owed_amounts),
+        "get_total_owed_per_person": inspect.unwrap(get_total_owed_per_person),
+        "get_pairwise_balances": inspect.unwrap(util.get_pairwise_balances),
+        "get_debt_details": inspect.unwrap(get_debt_details),
+        "get_unresolved_debts_with_details": inspect.unwrap(get_unresolved_debts_with_details),
+        "get_needs_to_be_purchased": inspect.unwrap(get_needs_to_be_purchased),
+        "get_household_needs(0)": lambda: inspect.unwrap(get_household_needs)(0),
+        "get_household_needs(1)": lambda: inspect.unwrap(get_household_needs)(1),
+        "get_monthly_spending": inspect.unwrap(util.get_monthly_spending),
+        "get_budget_vs_actual": inspect.unwrap(util.get_budget_vs_actual),
+        "view_database": util.view_database,
+        "search_items": lambda: inspect.unwrap(search.search_items)("pap"),
+        "find_similar_items": lambda: inspect.unwrap(search.find_similar_items)("Toilet papr"),
+        # reports
+        "settlement.get_net_balances": settlement.get_net_balances,
+        "settlement.plan_settlement": lambda: settlement.plan_settlement(settlement.get_net_balances()),
+        "visualise_household_data": lambda: (visualise_household_data(), _close_figures()),
+        # setters
+        "add_person": lambda: add_person("Bench", "Mark"),
+        "add_item": lambda: util.add_item("Bench item", 1.0),
+        "add_debt": lambda: util.add_debt(0, rng.randint(1, items), rng.randint(1, people), rng.randint(1, people), 1.0, "2024-01-01"),
+        "add_household_need": lambda: util.add_household_need(rng.randint(1, items), 5.0),
+        "set_need_as_purchased": lambda: util.set_need_as_purchased(next(need_ids) % needs + 1),
+        "settle_debt": lambda: util.settle_debt(next(debt_ids)),
+        "delete_debt": lambda: util.delete_debt(next(debt_ids)),
+        "add_debts_bulk(1000)": lambda: util.add_debts_bulk((1, 1, 2, 1.0, "2024-01-01") for _ in range(1000)),
+    }
+
+def run_suite(size_names: List[str], seed: int = 0) -> Dict:
+    """
+    Generates a fresh database for each size, then times every benchmark from suite_benchmarks against it.
+
+    Returns:
+        dict: machine-readable results, including which commit and versions they came from
+
+    Time complexity: O(s * (g + b)) where s is the number of sizes, g the cost of generating each and b the cost of the benchmarks
+    """
+    results = {
+        "commit": _current_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "sizes": {},
+    }
+
+    for name in size_names:
+        counts = suite_sizes[name]
+        with tempfile.TemporaryDirectory() as tmp:
+            database.set_database_path(os.path.join(tmp, f"{name}.db"))
+            start = time.perf_counter()
+            generate(seed=seed, **counts)
+            generate_seconds = time.perf_counter() - start
+            print(f"{name}: generated {counts} in {generate_seconds:.1f}s")
+
+            timings = {}
+            for bench_name, func in suite_benchmarks(counts).items():
+                timings[bench_name] = measure(func)
+                print(f"  {bench_name:<36} {timings[bench_name]['median_ms']:>10.3f} ms")
+            database.close_connection()
+
+        results["sizes"][name] = {"counts": counts, "generate_seconds": generate_seconds, "benchmarks": timings}
+    return results
+
+def _current_commit() -> Optional[str]:
+    """
+    The git commit the benchmarks are running on, if this is a git checkout.
+
+    Time complexity: O(1)
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(old: Dict, new: Dict, threshold: float = 1.2) -> List[str]:
+    """
+    Compares two suite results and lists every benchmark whose median got slower by more than the threshold ratio.
+
+    Returns:
+        list of human readable regression descriptions (empty if none)
+
+    Time complexity: O(s*b) where s is the number of sizes and b the number of benchmarks
+    """
+    regressions = []
+    for size, new_size in new["sizes"].items():
+        old_benchmarks = old.get("sizes", {}).get(size, {}).get("benchmarks", {})
+        for name, timing in new_size["benchmarks"].items():
+            if name not in old_benchmarks:
+                continue
+            ratio = timing["median_ms"] / max(old_benchmarks[name]["median_ms"], 1e-9)
+            if ratio > threshold:
+                regressions.append(f"{size}/{name}: {old_benchmarks[name]['median_ms']:.3f} ms -> {timing['median_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sharehouse data layer.")
+    parser.add_argument("--suite", action="store_true", help="run the full suite instead of the quick checks")
+    parser.add_argument("--sizes", default="small,medium", help=f"comma separated sizes to run: {', '.join(suite_sizes)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the suite results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON results to check this run against for regressions")
+    args = parser.parse_args()
+
+    if args.suite:
+        results = run_suite(args.sizes.split(","), args.seed)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as file:
+                regressions = compare_results(json.load(file), results)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            sys.exit(1 if regressions else 0)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        initialise_database()
+        for i in range(20):
+            add_person(f"Person{i}", "Bench")
+
+        result = bench_connection_reuse()
+        print("Per-call latency of get_people():")
+        print(f"  fresh connection:  {result['fresh_us']:.1f} us")
+        print(f"  pooled connection: {result['pooled_us']:.1f} us")
+        print(f"  speedup:           {result['speedup']:.1f}x")
+
+        result = bench_settlement()
+        print(f"Settling 1,000,000 debts between 10,000 people ({'numpy' if settlement.load_numpy() else 'pure python'} netting):")
+        print(f"  netting:  {result['net_seconds']:.2f} s")
+        print(f"  planning: {result['plan_seconds']:.2f} s ({result['transfers']} transfers)")
+
+        result = bench_result_cache()
+        print("Report getters behind visualise_household_data, unchanged data:")
+        print(f"  uncached: {result['uncached_us']:.1f} us")
+        print(f"  cached:   {result['cached_us']:.1f} us")
+        print(f"  speedup:  {result['speedup']:.1f}x (hit rate {result['hit_rate']:.0%})")
+
+        result = bench_households()
+        print(f"Balances across {result['households']} households:")
+        print(f"  attach:   {result['attach_seconds'] * 1000:.1f} ms")
+        print(f"  parallel: {result['parallel_seconds'] * 1000:.1f} ms")
+
+        result = bench_ledger()
+        print("Totals per person over 100,000 debts:")
+        print(f"  from get_debt_details: {result['dicts_ms']:.0f} ms, {result['dicts_mb']:.1f} MB")
+        print(f"  column snapshot:       {result['load_ms']:.0f} ms to load, {result['snapshot_mb']:.1f} MB")
+        print(f"  saved snapshot:        {result['open_ms']:.2f} ms to open, {result['group_ms']:.2f} ms to total")
+
+        result = bench_journal()
+        print("Syncing a copy of 50,000 debts through the change journal:")
+        print(f"  full replay:                  {result['full_ms']:.0f} ms")
+        print(f"  after 1,000 debts settled:    {result['incremental_ms']:.1f} ms (copying the whole file: {result['whole_file_ms']:.1f} ms)")
+        print(f"  compacting:                   {result['compact_ms']:.0f} ms ({result['removed']} changes removed)")
+
+        result = bench_search()
+        print("Searching 100,000 items:")
+        print(f"  search_items:                 {result['search_ms']:.2f} ms")
+        print(f"  find_similar_items:           {result['similar_ms']:.2f} ms")
+        print(f"  items page, common text:      {result['page_common_ms']:.2f} ms (LIKE over every name: {result['like_common_ms']:.2f} ms)")
+        print(f"  items page, rare text:        {result['page_rare_ms']:.2f} ms (LIKE over every name: {result['like_rare_ms']:.2f} ms)")
+
+        print("async_util under load (64 coroutines searching 50,000 debts while another keeps writing):")
+        for readers, rates in bench_async().items():
+            print(f"  {readers} reader thread(s): {rates['reads_per_second']:>7.0f} reads/s, {rates['writes_per_second']:>6.0f} writes/s, slowest read {rates['slowest_ms']:.0f} ms")
+
+        print("add_debt writes per second (committing each / all in one transaction):")
+        for mode, rates in bench_write_modes().items():
+            print(f"  {mode:<7} {rates['each_commits']:>9.0f} {rates['one_transaction']:>9.0f}")
+
+        database.close_connection()
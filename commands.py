@@ -0,0 +1,353 @@
+"""
+Command line interface for scripts and automation, so nothing has to drive the interactive menu.
+Every command prints a single JSON object, with "ok" set to false and an "error" message if it failed.
+
+Usage:
+    python main.py add-debt --owed-by 2 --owed-to 1 --item Milk --amount 4.50 --date 2024-03-01
+    python main.py split --paid-by 1 --item Groceries --amount 87.40 --date 2024-03-01 --shares 1 2 3
+    python main.py split --paid-by 1 --item Rent --amount 2400 --date 2024-03-01 --method percentage --shares 1=40 2=35 3=25
+    python main.py add-need --item "Dish soap" --budget 6 --date 2024-03-08
+    python main.py purchase 12
+    python main.py pay 7
+    python main.py pay 7 --person 3  # just one person's share of a split purchase
+    python main.py archive --older-than 90
+    python main.py settle            # just shows the transfers
+    python main.py settle --apply    # and marks every debt as settled
+    python main.py report
+    python main.py report --output reports/ --formats png,html
+    python main.py import debts splits.csv
+    python main.py --batch commands.txt
+    python main.py --household maple-st report
+    python main.py households
+
+A batch file has one command per line, written exactly as it would be after `python main.py`
+(blank lines and lines starting with # are skipped). The whole file runs in one process and one transaction,
+so either every command happens or, if any of them fails, none do.
+"""
+import argparse
+import json
+import shlex
+import sqlite3
+import time
+
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Union
+
+from constants import report_formats, split_methods
+from database import transaction
+from actions import find_or_add_item, record_debt, record_split_expense, record_household_need, settle, household_report
+from households import balances_by_attach, balances_in_parallel
+from importer import import_file, importers
+from money import Money
+from util import set_need_as_purchased, settle_debt, archive_settled_debts
+
+# the commands that write, and so run in a transaction. the rest only read, and taking the write lock for them
+# would hold up other programs' writes (and could fail with "database is locked") for nothing
+writing_commands = {"add-debt", "split", "add-need", "purchase", "pay", "archive", "settle", "import"}
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """
+    ArgumentParser that raises ValueError on bad arguments instead of exiting, so a bad line in a batch file
+    is reported like any other failed command.
+    """
+    def error(self, message: str) -> None:
+        raise ValueError(message)
+
+
+def _money(value: str) -> Money:
+    """
+    Reads a dollar amount argument into Money, so it is never a float on the way to the database.
+
+    Time complexity: O(1)
+    """
+    try:
+        return Money.from_dollars(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+
+def _jsonable(value: object) -> object:
+    """
+    Turns every Money in a command's result into dollars for the JSON output. json writes an int subclass as the
+    plain int, so without this amounts would come out in cents.
+
+    Time complexity: O(r) where r is the size of the result
+    """
+    if isinstance(value, Money):
+        return value.dollars
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+############################ COMMANDS #######################################
+# each takes the parsed arguments and returns what to print (without "ok" and "command", which are added for it)
+
+def _add_debt(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    add-debt: finds (or adds) the item, then logs the debt.
+
+    Time complexity: O(log m + k), see find_or_add_item
+    """
+    item_id = find_or_add_item(args.item, args.cost if args.cost is not None else args.amount)
+    return {"debt_id": record_debt(args.owed_by, args.owed_to, item_id, args.amount, args.date), "item_id": item_id}
+
+def _parse_shares(entries: List[str], method: str) -> Union[List[int], Dict[int, str]]:
+    """
+    Reads --shares: person ids for an equal split, otherwise ID=share pairs. The shares are left as they were typed,
+    for split_amount to read exactly.
+
+    Raises:
+        ValueError: if an entry isn't in the right form
+
+    Time complexity: O(p) where p is the number of people sharing it
+    """
+    if method == "equal":
+        return [int(entry) for entry in entries]
+    shares = {}
+    for entry in entries:
+        person, separator, share = entry.partition("=")
+        if not separator:
+            raise ValueError(f"Shares for a {method} split are written ID=share, not '{entry}'.")
+        shares[int(person)] = share
+    return shares
+
+def _split(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    split: finds (or adds) the item, then logs what everyone sharing it owes whoever paid.
+
+    Time complexity: O(log m + k + p log p), see find_or_add_item and settlement.split_amount
+    """
+    item_id = find_or_add_item(args.item, args.cost if args.cost is not None else args.amount)
+    result = record_split_expense(args.paid_by, item_id, args.amount, args.date, _parse_shares(args.shares, args.method), args.method)
+    return {**result, "item_id": item_id}
+
+def _add_need(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    add-need: finds (or adds) the item, then adds the need.
+
+    Time complexity: O(log m + k), see find_or_add_item
+    """
+    item_id = find_or_add_item(args.item, args.cost if args.cost is not None else args.budget)
+    need_id = record_household_need(item_id, args.budget, args.assigned_to, args.date, int(args.purchased))
+    return {"need_id": need_id, "item_id": item_id}
+
+def _purchase(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    purchase: marks a need as purchased.
+
+    Raises:
+        ValueError: if there is no unpurchased need with that number
+        ConflictError: if --expected-version was given and the need has changed since
+
+    Time complexity: O(1)
+    """
+    if not set_need_as_purchased(args.need_id, args.expected_version):
+        raise ValueError(f"There is no unpurchased need number {args.need_id}.")
+    return {"need_id": args.need_id}
+
+def _pay(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    pay: marks one debt as paid.
+
+    Raises:
+        ValueError: if there is no open debt with that number
+        ConflictError: if --expected-version was given and the debt has changed since
+
+    Time complexity: O(1)
+    """
+    if not settle_debt(args.debt_id, args.person, args.expected_version):
+        raise ValueError(f"There is no open debt number {args.debt_id}" + (f" owed by person {args.person}." if args.person else "."))
+    return {"debt_id": args.debt_id, "person": args.person}
+
+def _archive(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    archive: moves settled debts into the history.
+
+    Time complexity: O(s) where s is the number of settled debts not yet archived
+    """
+    return {"archived": archive_settled_debts(args.older_than)}
+
+def _households(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    households: what everyone owes in every household (or the ones named), with totals per household and overall.
+
+    Time complexity: O(k*n) where k is the number of households and n the number of people in each
+    """
+    if args.method == "attach":
+        return balances_by_attach(args.names or None)
+    return balances_in_parallel(args.names or None, args.workers)
+
+def _settle(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    settle: works out the transfers, and applies them with --apply.
+
+    Time complexity: see actions.settle
+    """
+    return settle(apply=args.apply)
+
+def _report(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    report: the same numbers visualise_household_data draws, or with --output, the charts and tables written to files.
+
+    Time complexity: O(n+h), see actions.household_report and reports.render_reports
+    """
+    if not args.output:
+        return household_report()
+
+    from reports import render_reports  # only load matplotlib when something is drawn
+    return render_reports(args.output, args.databases, args.formats.split(","), args.workers)
+
+def _import(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    import: streams a file in through the bulk functions.
+
+    Time complexity: O(r) where r is the number of rows in the file
+    """
+    return import_file(args.path, args.kind)
+
+
+############################ PARSING #######################################
+def build_parser() -> argparse.ArgumentParser:
+    """
+    The parser for every command. Running main.py with no command at all opens the interactive menu instead.
+
+    Time complexity: O(1)
+    """
+    parser = _ArgumentParser(prog="main.py", description="Keep track of sharehouse debts and needs.")
+    parser.add_argument("--batch", metavar="FILE", help="run every command in FILE, one per line, as one transaction")
+    parser.add_argument("--household", metavar="NAME", help="work on this household's database (see households.py)")
+    parser.add_argument("--busy-timeout", type=int, metavar="MS", help="how long to wait for another program's write lock (see database.set_busy_timeout)")
+    commands = parser.add_subparsers(dest="command", parser_class=_ArgumentParser)
+
+    command = commands.add_parser("add-debt", help="log that someone owes someone else for an item")
+    command.add_argument("--owed-by", type=int, required=True, help="id of the person who owes the money")
+    command.add_argument("--owed-to", type=int, required=True, help="id of the person they owe it to")
+    command.add_argument("--item", required=True, help="the item's number or name (new names are added as items)")
+    command.add_argument("--amount", type=_money, required=True)
+    command.add_argument("--date", required=True, help="YYYY-MM-DD")
+    command.add_argument("--cost", type=_money, help="default cost if the item is new (defaults to the amount)")
+    command.set_defaults(handler=_add_debt)
+
+    command = commands.add_parser("split", help="log a purchase shared between several people")
+    command.add_argument("--paid-by", type=int, required=True, help="id of the person who paid")
+    command.add_argument("--item", required=True, help="the item's number or name (new names are added as items)")
+    command.add_argument("--amount", type=_money, required=True, help="the whole cost")
+    command.add_argument("--date", required=True, help="YYYY-MM-DD")
+    command.add_argument("--method", choices=split_methods, default="equal")
+    command.add_argument("--shares", nargs="+", required=True,
+                         help="ids of everyone sharing it (for equal), otherwise ID=share with a weight, percentage or dollar amount")
+    command.add_argument("--cost", type=_money, help="default cost if the item is new (defaults to the amount)")
+    command.set_defaults(handler=_split)
+
+    command = commands.add_parser("add-need", help="add something the sharehouse needs")
+    command.add_argument("--item", required=True, help="the item's number or name (new names are added as items)")
+    command.add_argument("--budget", type=_money, required=True)
+    command.add_argument("--assigned-to", type=int, help="id of the person who will buy it")
+    command.add_argument("--date", help="desired purchase date, YYYY-MM-DD")
+    command.add_argument("--purchased", action="store_true", help="it has already been bought")
+    command.add_argument("--cost", type=_money, help="default cost if the item is new (defaults to the budget)")
+    command.set_defaults(handler=_add_need)
+
+    command = commands.add_parser("purchase", help="mark a household need as purchased")
+    command.add_argument("need_id", type=int)
+    command.add_argument("--expected-version", type=int, metavar="N", help="fail if the need has changed since it was read at this version")
+    command.set_defaults(handler=_purchase)
+
+    command = commands.add_parser("pay", help="mark a debt as paid")
+    command.add_argument("debt_id", type=int)
+    command.add_argument("--person", type=int, help="only this person's share of a split purchase")
+    command.add_argument("--expected-version", type=int, metavar="N", help="fail if the debt has changed since it was read at this version")
+    command.set_defaults(handler=_pay)
+
+    command = commands.add_parser("archive", help="move settled debts out of the live table into the history")
+    command.add_argument("--older-than", type=int, default=0, metavar="DAYS", help="only those settled at least this many days ago")
+    command.set_defaults(handler=_archive)
+
+    command = commands.add_parser("settle", help="show the fewest transfers that settle every debt")
+    command.add_argument("--apply", action="store_true", help="also mark every debt as settled")
+    command.set_defaults(handler=_settle)
+
+    command = commands.add_parser("report", help="totals owed and household needs")
+    command.add_argument("--output", metavar="DIR", help="write the charts and tables to files in DIR instead")
+    command.add_argument("--formats", default="png", help=f"comma separated file types to write: {', '.join(report_formats)}")
+    command.add_argument("--databases", nargs="+", metavar="DB", help="report on each of these household databases")
+    command.add_argument("--workers", type=int, help="processes to render with (defaults to one per core)")
+    command.set_defaults(handler=_report)
+
+    command = commands.add_parser("households", help="what everyone owes, in every household")
+    command.add_argument("names", nargs="*", help="only these households (defaults to all of them)")
+    command.add_argument("--method", choices=["attach", "parallel"], default="parallel")
+    command.add_argument("--workers", type=int, default=8, help="threads to read with when --method is parallel")
+    command.set_defaults(handler=_households)
+
+    command = commands.add_parser("import", help="import debts, items or needs from a CSV or JSONL file")
+    command.add_argument("kind", choices=sorted(importers))
+    command.add_argument("path")
+    command.set_defaults(handler=_import)
+
+    return parser
+
+
+############################ RUNNING #######################################
+def run_command(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    Runs one parsed command.
+
+    Returns:
+        dict: the command's result, with "ok" and "command" added
+
+    Time complexity: whatever the command costs
+    """
+    return {"ok": True, "command": args.command, **_jsonable(args.handler(args))}
+
+def run_batch(path: str, parser: Optional[argparse.ArgumentParser] = None) -> Dict[str, object]:
+    """
+    Runs every command in a batch file inside one transaction. Stops at the first command that fails,
+    and rolls back everything the file had done so far.
+
+    Returns:
+        dict: the result of every command, or the line that failed and why
+
+    Time complexity: O(l) where l is the number of lines, plus whatever the commands cost
+    """
+    parser = parser or build_parser()
+    results: List[Dict[str, object]] = []
+    start = time.perf_counter()
+    line_number = 0
+    try:
+        with transaction(), open(path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                args = parser.parse_args(shlex.split(line))
+                if args.batch or not args.command:
+                    raise ValueError("each line of a batch file must be exactly one command")
+                results.append(run_command(args))
+    except (ValueError, KeyError, OSError, sqlite3.Error) as error:
+        return {"ok": False, "line": line_number, "error": str(error), "commands_rolled_back": len(results)}
+
+    return {"ok": True, "commands": len(results), "seconds": time.perf_counter() - start, "results": results}
+
+def main(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    """
+    Runs the command (or batch file) given on the command line and prints its result as JSON.
+
+    Returns:
+        int: the exit code, 0 if it worked and 1 if it didn't
+
+    Time complexity: whatever the command costs
+    """
+    if args.batch:
+        result = run_batch(args.batch, parser)
+    else:
+        try:
+            with transaction() if args.command in writing_commands else nullcontext():
+                result = run_command(args)
+        except (ValueError, KeyError, OSError, sqlite3.Error) as error:
+            result = {"ok": False, "command": args.command, "error": str(error)}
+
+    print(json.dumps(result))
+    return 0 if result["ok"] else 1
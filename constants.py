@@ -1,5 +1,69 @@
 """
 All constants that have repeated uses held here to make it easier to change :).
 """
+import os
 
-table_names = ["People", "OwedMoney", "OriginOfOwedMoney", "Items", "DebtMapping", "HouseholdNeeds", "Passwords"]
\ No newline at end of file
+table_names = ["People", "OwedMoney", "OriginOfOwedMoney", "Items", "DebtMapping", "HouseholdNeeds", "Passwords", "PairwiseBalances", "SettledDebts", "MonthlySpending"]
+
+# where the database lives. can be overridden with the SHAREHOUSE_DB environment variable
+database_path = os.environ.get("SHAREHOUSE_DB", "sharehouse.db")
+
+# where each household's database lives when running more than one house (see households.py)
+households_directory = os.environ.get("SHAREHOUSE_HOUSEHOLDS_DIR", "households")
+
+# how many rows the interactive listings show at a time
+page_size = 20
+
+# the most rows a needs table figure holds before it is split into pages, and the file types reports can be written as
+table_rows_per_page = 40
+report_formats = ("png", "svg", "html")
+
+# ways a shared purchase can be divided between housemates (see settlement.split_amount)
+split_methods = ("equal", "weighted", "percentage", "exact")
+
+# the async facade (async_util.py): how many reads can run at once, and how long any call may take by default
+async_readers = 4
+async_timeout_seconds = 30.0
+
+# searching (search.py): how many of the items sharing the most trigrams with a new item's name are scored as possible
+# duplicates, and how alike (0 to 1, see find_similar_items) two names have to be for one to be suggested instead
+search_candidates = 50
+similar_item_threshold = 0.5
+
+# the paged listings' searches (see util._search_page) LIKE this many ids before looking the rest up in the index,
+# so text in more than about page_size / search_window of the rows fills its page without touching the index
+search_window = 400
+
+# how many journaled changes (see journal.py) are read at a time
+journal_batch_size = 1000
+
+# most getter results each thread keeps in result_cache.py before dropping the least recently used
+result_cache_size = 256
+
+# how hard sqlite works to make each commit survive a crash, picked with SHAREHOUSE_DURABILITY or database.set_durability().
+# WAL lets readers carry on while someone writes, and only needs an fsync at checkpoints when synchronous is NORMAL.
+durability_modes = {
+    "safe": {"journal_mode": "WAL", "synchronous": "FULL"},     # every commit survives a power cut
+    "normal": {"journal_mode": "WAL", "synchronous": "NORMAL"}, # survives the program crashing, a power cut may lose the last few commits
+    "fast": {"journal_mode": "WAL", "synchronous": "OFF"},      # for imports and benchmarks, an OS crash can corrupt the file
+    "legacy": {"journal_mode": "DELETE", "synchronous": "FULL"},# how sqlite behaves by default
+}
+default_durability = os.environ.get("SHAREHOUSE_DURABILITY", "normal")
+
+# how long a connection waits for another program's write lock before giving up (SHAREHOUSE_BUSY_TIMEOUT_MS), and how many
+# more times database.transaction() tries to take the lock after that, waiting busy_backoff_ms (doubling each time) in between
+busy_timeout_ms = int(os.environ.get("SHAREHOUSE_BUSY_TIMEOUT_MS", "2000"))
+busy_retries = int(os.environ.get("SHAREHOUSE_BUSY_RETRIES", "3"))
+busy_backoff_ms = 50
+
+# per-function timing of util.py (see instrumentation.py). off unless SHAREHOUSE_INSTRUMENT=1
+instrumentation_enabled = os.environ.get("SHAREHOUSE_INSTRUMENT", "0") == "1"
+slow_query_ms = float(os.environ.get("SHAREHOUSE_SLOW_QUERY_MS", "100"))  # calls slower than this get their query plans logged
+slow_query_log = os.environ.get("SHAREHOUSE_SLOW_QUERY_LOG", "slow_queries.log")
+slow_query_statements = 100  # the most statements of one call kept for the log. a bulk insert only counts the rest
+
+# pragmas run once when a connection is opened
+connection_pragmas = {
+    "cache_size": -8000,    # negative means KiB, so ~8MB of page cache
+    "temp_store": "MEMORY", # sorts and group bys don't touch disk
+}
@@ -0,0 +1,310 @@
+"""
+Connection manager for the sharehouse database.
+Every thread gets one long-lived connection (per database file) instead of every function opening and closing its own,
+so the connect/teardown cost and the pragma setup are only paid once.
+"""
+import atexit
+import random
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from constants import database_path, connection_pragmas, durability_modes, default_durability, busy_timeout_ms, busy_retries, busy_backoff_ms
+
+_local = threading.local()
+_all_connections = []  # every connection ever opened, so they can be closed on exit
+_all_connections_lock = threading.Lock()
+_current_path = database_path
+_current_durability = default_durability
+_busy_timeout_ms = busy_timeout_ms
+_busy_retries = busy_retries
+_busy_stats = {"waits": 0, "retries": 0, "gave_up": 0}
+_busy_stats_lock = threading.Lock()
+_rollbacks = 0  # how many transactions get_connection has rolled back, in any thread (see get_rollback_count)
+
+
+############################ CONFIGURATION #######################################
+def set_database_path(path: str) -> None:
+    """
+    Points every later call at a different database file (e.g. a test database or another house).
+    Connections to the old file held by this thread are closed.
+
+    Args:
+        path (str): path to the sqlite file, or ":memory:"
+
+    Time complexity: O(1)
+    """
+    global _current_path
+    close_connection()
+    _current_path = path
+
+def get_database_path() -> str:
+    """
+    Returns the path of the database file currently in use (by this thread, if it is inside using_database).
+
+    Time complexity: O(1)
+    """
+    return getattr(_local, "path_override", None) or _current_path
+
+@contextmanager
+def using_database(path: str) -> Iterator[None]:
+    """
+    Points this thread (and only this thread) at another database file for the length of the block.
+    Unlike set_database_path nothing is closed, so it is safe inside a transaction on the usual database,
+    and switching back and forth keeps reusing the same pooled connections.
+
+    Usage:
+        with using_database("house2.db"):
+            totals = get_total_owed_per_person()
+
+    Time complexity: O(1)
+    """
+    previous = getattr(_local, "path_override", None)
+    _local.path_override = path
+    try:
+        yield
+    finally:
+        _local.path_override = previous
+
+def set_durability(mode: str) -> None:
+    """
+    Chooses how hard sqlite works to make sure a commit survives a crash or power cut. See durability_modes in constants.py.
+    Connections held by this thread are closed so the next one opens with the new settings.
+
+    Args:
+        mode (str): one of "safe", "normal", "fast" or "legacy"
+
+    Time complexity: O(1)
+    """
+    global _current_durability
+    if mode not in durability_modes:
+        raise ValueError(f"Unknown durability mode '{mode}'. Choose from: {', '.join(durability_modes)}")
+    close_connection()
+    _current_durability = mode
+
+def get_durability() -> str:
+    """
+    Returns the durability mode currently in use.
+
+    Time complexity: O(1)
+    """
+    return _current_durability
+
+def set_busy_timeout(milliseconds: int, retries: Optional[int] = None) -> None:
+    """
+    Sets how long a connection waits for another program to finish writing before a write fails with
+    "database is locked", and how many more times transaction() tries after that. Applies to connections opened from now on,
+    so this thread's connections are closed.
+
+    Args:
+        milliseconds (int): how long sqlite keeps retrying by itself. 0 fails straight away.
+        retries (int, optional): how many more times transaction() tries to take the write lock. Defaults to no change.
+
+    Time complexity: O(1)
+    """
+    global _busy_timeout_ms, _busy_retries
+    if milliseconds < 0 or (retries is not None and retries < 0):
+        raise ValueError("The busy timeout and retries can't be negative.")
+    close_connection()
+    _busy_timeout_ms = milliseconds
+    if retries is not None:
+        _busy_retries = retries
+
+def get_busy_stats() -> Dict[str, int]:
+    """
+    How often, in this process, transaction() found the database locked: how many times it had to wait for the lock,
+    how many extra tries that took in all, and how many times it gave up.
+
+    Time complexity: O(1)
+    """
+    with _busy_stats_lock:
+        return dict(_busy_stats)
+
+
+############################ CONNECTIONS #######################################
+def _open_connection(path: str) -> sqlite3.Connection:
+    """
+    Opens a new connection and runs the pragma setup on it. Only ever called once per thread per database file.
+
+    Time complexity: O(k) where k is the number of pragmas
+    """
+    conn = sqlite3.connect(path, timeout=_busy_timeout_ms / 1000)
+    for pragma, value in {**connection_pragmas, **durability_modes[_current_durability]}.items():
+        conn.execute(f"PRAGMA {pragma} = {value};")
+
+    with _all_connections_lock:
+        _all_connections.append(conn)
+    return conn
+
+def _thread_connections() -> Dict[str, sqlite3.Connection]:
+    """
+    Gets the connections owned by the current thread, keyed by database path.
+
+    Time complexity: O(1)
+    """
+    if not hasattr(_local, "connections"):
+        _local.connections = {}
+        _local.depths = {}  # how many get_connection blocks deep we are, per database path
+    return _local.connections
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Gets this thread's connection to the database, opening it the first time it is needed.
+    Prefer get_connection() unless you are managing commits yourself.
+
+    Args:
+        path (str, optional): database file to connect to. Defaults to the configured database path.
+
+    Time complexity: O(1) after the first call
+    """
+    path = path or get_database_path()
+    connections = _thread_connections()
+    conn = connections.get(path)
+    if conn is None:
+        conn = _open_connection(path)
+        connections[path] = conn
+    return conn
+
+@contextmanager
+def get_connection(path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Context manager handing out this thread's pooled connection.
+    Commits when the outermost block finishes and rolls back if it raises, so nested calls
+    (e.g. add_debt called from inside another `with get_connection()`) share the one transaction.
+
+    Usage:
+        with get_connection() as conn:
+            conn.execute(...)
+
+    Time complexity: O(1) plus whatever is run inside the block
+    """
+    path = path or get_database_path()
+    conn = connect(path)
+    depths = _local.depths
+    depths[path] = depths.get(path, 0) + 1
+    try:
+        yield conn
+    except BaseException:
+        depths[path] -= 1
+        if depths[path] == 0:
+            conn.rollback()
+            _count_rollback()
+        raise
+    else:
+        depths[path] -= 1
+        if depths[path] == 0:
+            conn.commit()
+
+def _count_rollback() -> None:
+    """
+    Time complexity: O(1)
+    """
+    global _rollbacks
+    with _busy_stats_lock:
+        _rollbacks += 1
+
+def get_rollback_count() -> int:
+    """
+    How many transactions have been rolled back so far, in any thread. A rollback puts data_version and total_changes
+    back where they were, so anything cached from inside the transaction (result_cache.py, item_catalog.py)
+    checks this too to find out it has to go.
+
+    Time complexity: O(1)
+    """
+    return _rollbacks
+
+def is_busy_error(error: sqlite3.Error) -> bool:
+    """
+    Whether an error means another connection holds a lock we need ("database is locked"), so trying again later may work.
+
+    Time complexity: O(1)
+    """
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)  # the low byte is the primary code
+    return "locked" in str(error)
+
+def _begin_immediate(conn: sqlite3.Connection) -> None:
+    """
+    Takes the write lock. sqlite itself keeps retrying for the busy timeout; if the lock still isn't free after that,
+    this tries again up to the configured number of times, waiting a little longer (and a little randomly,
+    so two programs waiting on each other don't keep colliding) before each try.
+
+    Raises:
+        sqlite3.OperationalError: "database is locked" if every try failed
+
+    Time complexity: O(r) where r is the number of retries
+    """
+    for attempt in range(_busy_retries + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            break
+        except sqlite3.OperationalError as error:
+            if not is_busy_error(error):
+                raise
+            with _busy_stats_lock:
+                _busy_stats["waits"] += attempt == 0
+                _busy_stats["gave_up"] += attempt == _busy_retries
+                _busy_stats["retries"] += attempt < _busy_retries
+            if attempt == _busy_retries:
+                raise
+            time.sleep(busy_backoff_ms * 2 ** attempt * random.uniform(0.5, 1.5) / 1000)
+
+@contextmanager
+def transaction(path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Unit of work: every util.py write made inside the block is committed together at the end (or not at all if it raises),
+    so several changes cost one commit and one fsync instead of one each.
+    Takes the write lock straight away so nothing else can sneak a write in halfway through, retrying with backoff
+    if another program is holding it (see _begin_immediate). In WAL mode, holding the lock from the start also means
+    nothing in the block can fail with "database is locked" partway through.
+
+    Usage:
+        with transaction():
+            add_debt(...)
+            add_household_need(...)
+            set_need_as_purchased(...)
+
+    Time complexity: O(1) plus whatever is run inside the block
+    """
+    with get_connection(path) as conn:
+        if not conn.in_transaction:
+            _begin_immediate(conn)
+        yield conn
+
+def close_connection(path: Optional[str] = None) -> None:
+    """
+    Closes every connection owned by the current thread, or only its connection to one database file.
+
+    Args:
+        path (str, optional): only close the connection to this file
+
+    Time complexity: O(c) where c is the number of connections this thread has open
+    """
+    connections = _thread_connections()
+    for conn_path in ([path] if path else list(connections)):
+        conn = connections.pop(conn_path, None)
+        if conn is None:
+            continue
+        conn.close()
+        with _all_connections_lock:
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+        _local.depths.pop(conn_path, None)
+
+@atexit.register
+def _close_all_connections() -> None:
+    """
+    Closes anything still open when the program exits.
+
+    Time complexity: O(c) where c is the number of connections ever opened
+    """
+    with _all_connections_lock:
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # belongs to a thread that has already gone
+        _all_connections.clear()
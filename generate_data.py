@@ -0,0 +1,122 @@
+"""
+Fills a database with made-up (but realistic looking) people, items, debts and household needs, for benchmarking and testing.
+The same seed always gives the same data. Rows are generated lazily and go in through the bulk functions,
+so even millions of rows only take constant memory.
+
+Usage:
+    python generate_data.py --people 50 --items 500 --debts 1000000 --needs 20000 --seed 1 --db big.db
+"""
+import argparse
+import random
+
+from datetime import date, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+import database
+from actions import initialise_database
+from money import Money
+from util import add_people_bulk, add_items_bulk, add_debts_bulk, add_household_needs_bulk
+
+first_names = ["Linda", "Sam", "Alex", "Jordan", "Priya", "Wei", "Fatima", "Tom", "Maria", "Kenji", "Aisha", "Lucas", "Chloe", "Noah", "Zara", "Ben"]
+last_names = ["Nguyen", "Smith", "Patel", "Chen", "Garcia", "Kim", "Brown", "Singh", "Wilson", "Lopez", "Taylor", "Ali", "Jones", "Martin"]
+item_words = ["Toilet paper", "Milk", "Bread", "Dish soap", "Laundry powder", "Coffee", "Olive oil", "Rice", "Eggs", "Bin bags",
+              "Sponges", "Light bulbs", "Internet bill", "Power bill", "Water bill", "Hand soap", "Cling wrap", "Paper towel"]
+
+# data spans this many days back from today
+history_days = 3 * 365
+
+
+############################ GENERATING ROWS #######################################
+def _random_date(rng: random.Random) -> str:
+    """
+    A random YYYY-MM-DD date within the last history_days days.
+
+    Time complexity: O(1)
+    """
+    return (date.today() - timedelta(days=rng.randrange(history_days))).isoformat()
+
+def generate_people(rng: random.Random, count: int) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    """
+    Yields rows for add_people_bulk.
+
+    Time complexity: O(n) where n is count
+    """
+    for _ in range(count):
+        allergies = rng.choice([None, None, None, "Peanuts", "Lactose", "Gluten"])
+        yield (rng.choice(first_names), rng.choice(last_names), allergies, None)
+
+def generate_items(rng: random.Random, count: int) -> Iterator[Tuple[str, Money]]:
+    """
+    Yields rows for add_items_bulk. Names repeat with a size suffix once the word list runs out.
+
+    Time complexity: O(m) where m is count
+    """
+    for i in range(count):
+        name = item_words[i % len(item_words)]
+        if i >= len(item_words):
+            name = f"{name} {i // len(item_words) + 1}pk"
+        yield (name, Money(rng.randint(100, 15_000)))
+
+def generate_debts(rng: random.Random, count: int, people: int, items: int) -> Iterator[Tuple[int, int, int, Money, str]]:
+    """
+    Yields rows for add_debts_bulk. Nobody ever owes themselves.
+
+    Time complexity: O(d) where d is count
+    """
+    for _ in range(count):
+        owed_by = rng.randint(1, people)
+        owed_to = rng.randint(1, people - 1)
+        if owed_to >= owed_by:
+            owed_to += 1
+        yield (rng.randint(1, items), owed_by, owed_to, Money(rng.randint(50, 12_000)), _random_date(rng))
+
+def generate_needs(rng: random.Random, count: int, people: int, items: int) -> Iterator[Tuple[int, Money, Optional[int], Optional[str], int]]:
+    """
+    Yields rows for add_household_needs_bulk. Most needs have already been bought, like in a real house.
+
+    Time complexity: O(h) where h is count
+    """
+    for _ in range(count):
+        is_purchased = 1 if rng.random() < 0.8 else 0
+        purchased_by = rng.randint(1, people) if is_purchased else None
+        yield (rng.randint(1, items), Money(rng.randint(200, 20_000)), purchased_by, _random_date(rng), is_purchased)
+
+
+############################ FILLING THE DATABASE #######################################
+def generate(people: int, items: int, debts: int, needs: int, seed: int = 0) -> Dict[str, int]:
+    """
+    Adds the given number of each kind of row to the current database (see database.set_database_path).
+    Meant for an empty database, since debts and needs assume people and items are numbered from 1.
+
+    Returns:
+        dict: number of rows added to each table
+
+    Time complexity: O(n+m+d+h), one transaction per table
+    """
+    if people < 2 or items < 1:
+        raise ValueError("Need at least 2 people and 1 item to generate debts between them.")
+    rng = random.Random(seed)
+    initialise_database()
+
+    return {
+        "people": add_people_bulk(generate_people(rng, people)),
+        "items": add_items_bulk(generate_items(rng, items)),
+        "debts": add_debts_bulk(generate_debts(rng, debts, people, items)),
+        "needs": add_household_needs_bulk(generate_needs(rng, needs, people, items)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a sharehouse database with synthetic data.")
+    parser.add_argument("--people", type=int, default=10)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--debts", type=int, default=1000)
+    parser.add_argument("--needs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="database file to fill (defaults to the usual one)")
+    args = parser.parse_args()
+
+    if args.db:
+        database.set_database_path(args.db)
+    counts = generate(args.people, args.items, args.debts, args.needs, args.seed)
+    print(", ".join(f"{count} {table}" for table, count in counts.items()) + f" added to {database.get_database_path()}.")
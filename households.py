@@ -0,0 +1,236 @@
+"""
+Several sharehouses from one install. Every household gets its own database file in households_directory,
+and everything in util.py and actions.py works on whichever household it is pointed at:
+
+    with household("maple-st"):
+        add_debt(...)
+        totals = get_total_owed_per_person()
+
+Cross-household reports read what each person owes in every household (OwedMoney, kept up to date by the triggers
+in migrations.py), either by attaching the files to one connection a batch at a time or by reading them from a pool
+of threads. A household file left on an older schema is brought up to date first.
+
+Usage:
+    python main.py --household maple-st            # the menu, for one household
+    python main.py --household maple-st report     # any command, for one household
+    python main.py households                      # balances across every household
+"""
+import os
+import re
+import sqlite3
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import database
+from constants import households_directory, busy_timeout_ms
+from migrations import migrate, get_schema_version, latest_version
+from money import Money
+
+_migrated = set()  # household files already brought up to date by this process
+
+# what each household's balances are made from: everyone who owes money, how much and over how many open debts
+_balances_sql = """
+    SELECT o.person_id, p.first_name || ' ' || p.last_name, o.total_cents, o.debt_count
+    FROM {schema}OwedMoney o LEFT JOIN {schema}People p ON p.person_id = o.person_id
+"""
+
+
+############################ HOUSEHOLDS #######################################
+def household_path(name: str) -> str:
+    """
+    The database file a household lives in.
+
+    Raises:
+        ValueError: if the name has anything but letters, digits, - and _ in it (so it can't point outside the directory)
+
+    Time complexity: O(1)
+    """
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        raise ValueError(f"'{name}' isn't a valid household name. Use only letters, digits, - and _.")
+    return os.path.join(households_directory, f"{name}.db")
+
+def list_households() -> List[str]:
+    """
+    Names of every household that has a database file, in alphabetical order.
+
+    Time complexity: O(k log k) where k is the number of households
+    """
+    if not os.path.isdir(households_directory):
+        return []
+    return sorted(file_name[:-3] for file_name in os.listdir(households_directory) if file_name.endswith(".db"))
+
+def create_household(name: str) -> str:
+    """
+    Makes a household's database (if it doesn't exist yet) and brings its schema up to date.
+
+    Returns:
+        str: the household's database file
+
+    Time complexity: O(1) once the household exists, otherwise O(s) where s is the number of migration statements
+    """
+    path = household_path(name)
+    if path not in _migrated:
+        os.makedirs(households_directory, exist_ok=True)
+        with database.get_connection(path) as conn:
+            migrate(conn)
+        _migrated.add(path)
+    return path
+
+@contextmanager
+def household(name: str) -> Iterator[str]:
+    """
+    Points every database call this thread makes inside the block at one household, creating it if needed.
+    Other threads are unaffected, so a server can work on a different household in each thread.
+    The connection is kept open for next time; call database.close_connection(path) to let go of it.
+
+    Yields:
+        str: the household's database file
+
+    Time complexity: O(1) once the household exists
+    """
+    path = create_household(name)
+    with database.using_database(path):
+        yield path
+
+def use_household(name: str) -> str:
+    """
+    Points every later call, in every thread, at one household (like database.set_database_path).
+
+    Time complexity: O(1) once the household exists
+    """
+    path = create_household(name)
+    database.set_database_path(path)
+    return path
+
+
+############################ CROSS-HOUSEHOLD REPORTS #######################################
+def _read_only_uri(name: str) -> str:
+    """
+    A URI that opens a household's database read-only, so a report can never change or create a household.
+    The schema is brought up to date first (see _migrate_existing), since the report reads tables from the latest one.
+
+    Raises:
+        ValueError: if there is no such household
+
+    Time complexity: O(1) once the household is up to date
+    """
+    path = household_path(name)
+    if not os.path.exists(path):
+        raise ValueError(f"There is no household called '{name}'.")
+    _migrate_existing(path)
+    return Path(path).absolute().as_uri() + "?mode=ro"
+
+def _migrate_existing(path: str) -> None:
+    """
+    Brings a household file that already exists up to the latest schema, on a connection of its own that is closed
+    straight after (a report may go through hundreds of them, on several threads).
+
+    Time complexity: O(1) once the household is up to date, otherwise O(s) where s is the number of migration statements
+    """
+    if path in _migrated:
+        return
+    conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000)
+    try:
+        if get_schema_version(conn) < latest_version:
+            migrate(conn)
+    finally:
+        conn.close()
+    _migrated.add(path)
+
+def _summary(name: str, rows: Sequence[Sequence]) -> Dict[str, object]:
+    """
+    Turns one household's balance rows into a dictionary: what each person owes, and the household's totals.
+
+    Time complexity: O(n) where n is the number of people owing money in the household
+    """
+    people = [{"person_id": person_id, "name": full_name, "total_owed": Money(cents), "open_debts": count}
+              for person_id, full_name, cents, count in sorted(rows)]
+    return {"household": name, "people": people, "people_owing": len(people),
+            "total_owed": sum((person["total_owed"] for person in people), Money(0)),
+            "open_debts": sum(person["open_debts"] for person in people)}
+
+def _totals(summaries: List[Dict[str, object]], start: float) -> Dict[str, object]:
+    """
+    Adds the grand totals over every household to their summaries.
+
+    Time complexity: O(k) where k is the number of households
+    """
+    return {
+        "households": summaries,
+        "total_owed": sum((summary["total_owed"] for summary in summaries), Money(0)),
+        "open_debts": sum(summary["open_debts"] for summary in summaries),
+        "seconds": time.perf_counter() - start,
+    }
+
+def balances_by_attach(names: Optional[Sequence[str]] = None) -> Dict[str, object]:
+    """
+    Balances across households, read with one query per batch of households ATTACHed to a single connection.
+    sqlite only allows a few attached databases at once (10 unless it was compiled otherwise), hence the batches.
+
+    Args:
+        names (list of str, optional): households to include. Defaults to every household.
+
+    Returns:
+        dict: for each household, what every person in it owes (and over how many open debts) and the household's totals,
+        plus totals over all of them
+
+    Time complexity: O(k*n) where k is the number of households and n the number of people per household
+    """
+    start = time.perf_counter()
+    names = list_households() if names is None else list(names)
+    summaries = []
+    conn = sqlite3.connect("file::memory:", uri=True)
+    try:
+        batch_size = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        for first in range(0, len(names), batch_size):
+            batch = names[first:first + batch_size]
+            for number, name in enumerate(batch):
+                conn.execute(f"ATTACH DATABASE ? AS h{number};", (_read_only_uri(name),))
+            # each part is tagged with its position, since UNION ALL doesn't promise to keep the parts in order
+            query = " UNION ALL ".join(f"SELECT {number}, * FROM ({_balances_sql.format(schema=f'h{number}.')})" for number in range(len(batch)))
+            rows = {number: [] for number in range(len(batch))}
+            for row in conn.execute(query):
+                rows[row[0]].append(row[1:])
+            summaries.extend(_summary(name, rows[number]) for number, name in enumerate(batch))
+            for number in range(len(batch)):
+                conn.execute(f"DETACH DATABASE h{number};")
+    finally:
+        conn.close()
+    return _totals(summaries, start)
+
+def _read_household(name: str) -> Dict[str, object]:
+    """
+    Reads one household's balances on a connection of its own, closed straight after so hundreds of households
+    don't leave hundreds of files open.
+
+    Time complexity: O(n) where n is the number of people in the household
+    """
+    conn = sqlite3.connect(_read_only_uri(name), uri=True)
+    try:
+        return _summary(name, conn.execute(_balances_sql.format(schema="")).fetchall())
+    finally:
+        conn.close()
+
+def balances_in_parallel(names: Optional[Sequence[str]] = None, workers: int = 8) -> Dict[str, object]:
+    """
+    Balances across households, read by a pool of threads with one short-lived connection per household.
+    sqlite lets go of the GIL while it reads, so the threads really do overlap.
+
+    Args:
+        names (list of str, optional): households to include. Defaults to every household.
+        workers (int, optional): threads to read with
+
+    Returns:
+        dict: the same as balances_by_attach
+
+    Time complexity: O(k*n / w) where k is the number of households, n the people per household and w the workers
+    """
+    start = time.perf_counter()
+    names = list_households() if names is None else list(names)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        summaries = list(pool.map(_read_household, names))
+    return _totals(summaries, start)
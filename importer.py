@@ -0,0 +1,127 @@
+"""
+Streaming importer for debts, items and household needs from CSV or JSONL files.
+Rows are read one at a time and handed straight to the bulk functions in util.py, so memory stays constant
+no matter how big the file is, and the whole file goes in as a single transaction.
+
+Usage:
+    python importer.py debts splits.csv
+    python importer.py needs needs.jsonl
+
+Expected columns (CSV header row, or keys of each JSON object):
+    debts: item_id, owed_by, owed_to, amount, purchase_date
+    items: item_name, default_cost
+    needs: item_id, budget, purchased_by, purchase_date, is_purchased
+"""
+import argparse
+import csv
+import json
+import time
+
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+from money import Money
+from util import add_debts_bulk, add_items_bulk, add_household_needs_bulk, check_date
+
+
+############################ CONVERTING ROWS #######################################
+def _optional_int(value: Optional[Union[str, int]]) -> Optional[int]:
+    """
+    Turns empty CSV cells into None, and everything else into an int.
+
+    Time complexity: O(1)
+    """
+    if value is None or value == "":
+        return None
+    return int(value)
+
+def _debt_row(row: Dict) -> Tuple[int, int, int, Money, str]:
+    """
+    Converts a row into the tuple add_debts_bulk expects.
+
+    Time complexity: O(1)
+    """
+    return (int(row["item_id"]), int(row["owed_by"]), int(row["owed_to"]), Money.from_dollars(row["amount"]), check_date(row["purchase_date"]))
+
+def _item_row(row: Dict) -> Tuple[str, Money]:
+    """
+    Converts a row into the tuple add_items_bulk expects.
+
+    Time complexity: O(1)
+    """
+    return (row["item_name"], Money.from_dollars(row.get("default_cost") or 0))
+
+def _need_row(row: Dict) -> Tuple[int, Money, Optional[int], Optional[str], int]:
+    """
+    Converts a row into the tuple add_household_needs_bulk expects.
+
+    Time complexity: O(1)
+    """
+    return (int(row["item_id"]), Money.from_dollars(row["budget"]), _optional_int(row.get("purchased_by")),
+            check_date(row.get("purchase_date"), required=False), _optional_int(row.get("is_purchased")) or 0)
+
+# what each kind of import turns a row into, and which bulk function it goes to
+importers: Dict[str, Tuple[Callable[[Dict], tuple], Callable[[Iterable[tuple]], int]]] = {
+    "debts": (_debt_row, add_debts_bulk),
+    "items": (_item_row, add_items_bulk),
+    "needs": (_need_row, add_household_needs_bulk),
+}
+
+
+############################ READING FILES #######################################
+def read_rows(path: str) -> Iterator[Dict]:
+    """
+    Yields each row of a CSV or JSONL file as a dictionary, one at a time.
+    The format is picked from the file extension (.jsonl/.ndjson is JSONL, everything else is CSV).
+
+    Time complexity: O(r) where r is the number of rows, with O(1) memory
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+def import_file(path: str, kind: str, progress_every: int = 0) -> Dict[str, float]:
+    """
+    Imports every row of a file into the database as one transaction.
+
+    Args:
+        path (str): the CSV or JSONL file to import
+        kind (str): "debts", "items" or "needs"
+        progress_every (int, optional): print a progress line every this many rows. 0 turns it off.
+
+    Returns:
+        dict: rows imported, seconds taken and rows per second
+
+    Time complexity: O(r) where r is the number of rows in the file
+    """
+    if kind not in importers:
+        raise ValueError(f"Unknown import kind '{kind}'. Choose from: {', '.join(importers)}")
+    convert, bulk_add = importers[kind]
+    start = time.perf_counter()
+
+    def converted_rows() -> Iterator[tuple]:
+        for count, row in enumerate(read_rows(path), start=1):
+            if progress_every and count % progress_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {count} rows ({count / elapsed:.0f} rows/s)")
+            yield convert(row)
+
+    rows = bulk_add(converted_rows())
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else 0.0}
+
+
+if __name__ == "__main__":
+    from actions import initialise_database
+
+    parser = argparse.ArgumentParser(description="Import debts, items or household needs from a CSV or JSONL file.")
+    parser.add_argument("kind", choices=sorted(importers))
+    parser.add_argument("path")
+    parser.add_argument("--progress-every", type=int, default=100_000, help="print progress every N rows (0 to turn off)")
+    args = parser.parse_args()
+
+    initialise_database()
+    result = import_file(args.path, args.kind, args.progress_every)
+    print(f"Imported {result['rows']} {args.kind} in {result['seconds']:.2f}s ({result['rows_per_second']:.0f} rows/s).")
@@ -0,0 +1,238 @@
+"""
+Timing for every data-access function in util.py: how often each is called, how long it takes (as a latency histogram)
+and how many rows it returns. Any call slower than slow_query_ms has the query plan of every statement it ran
+written to the slow query log.
+
+Off by default. Turn it on with SHAREHOUSE_INSTRUMENT=1 or enable(). While it is off, an instrumented function
+costs one extra flag check per call.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Union
+
+import database
+from constants import instrumentation_enabled, slow_query_ms, slow_query_log, slow_query_statements
+
+_enabled = instrumentation_enabled
+_stats: Dict[str, Dict] = {}  # function name -> see _new_stats
+_stats_lock = threading.Lock()
+_local = threading.local()  # per thread: how deep in instrumented calls we are, and the _StatementLog of the outermost one
+
+# latencies are counted in buckets 2**(1/buckets_per_doubling) apart, so percentiles are accurate to about 19%
+# while each function only ever keeps a few dozen counters however many times it is called
+buckets_per_doubling = 4
+
+
+############################ SWITCHING ON AND OFF #######################################
+def enable() -> None:
+    """
+    Starts recording stats for every instrumented call.
+
+    Time complexity: O(1)
+    """
+    global _enabled
+    _enabled = True
+
+def disable() -> None:
+    """
+    Stops recording. Stats collected so far are kept.
+
+    Time complexity: O(1)
+    """
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    """
+    Whether calls are currently being recorded.
+
+    Time complexity: O(1)
+    """
+    return _enabled
+
+def reset_stats() -> None:
+    """
+    Forgets everything recorded so far.
+
+    Time complexity: O(1)
+    """
+    with _stats_lock:
+        _stats.clear()
+
+
+############################ RECORDING #######################################
+def _new_stats() -> Dict[str, Union[int, float, Dict[int, int]]]:
+    """
+    Empty stats for a function that hasn't been called yet.
+
+    Time complexity: O(1)
+    """
+    return {"calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": {}}
+
+def _record(stats: Dict, elapsed_ms: float, rows: Optional[int]) -> None:
+    """
+    Adds one call to a function's stats.
+
+    Time complexity: O(1)
+    """
+    stats["calls"] += 1
+    stats["rows"] += rows or 0
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    bucket = math.floor(math.log2(max(elapsed_ms, 1e-4)) * buckets_per_doubling)
+    stats["buckets"][bucket] = stats["buckets"].get(bucket, 0) + 1
+
+def _percentile(stats: Dict, fraction: float) -> float:
+    """
+    Estimates a latency percentile from a function's histogram, as the upper edge of the bucket it falls in.
+
+    Args:
+        stats (dict): the function's stats
+        fraction (float): e.g. 0.95 for p95
+
+    Time complexity: O(b log b) where b is the number of buckets used
+    """
+    target = fraction * stats["calls"]
+    seen = 0
+    for bucket in sorted(stats["buckets"]):
+        seen += stats["buckets"][bucket]
+        if seen >= target:
+            return min(2 ** ((bucket + 1) / buckets_per_doubling), stats["max_ms"])
+    return stats["max_ms"]
+
+def _row_count(result: object) -> Optional[int]:
+    """
+    How many rows a function returned, for anything that has a length (lists, dicts, tuples of rows).
+    Anything else (None, ids, counts) isn't rows, so it counts as nothing.
+
+    Time complexity: O(1)
+    """
+    if isinstance(result, (str, bytes)):
+        return None
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+class _StatementLog:
+    """
+    Trace callback keeping the first slow_query_statements statements an instrumented call runs and only counting the rest,
+    so a bulk insert or an import doesn't hold on to one string per row.
+    """
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        self.skipped = 0
+
+    def __call__(self, sql: str) -> None:
+        if len(self.statements) < slow_query_statements:
+            self.statements.append(sql)
+        else:
+            self.skipped += 1
+
+def _log_slow_call(name: str, elapsed_ms: float, log: _StatementLog) -> None:
+    """
+    Appends a slow call to the slow query log as one JSON object per line, with the query plan of every statement kept,
+    and how many more it ran.
+
+    Time complexity: O(s) where s is the number of statements kept (at most slow_query_statements)
+    """
+    conn = database.connect()
+    queries = []
+    for sql in log.statements:
+        if sql.lstrip().split(None, 1)[0].upper() not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            continue  # BEGIN, COMMIT, PRAGMA etc. have no plan worth logging
+        try:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        except sqlite3.Error as error:
+            plan = [f"could not explain: {error}"]
+        queries.append({"sql": " ".join(sql.split()), "plan": plan})
+
+    entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "function": name, "ms": round(elapsed_ms, 3), "queries": queries,
+             "statements_not_logged": log.skipped}
+    with open(slow_query_log, "a", encoding="utf-8") as file:
+        file.write(json.dumps(entry) + "\n")
+
+def instrument(func: Callable) -> Callable:
+    """
+    Decorator that records stats for every call of func while instrumentation is enabled.
+    Only the outermost instrumented call on a thread collects SQL for the slow query log, so a function calling another
+    instrumented function logs the statements of both (up to slow_query_statements of them, see _StatementLog).
+
+    Time complexity: O(1) overhead per call when disabled
+    """
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+
+        outermost = not getattr(_local, "depth", 0)
+        if outermost:
+            _local.statements = _StatementLog()
+            conn = database.connect()
+            conn.set_trace_callback(_local.statements)
+        _local.depth = getattr(_local, "depth", 0) + 1
+
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _local.depth -= 1
+            if outermost:
+                conn.set_trace_callback(None)
+
+        with _stats_lock:
+            _record(_stats.setdefault(name, _new_stats()), elapsed_ms, _row_count(result))
+        if outermost and elapsed_ms > slow_query_ms:
+            _log_slow_call(name, elapsed_ms, _local.statements)
+        return result
+
+    return wrapper
+
+
+############################ REPORTING #######################################
+def get_stats() -> Dict[str, Dict[str, Union[int, float]]]:
+    """
+    Summarises everything recorded so far.
+
+    Returns:
+        dict: function name -> calls, rows, mean_ms, p50_ms, p95_ms, p99_ms and max_ms
+
+    Time complexity: O(f*b log b) where f is the number of functions called and b the number of buckets each uses
+    """
+    with _stats_lock:
+        return {
+            name: {
+                "calls": stats["calls"],
+                "rows": stats["rows"],
+                "mean_ms": stats["total_ms"] / stats["calls"],
+                "p50_ms": _percentile(stats, 0.50),
+                "p95_ms": _percentile(stats, 0.95),
+                "p99_ms": _percentile(stats, 0.99),
+                "max_ms": stats["max_ms"],
+            }
+            for name, stats in _stats.items()
+        }
+
+def print_stats() -> None:
+    """
+    Prints the stats for every function called so far, slowest total time first.
+
+    Time complexity: O(f log f) where f is the number of functions called
+    """
+    stats = get_stats()
+    if not stats:
+        print("No calls recorded yet." if _enabled else "Instrumentation is off, so no calls have been recorded.")
+        return
+
+    print(f"{'function':<34}{'calls':>8}{'rows':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in sorted(stats.items(), key=lambda entry: entry[1]["mean_ms"] * entry[1]["calls"], reverse=True):
+        print(f"{name:<34}{row['calls']:>8}{row['rows']:>10}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['max_ms']:>10.3f}")
+    print(f"Calls slower than {slow_query_ms:g} ms are logged with their query plans to {slow_query_log}.")
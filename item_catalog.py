@@ -0,0 +1,106 @@
+"""
+In-memory cache of the Items table, with a word-prefix index so items can be found by typing part of their name.
+Loaded the first time it is needed and thrown away whenever items are added or deleted (util.py calls invalidate_catalog),
+when another program changes the database (noticed through PRAGMA data_version, which costs no disk reads to check)
+or when a transaction is rolled back (database.get_rollback_count), since that can take back items it saw.
+
+Each thread keeps its own copy, since data_version belongs to a connection and each thread has its own.
+"""
+import threading
+
+from bisect import bisect_left
+from typing import Dict, List, Optional, Union
+
+import database
+from database import get_connection, get_database_path
+from money import Money
+
+# per thread: items (item_id -> item), word_index ((lowercase word, item_id) for every word of every item name, sorted)
+# and state (the database, data_version, rollback count and generation the cache was loaded at)
+_local = threading.local()
+_generation = 0  # bumped by invalidate_catalog(), so every thread reloads
+
+
+############################ LOADING #######################################
+def invalidate_catalog() -> None:
+    """
+    Throws the cache away, in every thread, so the next lookup reloads it. Call after anything that changes the Items table.
+
+    Time complexity: O(1)
+    """
+    global _generation
+    _generation += 1
+
+def _load() -> Dict[int, Dict[str, Union[int, str, Money]]]:
+    """
+    Gets this thread's cached items, reloading them first if they are missing or out of date.
+
+    Time complexity: O(1) when cached, otherwise O(m log m) where m is the number of items
+    """
+    with get_connection() as conn:
+        state = (get_database_path(), conn.execute("PRAGMA data_version;").fetchone()[0], database.get_rollback_count(), _generation)
+        if getattr(_local, "state", None) == state:
+            return _local.items
+
+        rows = conn.execute("SELECT item_id, item_name, default_cost_cents FROM Items;").fetchall()
+
+    _local.items = {row[0]: {"item_id": row[0], "item_name": row[1], "default_cost": Money(row[2] or 0)} for row in rows}
+    _local.word_index = sorted((word, item_id) for item_id, name, _ in rows for word in name.lower().split())
+    _local.state = state
+    return _local.items
+
+
+############################ LOOKUPS #######################################
+def item_exists(item_id: int) -> bool:
+    """
+    Checks whether an item with this id exists.
+
+    Time complexity: O(1) when cached
+    """
+    return item_id in _load()
+
+def get_item(item_id: int) -> Optional[Dict[str, Union[int, str, Money]]]:
+    """
+    Gets an item's details by id, or None if it doesn't exist.
+
+    Time complexity: O(1) when cached
+    """
+    return _load().get(item_id)
+
+def find_items(text: str, limit: int = 20) -> List[Dict[str, Union[int, str, Money]]]:
+    """
+    Finds items where every word typed is the start of some word in the item's name, ignoring case.
+    e.g. "toi pap" finds "Toilet paper" and "toilet paper 24pk".
+
+    Args:
+        text (str): what the user typed
+        limit (int, optional): the most matches to return
+
+    Returns:
+        list of matching items, in item_id order
+
+    Time complexity: O(w log m + k) when cached, where w is the number of words typed, m the number of items
+        and k the number of index entries matching the first word
+    """
+    items = _load()
+    word_index = _local.word_index
+    words = text.lower().split()
+    if not words:
+        return []
+
+    # everything starting with the first word sits next to each other in the sorted index
+    matches = set()
+    position = bisect_left(word_index, (words[0], -1))
+    while position < len(word_index) and word_index[position][0].startswith(words[0]):
+        matches.add(word_index[position][1])
+        position += 1
+
+    # the rest of the words just filter those down
+    results = []
+    for item_id in sorted(matches):
+        name_words = items[item_id]["item_name"].lower().split()
+        if all(any(name_word.startswith(word) for name_word in name_words) for word in words[1:]):
+            results.append(items[item_id])
+            if len(results) >= limit:
+                break
+    return results
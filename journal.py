@@ -0,0 +1,235 @@
+"""
+Change journal: triggers (see migration 8) append every insert, update and delete on the tables people edit to
+ChangeJournal, with the table, what happened, the row's id, the whole row as JSON and a sequence number.
+Sequence numbers only ever go up, and since sqlite only lets one connection write at a time, a change can't commit
+with a lower number than one already seen. So anything that copies the data (an export, a cache, a backup) only has
+to remember the last number it got and ask for what came after it, instead of reading whole tables again.
+
+The balance and spending tables aren't journaled. Replaying the changes into another database brings them along,
+since the same triggers keep them up to date there.
+
+Usage:
+    python journal.py                          # how many changes are journaled, and the latest sequence number
+    python journal.py changes --since 120      # every change after 120, one JSON object per line
+    python journal.py replay backup.db         # bring another database up to date with this one
+    python journal.py compact                  # keep only the latest change to each row
+"""
+import argparse
+import json
+import sqlite3
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from balances import rebuild_balances
+from constants import journal_batch_size
+from database import get_connection, get_database_path, transaction, using_database
+from migrations import migrate
+
+# the journaled tables, and the column row_id refers to in each
+journaled_tables = {"People": "person_id", "Items": "item_id", "OriginOfOwedMoney": "origin_id", "DebtMapping": "rowid",
+                    "HouseholdNeeds": "need_id", "SettledDebts": "archive_id"}
+
+
+############################ READING CHANGES #######################################
+def get_latest_sequence() -> int:
+    """
+    Gets the sequence number of the latest change, or 0 if nothing has been journaled.
+
+    Time complexity: O(1)
+    """
+    with get_connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM ChangeJournal;").fetchone()[0]
+
+def get_changes_since(sequence: int = 0, limit: int = journal_batch_size) -> List[Dict[str, object]]:
+    """
+    Gets the changes made after a sequence number, oldest first.
+
+    Args:
+        sequence (int, optional): the last sequence number already seen. 0 for everything.
+        limit (int, optional): the most changes to return. Ask again from the last one's seq for more.
+
+    Returns:
+        list of dicts with seq, table, op ("insert", "update" or "delete"), row_id, payload (the row after the change,
+        or before it for a delete, as a dict of column -> value, money in cents) and changed_at
+
+    Time complexity: O(l) where l is the limit
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT seq, table_name, op, row_id, payload, changed_at FROM ChangeJournal
+            WHERE seq > ? ORDER BY seq LIMIT ?;
+        """, (sequence, limit)).fetchall()
+
+    return [{"seq": seq, "table": table, "op": op, "row_id": row_id, "payload": json.loads(payload), "changed_at": changed_at}
+            for seq, table, op, row_id, payload, changed_at in rows]
+
+def iter_changes_since(sequence: int = 0) -> Iterator[Dict[str, object]]:
+    """
+    Every change made after a sequence number, oldest first, read journal_batch_size at a time.
+
+    Time complexity: O(c) where c is the number of changes, with only one batch held in memory at a time
+    """
+    while True:
+        changes = get_changes_since(sequence)
+        yield from changes
+        if len(changes) < journal_batch_size:
+            return
+        sequence = changes[-1]["seq"]
+
+
+############################ REPLAYING #######################################
+def _table_columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    """
+    Time complexity: O(c) where c is the number of columns
+    """
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table});")}
+
+def _apply_change(conn: sqlite3.Connection, change: Dict[str, object], columns: Set[str]) -> None:
+    """
+    Makes one journaled change to this database. Inserts and updates both leave the row exactly as in the payload,
+    whether or not it is already there, so a change applied twice does no harm and a compacted journal
+    (where a row's only change left may be an update) still replays.
+
+    Time complexity: O(1)
+    """
+    table, key = change["table"], journaled_tables[change["table"]]
+    if change["op"] == "delete":
+        conn.execute(f"DELETE FROM {table} WHERE {key} = ?;", (change["row_id"],))
+        return
+
+    row = dict(change["payload"])
+    if row.keys() - columns:
+        raise ValueError(f"A change to {table} has columns it doesn't: {', '.join(sorted(row.keys() - columns))}.")
+    names = list(row)
+    current = conn.execute(f"SELECT {', '.join(names)} FROM {table} WHERE {key} = ?;", (change["row_id"],)).fetchone()
+    row[key] = change["row_id"]  # DebtMapping's rowid isn't in the payload
+    if current is None:
+        conn.execute(f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join(':' + column for column in row)});", row)
+        return
+
+    # only set the columns that differ, so the triggers watching the others (moving a debt's monthly spending, say)
+    # don't run for nothing. an update rather than INSERT OR REPLACE, which would drop the old row without its triggers
+    changed = [name for name, value in zip(names, current) if row[name] != value]
+    if changed:
+        conn.execute(f"UPDATE {table} SET {', '.join(f'{name} = :{name}' for name in changed)} WHERE {key} = :{key};", row)
+
+def apply_changes(changes: Iterable[Dict[str, object]], rebuild: bool = False) -> int:
+    """
+    Makes journaled changes (from get_changes_since on another database) to this one, in one transaction.
+    The triggers keep the balances and spending up to date as they go, as long as the changes come in the order they
+    were made. After replaying a compacted journal they may not have, so pass rebuild=True to recompute them at the end.
+
+    Raises:
+        ValueError: if a change is to a table that isn't journaled, or to columns the table doesn't have
+
+    Returns:
+        int: the number of changes made
+
+    Time complexity: O(c) where c is the number of changes, plus O(d+h) to rebuild (d debts, h household needs)
+    """
+    applied = 0
+    with transaction() as conn:
+        columns = {}
+        for change in changes:
+            if change["table"] not in journaled_tables:
+                raise ValueError(f"'{change['table']}' isn't a journaled table.")
+            if change["table"] not in columns:
+                columns[change["table"]] = _table_columns(conn, change["table"])
+            _apply_change(conn, change, columns[change["table"]])
+            applied += 1
+        if rebuild:
+            rebuild_balances()
+
+    return applied
+
+def replay_into(path: str, since: int = 0) -> int:
+    """
+    Brings another database up to date with this one by replaying the changes made after `since`.
+    Starting from 0 copies everything into an empty database. A sync or backup job keeps the number this returns
+    and passes it back next time, so only what changed in between is copied.
+    If the changes were compacted (their sequence numbers skip), the balances and spending are rebuilt at the end.
+
+    Args:
+        path (str): the database to replay into. Created and migrated if needed.
+        since (int, optional): the last sequence number it already has
+
+    Returns:
+        int: the sequence number it is now up to
+
+    Time complexity: O(c) where c is the number of changes, plus O(d+h) if it has to rebuild
+    """
+    source = get_database_path()
+    last = since
+    compacted = False
+    with using_database(path):
+        with get_connection() as conn:
+            migrate(conn)
+        with transaction():
+            while True:
+                with using_database(source):
+                    changes = get_changes_since(last)
+                if not changes:
+                    break
+                compacted = compacted or changes[-1]["seq"] - last != len(changes)
+                apply_changes(changes)
+                last = changes[-1]["seq"]
+            if compacted:
+                rebuild_balances()
+
+    return last
+
+
+############################ COMPACTING #######################################
+def compact_journal(through: Optional[int] = None) -> int:
+    """
+    Shrinks the journal by keeping only the latest change to each row, up to a sequence number.
+    Anything reading from before that number still ends up with the same rows, it just skips the steps in between.
+    Deletes are kept, so a copy that still has the row finds out it's gone.
+
+    Args:
+        through (int, optional): only compact changes up to here. Defaults to all of them.
+
+    Returns:
+        int: how many changes were removed
+
+    Time complexity: O(j log j) where j is the number of changes up to `through`
+    """
+    with transaction() as conn:
+        if through is None:
+            through = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM ChangeJournal;").fetchone()[0]
+        cursor = conn.execute("""
+            DELETE FROM ChangeJournal
+            WHERE seq <= :through AND seq NOT IN (
+                SELECT MAX(seq) FROM ChangeJournal WHERE seq <= :through GROUP BY table_name, row_id
+            );
+        """, {"through": through})
+
+    return cursor.rowcount
+
+
+if __name__ == "__main__":
+    from actions import initialise_database
+
+    parser = argparse.ArgumentParser(description="Read, replay and compact the change journal.")
+    commands = parser.add_subparsers(dest="command")
+    command = commands.add_parser("changes", help="print the changes after a sequence number as JSON lines")
+    command.add_argument("--since", type=int, default=0)
+    command = commands.add_parser("replay", help="bring another database up to date with this one")
+    command.add_argument("path")
+    command.add_argument("--since", type=int, default=0, help="the last sequence number it already has")
+    command = commands.add_parser("compact", help="keep only the latest change to each row")
+    command.add_argument("--through", type=int, help="only compact up to this sequence number")
+    args = parser.parse_args()
+
+    initialise_database()
+    if args.command == "changes":
+        for change in iter_changes_since(args.since):
+            print(json.dumps(change))
+    elif args.command == "replay":
+        print(f"{args.path} is up to date to change {replay_into(args.path, args.since)}.")
+    elif args.command == "compact":
+        print(f"Removed {compact_journal(args.through)} changes.")
+    else:
+        with get_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM ChangeJournal;").fetchone()[0]
+        print(f"{count} changes journaled, latest is {get_latest_sequence()}.")
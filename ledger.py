@@ -0,0 +1,259 @@
+"""
+Compact column snapshot of the whole debt ledger (open, settled and archived debts) for analytics.
+Instead of one dictionary per debt with formatted names (what get_debt_details builds), each field is one packed array:
+4-byte ids, 8-byte cents and 1-byte flags, about 29 bytes a debt. Names are kept once per person and item, not per debt.
+
+Totals per person, item or month are worked out with numpy's bincount when numpy is installed (plain python otherwise),
+and a snapshot can be saved to a file that opens memory-mapped, so later analysis starts without touching the database.
+
+Usage:
+    python ledger.py save ledger.snapshot
+    python ledger.py totals --by month --snapshot ledger.snapshot
+    python ledger.py totals --by owed_by --open-only
+"""
+import argparse
+import json
+import mmap
+import sys
+import time
+
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from database import get_connection, get_database_path
+from settlement import load_numpy
+
+# every column in a snapshot and its array typecode: i is a 4-byte int, q an 8-byte int and b a 1-byte int
+ledger_columns = {"origin_id": "i", "owed_by": "i", "owed_to": "i", "item_id": "i", "cents": "q", "month": "i", "settled": "b"}
+
+# what totals can be grouped by, and the column holding it
+group_columns = {"owed_by": "owed_by", "owed_to": "owed_to", "item": "item_id", "month": "month"}
+
+_magic = b"SHLEDG01"  # first bytes of every snapshot file
+_fetch_size = 10_000  # rows read from the database at a time while loading
+
+
+############################ THE SNAPSHOT #######################################
+class LedgerSnapshot:
+    """
+    Every debt in the ledger, one packed array per column (see ledger_columns), plus id -> name tables.
+    month is year * 12 + (month - 1) of the purchase date, or -1 if it has none.
+    The columns are array.arrays when loaded from the database and read-only memoryviews over the file when opened from one.
+    """
+    def __init__(self, columns: Dict[str, Sequence[int]], people: Dict[int, str], items: Dict[int, str], source: str, buffer: Optional[mmap.mmap] = None):
+        self.columns = columns
+        self.people = people
+        self.items = items
+        self.source = source
+        self._buffer = buffer  # the mapped file, kept open for as long as the columns point into it
+
+    def __len__(self) -> int:
+        return len(self.columns["cents"])
+
+    def column(self, name: str):
+        """
+        A column as a numpy array (sharing memory with the snapshot, nothing is copied) if numpy is installed,
+        otherwise as it is stored.
+
+        Time complexity: O(1)
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            return self.columns[name]
+        return numpy.frombuffer(self.columns[name], dtype={"i": numpy.int32, "q": numpy.int64, "b": numpy.int8}[ledger_columns[name]])
+
+
+############################ LOADING FROM THE DATABASE #######################################
+def load_ledger() -> LedgerSnapshot:
+    """
+    Reads every debt (open and settled from DebtMapping, and archived from SettledDebts) into a snapshot.
+    Rows are streamed in batches straight into the arrays, so no per-debt Python objects are kept.
+
+    Time complexity: O(d + n + m) where d is the number of debts, n the number of people and m the number of items
+    """
+    month = """COALESCE(CAST(substr({date}, 1, 4) AS INTEGER) * 12 + CAST(substr({date}, 6, 2) AS INTEGER) - 1, -1)"""
+    columns = {name: array(typecode) for name, typecode in ledger_columns.items()}
+    with get_connection() as conn:
+        cursor = conn.execute(f"""
+            SELECT dm.origin_id, dm.owed_by, dm.owed_to, COALESCE(oom.item_id, 0), dm.amount_cents,
+                {month.format(date="oom.purchase_date")}, dm.settled
+            FROM DebtMapping dm
+            LEFT JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
+            UNION ALL
+            SELECT origin_id, owed_by, owed_to, COALESCE(item_id, 0), amount_cents,
+                {month.format(date="purchase_date")}, 1
+            FROM SettledDebts;
+        """)
+        while True:
+            rows = cursor.fetchmany(_fetch_size)
+            if not rows:
+                break
+            for values, column in zip(zip(*rows), columns.values()):
+                column.extend(values)
+
+        people = {person_id: sys.intern(f"{first_name} {last_name}")
+                  for person_id, first_name, last_name in conn.execute("SELECT person_id, first_name, last_name FROM People;")}
+        items = {item_id: sys.intern(name) for item_id, name in conn.execute("SELECT item_id, item_name FROM Items;")}
+
+    return LedgerSnapshot(columns, people, items, get_database_path())
+
+
+############################ SAVING AND OPENING #######################################
+def _aligned(offset: int) -> int:
+    """
+    Rounds up to the next multiple of 8 bytes, so every column in a snapshot file starts suitably aligned.
+
+    Time complexity: O(1)
+    """
+    return (offset + 7) // 8 * 8
+
+def save_snapshot(snapshot: LedgerSnapshot, path: str) -> int:
+    """
+    Writes a snapshot to a file: a small JSON header (names, and where each column starts) followed by the raw columns.
+
+    Returns:
+        int: the size of the file in bytes
+
+    Time complexity: O(d) where d is the number of debts
+    """
+    offsets, offset = {}, 0
+    for name in ledger_columns:
+        offsets[name] = offset
+        offset = _aligned(offset + len(snapshot.columns[name]) * array(ledger_columns[name]).itemsize)
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "rows": len(snapshot),
+        "columns": offsets,
+        "people": snapshot.people,
+        "items": snapshot.items,
+        "source": snapshot.source,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }).encode()
+    data_start = _aligned(len(_magic) + 8 + len(header))
+
+    with open(path, "wb") as file:
+        file.write(_magic + len(header).to_bytes(8, "little") + header)
+        for name in ledger_columns:
+            file.seek(data_start + offsets[name])
+            file.write(memoryview(snapshot.columns[name]).cast("B"))
+        file.truncate(data_start + offset)
+    return data_start + offset
+
+def open_snapshot(path: str) -> LedgerSnapshot:
+    """
+    Opens a saved snapshot memory-mapped. Only the header is read now; the columns are paged in by the OS as they are used.
+
+    Raises:
+        ValueError: if the file isn't a snapshot, or was written on a machine with the other byte order
+
+    Time complexity: O(n + m) for the name tables, independent of the number of debts
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(_magic)] != _magic:
+        raise ValueError(f"{path} isn't a ledger snapshot.")
+    header_length = int.from_bytes(buffer[len(_magic):len(_magic) + 8], "little")
+    header = json.loads(buffer[len(_magic) + 8:len(_magic) + 8 + header_length])
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was saved on a {header['byteorder']}-endian machine.")
+
+    data_start = _aligned(len(_magic) + 8 + header_length)
+    view = memoryview(buffer)
+    columns = {}
+    for name, typecode in ledger_columns.items():
+        start = data_start + header["columns"][name]
+        columns[name] = view[start:start + header["rows"] * array(typecode).itemsize].cast(typecode)
+
+    people = {int(person_id): sys.intern(name) for person_id, name in header["people"].items()}
+    items = {int(item_id): sys.intern(name) for item_id, name in header["items"].items()}
+    return LedgerSnapshot(columns, people, items, header["source"], buffer)
+
+
+############################ GROUPING #######################################
+def _label(by: str, key: int, snapshot: LedgerSnapshot) -> str:
+    """
+    What to call a group: a person's or item's name, or a month as YYYY-MM.
+
+    Time complexity: O(1)
+    """
+    if by == "month":
+        return f"{key // 12:04d}-{key % 12 + 1:02d}" if key >= 0 else "no date"
+    names = snapshot.items if by == "item" else snapshot.people
+    return names.get(key, f"#{key}")
+
+def group_totals(snapshot: LedgerSnapshot, by: str, open_only: bool = False) -> List[Tuple[str, int, int]]:
+    """
+    Totals the ledger per person owing (owed_by), person owed (owed_to), item or month of purchase.
+
+    Args:
+        snapshot (LedgerSnapshot): from load_ledger or open_snapshot
+        by (str): one of group_columns
+        open_only (bool, optional): leave out settled and archived debts
+
+    Returns:
+        list of (name, total cents, number of debts) for every group with at least one debt, in id (or date) order
+
+    Time complexity: O(d + k) where d is the number of debts and k the range of keys
+    """
+    if by not in group_columns:
+        raise ValueError(f"Can't group by '{by}'. Choose from: {', '.join(group_columns)}")
+
+    numpy = load_numpy()
+    if numpy is not None:
+        keys = snapshot.column(group_columns[by]).astype(numpy.int64)
+        cents = snapshot.column("cents")
+        if open_only:
+            mask = snapshot.column("settled") == 0
+            keys, cents = keys[mask], cents[mask]
+        if len(keys) == 0:
+            return []
+
+        # keys are ids or month numbers, close together, so they can index the totals directly once shifted to start at 0.
+        # float64 sums of whole cents are exact below 2**53
+        lowest = int(keys.min())
+        shifted = keys - lowest
+        totals = numpy.bincount(shifted, weights=cents).astype(numpy.int64)
+        counts = numpy.bincount(shifted)
+        present = numpy.flatnonzero(counts)
+        return [(_label(by, int(key) + lowest, snapshot), int(total), int(count))
+                for key, total, count in zip(present.tolist(), totals[present].tolist(), counts[present].tolist())]
+
+    totals: Dict[int, List[int]] = {}
+    settled = snapshot.columns["settled"]
+    for row, (key, amount) in enumerate(zip(snapshot.columns[group_columns[by]], snapshot.columns["cents"])):
+        if open_only and settled[row]:
+            continue
+        group = totals.setdefault(key, [0, 0])
+        group[0] += amount
+        group[1] += 1
+    return [(_label(by, key, snapshot), total, count) for key, (total, count) in sorted(totals.items())]
+
+
+if __name__ == "__main__":
+    from actions import initialise_database
+
+    parser = argparse.ArgumentParser(description="Column snapshots of the debt ledger for analytics.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("save", help="snapshot the ledger to a file")
+    command.add_argument("path")
+    command = commands.add_parser("totals", help="total the ledger per person, item or month")
+    command.add_argument("--by", choices=sorted(group_columns), default="owed_by")
+    command.add_argument("--open-only", action="store_true", help="leave out settled debts")
+    command.add_argument("--snapshot", help="read from a saved snapshot instead of the database")
+    args = parser.parse_args()
+
+    if args.command == "save":
+        initialise_database()
+        start = time.perf_counter()
+        snapshot = load_ledger()
+        size = save_snapshot(snapshot, args.path)
+        print(f"Saved {len(snapshot)} debts ({size / 1_000_000:.1f} MB) to {args.path} in {time.perf_counter() - start:.2f}s.")
+    else:
+        if args.snapshot:
+            snapshot = open_snapshot(args.snapshot)
+        else:
+            initialise_database()
+            snapshot = load_ledger()
+        for name, cents, count in group_totals(snapshot, args.by, args.open_only):
+            print(f"{name:<30} ${cents / 100:>14,.2f} {count:>10} debts")
@@ -1,9 +1,71 @@
 # --- EXPORTS ---
-from actions import initialise_database, input_debt, input_sharehouse_needs, confirm_debt_payment, confirm_houseneed_payment, visualise_household_data
+import json
+import os
+import subprocess
+import sys
+import time
+
+_started = time.perf_counter()  # for --profile-startup
+from actions import initialise_database, input_debt, input_split_expense, input_sharehouse_needs, confirm_debt_payment, confirm_houseneed_payment, visualise_household_data, settle_debts, search_household
+from commands import build_parser, main as run_commands
+from database import set_busy_timeout
+from households import use_household
+from instrumentation import print_stats, is_enabled, enable
+from result_cache import get_cache_stats
+_imported = time.perf_counter()
+
+def profile_startup(imports_seconds: float, initialise_seconds: float, top: int = 10) -> None:
+    """
+    Prints where the time goes before the first prompt shows up: importing, setting up the database, and the slowest
+    modules to import (measured in a fresh interpreter with python's -X importtime, so nothing is already cached).
+
+    Args:
+        imports_seconds (float): how long importing everything main imports took in this process
+        initialise_seconds (float): how long initialise_database took in this process
+        top (int, optional): how many of the slowest modules to list
+
+    Time complexity: O(i log i) where i is the number of modules imported
+    """
+    print("Startup profile:")
+    print(f"  imports:              {imports_seconds * 1000:8.1f} ms")
+    print(f"  initialise_database:  {initialise_seconds * 1000:8.1f} ms")
+    print(f"  time to first prompt: {(imports_seconds + initialise_seconds) * 1000:8.1f} ms")
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    modules = []
+    for line in result.stderr.splitlines():
+        # lines look like "import time:       425 |      23236 |   database" (microseconds)
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].startswith("import time:") and parts[1].strip().isdigit():
+            modules.append((int(parts[1]), int(parts[0].split(":")[1]), parts[2].strip()))
+
+    print(f"Slowest {top} imports (cumulative / self):")
+    for cumulative, own, name in sorted(modules, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms {own / 1000:8.1f} ms  {name}")
 
 # the big boss function
 if __name__ == "__main__":
+    parser = build_parser()
+    parser.add_argument("--profile-startup", action="store_true", help="print where the time goes before the first prompt")
+    try:
+        args = parser.parse_args()
+        if args.household:
+            use_household(args.household)
+        if args.busy_timeout is not None:
+            set_busy_timeout(args.busy_timeout)
+    except ValueError as error:  # bad arguments are reported as JSON like every other failure
+        print(json.dumps({"ok": False, "error": str(error)}))
+        sys.exit(2)
+
     initialise_database()
+    if args.profile_startup:
+        profile_startup(_imported - _started, time.perf_counter() - _imported)
+
+    # any command (or a batch file) runs without the menu and exits
+    if args.command or args.batch:
+        sys.exit(run_commands(args, parser))
+
     while True:
         print("\nWhat would you like? Type the number associated with the option:")
         print("1. Input debt")
@@ -11,6 +73,10 @@ if __name__ == "__main__":
         print("3. Confirm debt payment")
         print("4. Confirm sharehouse needs payment")
         print("5. Visualise")
+        print("6. Settle all debts")
+        print("7. Query stats")
+        print("8. Split an expense")
+        print("9. Search")
         print("e. Exit")
 
         choice = input("Enter your choice: ").strip()
@@ -25,6 +91,18 @@ if __name__ == "__main__":
             confirm_houseneed_payment()
         elif choice == "5":
             visualise_household_data()
+        elif choice == "6":
+            settle_debts()
+        elif choice == "7":
+            print_stats()
+            cache = get_cache_stats()
+            print(f"Result cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%}), {cache['evictions']} evictions, {cache['invalidations']} invalidations")
+            if not is_enabled() and input("Enter 'Y' to start recording: ").strip().upper() == "Y":
+                enable()
+        elif choice == "8":
+            input_split_expense()
+        elif choice == "9":
+            search_household()
         elif choice.lower() == "e":
             print("Exiting. Goodbye!")
             break
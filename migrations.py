@@ -0,0 +1,996 @@
+"""
+Versioned schema migrations for the sharehouse database.
+The schema version is stored in the database itself (PRAGMA user_version), so on a normal launch
+the only thing that runs is one pragma read - no DDL at all unless the schema is out of date.
+
+To change the schema, append a new list of statements to `migrations`. Never edit one that has already shipped.
+"""
+import sqlite3
+
+from typing import List
+
+def _journal_triggers(table: str, key: str, columns: List[str], seed: bool = True) -> List[str]:
+    """
+    Statements for migration 8: triggers that write every insert, update and delete on a table to ChangeJournal,
+    with the whole row (the new one, or for a delete the old one) as a JSON payload, and (unless seed is False,
+    for a later migration remaking the triggers after adding a column) one that journals the rows already there as inserts.
+    Called with the columns each table had at the time, so what it makes never changes.
+
+    Time complexity: O(c) where c is the number of columns
+    """
+    def payload(row: str) -> str:
+        return "json_object(" + ", ".join(f"'{column}', {row}.{column}" for column in columns) + ")"
+
+    name = table.lower()
+    statements = [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_{event.lower()}_journal AFTER {event} ON {table}
+        BEGIN
+            INSERT INTO ChangeJournal (table_name, op, row_id, payload) VALUES ('{table}', '{event.lower()}', {row}.{key}, {payload(row)});
+        END;
+        """
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))
+    ]
+    if seed:
+        statements.append(f"""
+            INSERT INTO ChangeJournal (table_name, op, row_id, payload)
+            SELECT '{table}', 'insert', {key}, {payload(table)} FROM {table} ORDER BY {key};
+        """)
+    return statements
+
+# migrations[i] upgrades the database from version i to version i + 1
+migrations: List[List[str]] = [
+    # 1: the original tables. IF NOT EXISTS so databases made before migrations existed upgrade cleanly
+    [
+        # table to identify people
+        """
+        CREATE TABLE IF NOT EXISTS People (
+            person_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            allergies TEXT,
+            misc_info TEXT
+        );
+        """,
+        # table for total amount of money owed. this may not be necessary so temporarily keeping this here
+        """
+        CREATE TABLE IF NOT EXISTS OwedMoney (
+            person_id INTEGER NOT NULL,
+            total_owed REAL DEFAULT 0,
+            FOREIGN KEY (person_id) REFERENCES People(person_id)
+        );
+        """,
+        # table of owed money where you can see transactions happening
+        """
+        CREATE TABLE IF NOT EXISTS OriginOfOwedMoney (
+            origin_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            purchase_date TEXT,
+            purchased_by INTEGER NOT NULL,
+            FOREIGN KEY (purchased_by) REFERENCES People(person_id)
+        );
+        """,
+        # table of items that are purchased_state
+        """
+        CREATE TABLE IF NOT EXISTS Items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_name TEXT NOT NULL,
+            default_cost REAL
+        );
+        """,
+        # table to directly view who owes what to who
+        """
+        CREATE TABLE IF NOT EXISTS DebtMapping (
+            origin_id INTEGER NOT NULL,
+            owed_by INTEGER NOT NULL,
+            owed_to INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            FOREIGN KEY (origin_id) REFERENCES OriginOfOwedMoney(origin_id),
+            FOREIGN KEY (owed_by) REFERENCES People(person_id),
+            FOREIGN KEY (owed_to) REFERENCES People(person_id)
+        );
+        """,
+        # table for what is needed in the household
+        """
+        CREATE TABLE IF NOT EXISTS HouseholdNeeds (
+            need_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            budget REAL NOT NULL,
+            purchased_by INTEGER,
+            purchase_date TEXT,
+            is_purchased INTEGER DEFAULT 0,
+            FOREIGN KEY (item_id) REFERENCES Items(item_id),
+            FOREIGN KEY (purchased_by) REFERENCES People(person_id)
+        );
+        """,
+        # the passwords table...don't leak this
+        """
+        CREATE TABLE IF NOT EXISTS Passwords (
+            password_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            password_name TEXT NOT NULL,
+            password_value TEXT NOT NULL,
+            person_id INTEGER,
+            FOREIGN KEY (person_id) REFERENCES People(person_id)
+        );
+        """,
+    ],
+    # 2: indexes on the columns the getters join, group and filter on
+    [
+        # GROUP BY owed_by in get_total_owed_per_person/get_owed_amounts. amount is included so the sum never touches the table
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_owed_by ON DebtMapping (owed_by, amount);",
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_owed_to ON DebtMapping (owed_to);",
+        # joins to OriginOfOwedMoney and delete_debt's WHERE origin_id = ?
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_origin_id ON DebtMapping (origin_id);",
+        "CREATE INDEX IF NOT EXISTS idx_originofowedmoney_item_id ON OriginOfOwedMoney (item_id);",
+        # the unpurchased list is looked at all the time and stays small, so it gets its own partial index.
+        # the queries need is_purchased as a literal (not a ? parameter) for sqlite to pick these
+        "CREATE INDEX IF NOT EXISTS idx_householdneeds_unpurchased ON HouseholdNeeds (item_id, budget) WHERE is_purchased = 0;",
+        "CREATE INDEX IF NOT EXISTS idx_householdneeds_purchased ON HouseholdNeeds (item_id, budget) WHERE is_purchased = 1;",
+    ],
+    # 3: OwedMoney (per person) and PairwiseBalances (per owed_by/owed_to pair) kept up to date by triggers on DebtMapping,
+    # so balance reads are O(people) instead of re-summing every debt. debt_count lets a row be removed once its last debt goes
+    [
+        "DELETE FROM OwedMoney;",  # was never written to before, but make sure the unique index can be built
+        "ALTER TABLE OwedMoney ADD COLUMN debt_count INTEGER NOT NULL DEFAULT 0;",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_owedmoney_person_id ON OwedMoney (person_id);",
+        """
+        CREATE TABLE IF NOT EXISTS PairwiseBalances (
+            owed_by INTEGER NOT NULL,
+            owed_to INTEGER NOT NULL,
+            total_owed REAL NOT NULL DEFAULT 0,
+            debt_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (owed_by, owed_to),
+            FOREIGN KEY (owed_by) REFERENCES People(person_id),
+            FOREIGN KEY (owed_to) REFERENCES People(person_id)
+        ) WITHOUT ROWID;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_insert_balances AFTER INSERT ON DebtMapping
+        BEGIN
+            INSERT INTO OwedMoney (person_id, total_owed, debt_count) VALUES (NEW.owed_by, NEW.amount, 1)
+                ON CONFLICT (person_id) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_owed, debt_count) VALUES (NEW.owed_by, NEW.owed_to, NEW.amount, 1)
+                ON CONFLICT (owed_by, owed_to) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_delete_balances AFTER DELETE ON DebtMapping
+        BEGIN
+            UPDATE OwedMoney SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1 WHERE person_id = OLD.owed_by;
+            DELETE FROM OwedMoney WHERE person_id = OLD.owed_by AND debt_count <= 0;
+            UPDATE PairwiseBalances SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1
+                WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to;
+            DELETE FROM PairwiseBalances WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to AND debt_count <= 0;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_balances AFTER UPDATE OF owed_by, owed_to, amount ON DebtMapping
+        BEGIN
+            UPDATE OwedMoney SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1 WHERE person_id = OLD.owed_by;
+            DELETE FROM OwedMoney WHERE person_id = OLD.owed_by AND debt_count <= 0;
+            UPDATE PairwiseBalances SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1
+                WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to;
+            DELETE FROM PairwiseBalances WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to AND debt_count <= 0;
+            INSERT INTO OwedMoney (person_id, total_owed, debt_count) VALUES (NEW.owed_by, NEW.amount, 1)
+                ON CONFLICT (person_id) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_owed, debt_count) VALUES (NEW.owed_by, NEW.owed_to, NEW.amount, 1)
+                ON CONFLICT (owed_by, owed_to) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+        END;
+        """,
+        # fill both tables from the debts that already exist
+        """
+        INSERT INTO OwedMoney (person_id, total_owed, debt_count)
+        SELECT owed_by, SUM(amount), COUNT(*) FROM DebtMapping GROUP BY owed_by;
+        """,
+        """
+        INSERT INTO PairwiseBalances (owed_by, owed_to, total_owed, debt_count)
+        SELECT owed_by, owed_to, SUM(amount), COUNT(*) FROM DebtMapping GROUP BY owed_by, owed_to;
+        """,
+    ],
+    # 4: paid debts are marked settled (with when) instead of deleted, and archive_settled_debts later moves them
+    # out to SettledDebts, so DebtMapping only ever holds the open debts plus whatever was settled since the last archive.
+    # the balance triggers now only count open debts
+    [
+        "ALTER TABLE DebtMapping ADD COLUMN settled INTEGER NOT NULL DEFAULT 0;",
+        "ALTER TABLE DebtMapping ADD COLUMN settled_at TEXT;",
+        # open debts are settled = 0, ordered by rowid within it, so the unresolved listings page straight off this index
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_settled ON DebtMapping (settled);",
+        """
+        CREATE TABLE IF NOT EXISTS SettledDebts (
+            archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin_id INTEGER NOT NULL,
+            item_id INTEGER,
+            purchase_date TEXT,
+            purchased_by INTEGER,
+            owed_by INTEGER NOT NULL,
+            owed_to INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            settled_at TEXT,
+            FOREIGN KEY (owed_by) REFERENCES People(person_id),
+            FOREIGN KEY (owed_to) REFERENCES People(person_id)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_settleddebts_settled_at ON SettledDebts (settled_at);",
+        "DROP TRIGGER IF EXISTS trg_debtmapping_insert_balances;",
+        "DROP TRIGGER IF EXISTS trg_debtmapping_delete_balances;",
+        "DROP TRIGGER IF EXISTS trg_debtmapping_update_balances;",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_insert_balances AFTER INSERT ON DebtMapping WHEN NEW.settled = 0
+        BEGIN
+            INSERT INTO OwedMoney (person_id, total_owed, debt_count) VALUES (NEW.owed_by, NEW.amount, 1)
+                ON CONFLICT (person_id) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_owed, debt_count) VALUES (NEW.owed_by, NEW.owed_to, NEW.amount, 1)
+                ON CONFLICT (owed_by, owed_to) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_delete_balances AFTER DELETE ON DebtMapping WHEN OLD.settled = 0
+        BEGIN
+            UPDATE OwedMoney SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1 WHERE person_id = OLD.owed_by;
+            DELETE FROM OwedMoney WHERE person_id = OLD.owed_by AND debt_count <= 0;
+            UPDATE PairwiseBalances SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1
+                WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to;
+            DELETE FROM PairwiseBalances WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to AND debt_count <= 0;
+        END;
+        """,
+        # an update takes the old row out of the balances (if it was open) and puts the new one in (if it still is),
+        # which covers changing the people or amount as well as settling
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_remove_balances AFTER UPDATE OF owed_by, owed_to, amount, settled ON DebtMapping
+        WHEN OLD.settled = 0
+        BEGIN
+            UPDATE OwedMoney SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1 WHERE person_id = OLD.owed_by;
+            DELETE FROM OwedMoney WHERE person_id = OLD.owed_by AND debt_count <= 0;
+            UPDATE PairwiseBalances SET total_owed = total_owed - OLD.amount, debt_count = debt_count - 1
+                WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to;
+            DELETE FROM PairwiseBalances WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to AND debt_count <= 0;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_add_balances AFTER UPDATE OF owed_by, owed_to, amount, settled ON DebtMapping
+        WHEN NEW.settled = 0
+        BEGIN
+            INSERT INTO OwedMoney (person_id, total_owed, debt_count) VALUES (NEW.owed_by, NEW.amount, 1)
+                ON CONFLICT (person_id) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_owed, debt_count) VALUES (NEW.owed_by, NEW.owed_to, NEW.amount, 1)
+                ON CONFLICT (owed_by, owed_to) DO UPDATE SET total_owed = total_owed + excluded.total_owed, debt_count = debt_count + 1;
+        END;
+        """,
+        # the old listings treated anything with nothing left to pay as resolved, so those start out settled
+        "UPDATE DebtMapping SET settled = 1 WHERE amount <= 0;",
+    ],
+    # 5: purchase dates are real YYYY-MM-DD dates (checked by triggers, so they sort and index as dates), and
+    # MonthlySpending keeps what was spent (debts, by who owes) and budgeted (needs, by who buys) per month, person and item,
+    # updated by triggers on every write so spending reports never have to read the whole history
+    [
+        # dates written with slashes are the only other form worth rescuing. anything else that isn't a real date is left
+        # as it was and simply doesn't show up in the monthly figures
+        """
+        UPDATE OriginOfOwedMoney SET purchase_date = replace(trim(purchase_date), '/', '-')
+        WHERE purchase_date IS NOT date(purchase_date) AND date(replace(trim(purchase_date), '/', '-')) = replace(trim(purchase_date), '/', '-');
+        """,
+        """
+        UPDATE HouseholdNeeds SET purchase_date = replace(trim(purchase_date), '/', '-')
+        WHERE purchase_date IS NOT date(purchase_date) AND date(replace(trim(purchase_date), '/', '-')) = replace(trim(purchase_date), '/', '-');
+        """,
+        "UPDATE HouseholdNeeds SET purchase_date = NULL WHERE trim(purchase_date) = '';",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_insert_date BEFORE INSERT ON OriginOfOwedMoney
+        WHEN NEW.purchase_date IS NOT NULL AND NEW.purchase_date IS NOT date(NEW.purchase_date)
+        BEGIN
+            SELECT RAISE(ABORT, 'purchase_date has to be a real date written YYYY-MM-DD');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_update_date BEFORE UPDATE OF purchase_date ON OriginOfOwedMoney
+        WHEN NEW.purchase_date IS NOT NULL AND NEW.purchase_date IS NOT date(NEW.purchase_date)
+        BEGIN
+            SELECT RAISE(ABORT, 'purchase_date has to be a real date written YYYY-MM-DD');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_insert_date BEFORE INSERT ON HouseholdNeeds
+        WHEN NEW.purchase_date IS NOT NULL AND NEW.purchase_date IS NOT date(NEW.purchase_date)
+        BEGIN
+            SELECT RAISE(ABORT, 'purchase_date has to be a real date written YYYY-MM-DD');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_date BEFORE UPDATE OF purchase_date ON HouseholdNeeds
+        WHEN NEW.purchase_date IS NOT NULL AND NEW.purchase_date IS NOT date(NEW.purchase_date)
+        BEGIN
+            SELECT RAISE(ABORT, 'purchase_date has to be a real date written YYYY-MM-DD');
+        END;
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_originofowedmoney_purchase_date ON OriginOfOwedMoney (purchase_date);",
+        "CREATE INDEX IF NOT EXISTS idx_householdneeds_purchase_date ON HouseholdNeeds (purchase_date);",
+        # archiving deletes from DebtMapping what it has just copied here, which mustn't come off the monthly spending
+        "CREATE INDEX IF NOT EXISTS idx_settleddebts_origin_id ON SettledDebts (origin_id);",
+        """
+        CREATE TABLE IF NOT EXISTS MonthlySpending (
+            month TEXT NOT NULL,
+            person_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            spent REAL NOT NULL DEFAULT 0,
+            debt_count INTEGER NOT NULL DEFAULT 0,
+            budgeted REAL NOT NULL DEFAULT 0,
+            need_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, person_id, item_id)
+        ) WITHOUT ROWID;
+        """,
+        # settled debts were still spent, so unlike the balances these count every debt, open or not
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_insert_spending AFTER INSERT ON DebtMapping
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent, debt_count)
+            SELECT strftime('%Y-%m', purchase_date), NEW.owed_by, item_id, NEW.amount, 1
+            FROM OriginOfOwedMoney WHERE origin_id = NEW.origin_id AND strftime('%Y-%m', purchase_date) IS NOT NULL
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent = spent + excluded.spent, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_delete_spending AFTER DELETE ON DebtMapping
+        WHEN NOT EXISTS (SELECT 1 FROM SettledDebts WHERE origin_id = OLD.origin_id AND owed_by = OLD.owed_by AND owed_to = OLD.owed_to)
+        BEGIN
+            UPDATE MonthlySpending SET spent = spent - OLD.amount, debt_count = debt_count - 1
+                WHERE (month, person_id, item_id) =
+                    (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0 AND (month, person_id, item_id) =
+                (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_spending AFTER UPDATE OF owed_by, amount, origin_id ON DebtMapping
+        BEGIN
+            UPDATE MonthlySpending SET spent = spent - OLD.amount, debt_count = debt_count - 1
+                WHERE (month, person_id, item_id) =
+                    (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0 AND (month, person_id, item_id) =
+                (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent, debt_count)
+            SELECT strftime('%Y-%m', purchase_date), NEW.owed_by, item_id, NEW.amount, 1
+            FROM OriginOfOwedMoney WHERE origin_id = NEW.origin_id AND strftime('%Y-%m', purchase_date) IS NOT NULL
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent = spent + excluded.spent, debt_count = debt_count + 1;
+        END;
+        """,
+        # moving a purchase to another month or item moves every share of it
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_update_spending AFTER UPDATE OF purchase_date, item_id ON OriginOfOwedMoney
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent, debt_count)
+            SELECT strftime('%Y-%m', OLD.purchase_date), owed_by, OLD.item_id, -SUM(amount), -COUNT(*)
+            FROM DebtMapping WHERE origin_id = OLD.origin_id AND strftime('%Y-%m', OLD.purchase_date) IS NOT NULL GROUP BY owed_by
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent = spent + excluded.spent, debt_count = debt_count + excluded.debt_count;
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent, debt_count)
+            SELECT strftime('%Y-%m', NEW.purchase_date), owed_by, NEW.item_id, SUM(amount), COUNT(*)
+            FROM DebtMapping WHERE origin_id = NEW.origin_id AND strftime('%Y-%m', NEW.purchase_date) IS NOT NULL GROUP BY owed_by
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent = spent + excluded.spent, debt_count = debt_count + excluded.debt_count;
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0 AND month = strftime('%Y-%m', OLD.purchase_date);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_insert_spending AFTER INSERT ON HouseholdNeeds
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted, need_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), COALESCE(NEW.purchased_by, 0), NEW.item_id, NEW.budget, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted = budgeted + excluded.budgeted, need_count = need_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_delete_spending AFTER DELETE ON HouseholdNeeds
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL
+        BEGIN
+            UPDATE MonthlySpending SET budgeted = budgeted - OLD.budget, need_count = need_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_remove_spending AFTER UPDATE OF item_id, budget, purchased_by, purchase_date ON HouseholdNeeds
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL
+        BEGIN
+            UPDATE MonthlySpending SET budgeted = budgeted - OLD.budget, need_count = need_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_add_spending AFTER UPDATE OF item_id, budget, purchased_by, purchase_date ON HouseholdNeeds
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted, need_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), COALESCE(NEW.purchased_by, 0), NEW.item_id, NEW.budget, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted = budgeted + excluded.budgeted, need_count = need_count + 1;
+        END;
+        """,
+        # fill it from everything already there: open and settled debts, the archive, and every need
+        """
+        INSERT INTO MonthlySpending (month, person_id, item_id, spent, debt_count)
+        SELECT month, owed_by, item_id, SUM(amount), COUNT(*) FROM (
+            SELECT strftime('%Y-%m', oom.purchase_date) AS month, dm.owed_by, oom.item_id, dm.amount
+            FROM DebtMapping dm JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
+            UNION ALL
+            SELECT strftime('%Y-%m', purchase_date), owed_by, item_id, amount FROM SettledDebts
+        )
+        WHERE month IS NOT NULL AND item_id IS NOT NULL
+        GROUP BY month, owed_by, item_id;
+        """,
+        """
+        INSERT INTO MonthlySpending (month, person_id, item_id, budgeted, need_count)
+        SELECT strftime('%Y-%m', purchase_date), COALESCE(purchased_by, 0), item_id, SUM(budget), COUNT(*) FROM HouseholdNeeds
+        WHERE strftime('%Y-%m', purchase_date) IS NOT NULL
+        GROUP BY 1, 2, 3
+            ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted = excluded.budgeted, need_count = excluded.need_count;
+        """,
+    ],
+    # 6: money is stored as INTEGER cents (amount_cents, budget_cents, default_cost_cents...) instead of REAL dollars,
+    # so sums are exact and balances reconcile to the cent. sqlite can't change a column's type, so every table holding
+    # money is rebuilt under the same name, keeping its ids (and DebtMapping its rowids, which the listings page by).
+    # the balance and spending tables are recomputed from the converted debts rather than converted, dropping any drift
+    [
+        # dropping a table resets its AUTOINCREMENT counter, so remember them to put back afterwards
+        "CREATE TEMP TABLE old_sequence AS SELECT name, seq FROM sqlite_sequence;",
+        # refers to DebtMapping.amount, which is about to go
+        "DROP TRIGGER IF EXISTS trg_originofowedmoney_update_spending;",
+        """
+        CREATE TABLE Items_new (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_name TEXT NOT NULL,
+            default_cost_cents INTEGER
+        );
+        """,
+        "INSERT INTO Items_new (item_id, item_name, default_cost_cents) SELECT item_id, item_name, CAST(ROUND(default_cost * 100) AS INTEGER) FROM Items;",
+        "DROP TABLE Items;",
+        "ALTER TABLE Items_new RENAME TO Items;",
+        """
+        CREATE TABLE DebtMapping_new (
+            origin_id INTEGER NOT NULL,
+            owed_by INTEGER NOT NULL,
+            owed_to INTEGER NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            settled INTEGER NOT NULL DEFAULT 0,
+            settled_at TEXT,
+            FOREIGN KEY (origin_id) REFERENCES OriginOfOwedMoney(origin_id),
+            FOREIGN KEY (owed_by) REFERENCES People(person_id),
+            FOREIGN KEY (owed_to) REFERENCES People(person_id)
+        );
+        """,
+        """
+        INSERT INTO DebtMapping_new (rowid, origin_id, owed_by, owed_to, amount_cents, settled, settled_at)
+        SELECT rowid, origin_id, owed_by, owed_to, CAST(ROUND(amount * 100) AS INTEGER), settled, settled_at FROM DebtMapping;
+        """,
+        "DROP TABLE DebtMapping;",
+        "ALTER TABLE DebtMapping_new RENAME TO DebtMapping;",
+        """
+        CREATE TABLE HouseholdNeeds_new (
+            need_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            budget_cents INTEGER NOT NULL,
+            purchased_by INTEGER,
+            purchase_date TEXT,
+            is_purchased INTEGER DEFAULT 0,
+            FOREIGN KEY (item_id) REFERENCES Items(item_id),
+            FOREIGN KEY (purchased_by) REFERENCES People(person_id)
+        );
+        """,
+        """
+        INSERT INTO HouseholdNeeds_new (need_id, item_id, budget_cents, purchased_by, purchase_date, is_purchased)
+        SELECT need_id, item_id, CAST(ROUND(budget * 100) AS INTEGER), purchased_by, purchase_date, is_purchased FROM HouseholdNeeds;
+        """,
+        "DROP TABLE HouseholdNeeds;",
+        "ALTER TABLE HouseholdNeeds_new RENAME TO HouseholdNeeds;",
+        """
+        CREATE TABLE SettledDebts_new (
+            archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin_id INTEGER NOT NULL,
+            item_id INTEGER,
+            purchase_date TEXT,
+            purchased_by INTEGER,
+            owed_by INTEGER NOT NULL,
+            owed_to INTEGER NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            settled_at TEXT,
+            FOREIGN KEY (owed_by) REFERENCES People(person_id),
+            FOREIGN KEY (owed_to) REFERENCES People(person_id)
+        );
+        """,
+        """
+        INSERT INTO SettledDebts_new (archive_id, origin_id, item_id, purchase_date, purchased_by, owed_by, owed_to, amount_cents, settled_at)
+        SELECT archive_id, origin_id, item_id, purchase_date, purchased_by, owed_by, owed_to, CAST(ROUND(amount * 100) AS INTEGER), settled_at
+        FROM SettledDebts;
+        """,
+        "DROP TABLE SettledDebts;",
+        "ALTER TABLE SettledDebts_new RENAME TO SettledDebts;",
+        "DROP TABLE OwedMoney;",
+        """
+        CREATE TABLE OwedMoney (
+            person_id INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            debt_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (person_id) REFERENCES People(person_id)
+        );
+        """,
+        "DROP TABLE PairwiseBalances;",
+        """
+        CREATE TABLE PairwiseBalances (
+            owed_by INTEGER NOT NULL,
+            owed_to INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            debt_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (owed_by, owed_to),
+            FOREIGN KEY (owed_by) REFERENCES People(person_id),
+            FOREIGN KEY (owed_to) REFERENCES People(person_id)
+        ) WITHOUT ROWID;
+        """,
+        "DROP TABLE MonthlySpending;",
+        """
+        CREATE TABLE MonthlySpending (
+            month TEXT NOT NULL,
+            person_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            spent_cents INTEGER NOT NULL DEFAULT 0,
+            debt_count INTEGER NOT NULL DEFAULT 0,
+            budgeted_cents INTEGER NOT NULL DEFAULT 0,
+            need_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, person_id, item_id)
+        ) WITHOUT ROWID;
+        """,
+        """
+        UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT seq FROM temp.old_sequence old WHERE old.name = sqlite_sequence.name))
+        WHERE name IN (SELECT name FROM temp.old_sequence WHERE name IN ('Items', 'HouseholdNeeds', 'SettledDebts'));
+        """,
+        """
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT name, seq FROM temp.old_sequence
+        WHERE name IN ('Items', 'HouseholdNeeds', 'SettledDebts') AND name NOT IN (SELECT name FROM sqlite_sequence);
+        """,
+        "DROP TABLE temp.old_sequence;",
+        # the same indexes as before, on the new columns
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_owed_by ON DebtMapping (owed_by, amount_cents);",
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_owed_to ON DebtMapping (owed_to);",
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_origin_id ON DebtMapping (origin_id);",
+        "CREATE INDEX IF NOT EXISTS idx_debtmapping_settled ON DebtMapping (settled);",
+        "CREATE INDEX IF NOT EXISTS idx_householdneeds_unpurchased ON HouseholdNeeds (item_id, budget_cents) WHERE is_purchased = 0;",
+        "CREATE INDEX IF NOT EXISTS idx_householdneeds_purchased ON HouseholdNeeds (item_id, budget_cents) WHERE is_purchased = 1;",
+        "CREATE INDEX IF NOT EXISTS idx_householdneeds_purchase_date ON HouseholdNeeds (purchase_date);",
+        "CREATE INDEX IF NOT EXISTS idx_settleddebts_settled_at ON SettledDebts (settled_at);",
+        "CREATE INDEX IF NOT EXISTS idx_settleddebts_origin_id ON SettledDebts (origin_id);",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_owedmoney_person_id ON OwedMoney (person_id);",
+        # and the same triggers
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_insert_date BEFORE INSERT ON HouseholdNeeds
+        WHEN NEW.purchase_date IS NOT NULL AND NEW.purchase_date IS NOT date(NEW.purchase_date)
+        BEGIN
+            SELECT RAISE(ABORT, 'purchase_date has to be a real date written YYYY-MM-DD');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_date BEFORE UPDATE OF purchase_date ON HouseholdNeeds
+        WHEN NEW.purchase_date IS NOT NULL AND NEW.purchase_date IS NOT date(NEW.purchase_date)
+        BEGIN
+            SELECT RAISE(ABORT, 'purchase_date has to be a real date written YYYY-MM-DD');
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_insert_balances AFTER INSERT ON DebtMapping WHEN NEW.settled = 0
+        BEGIN
+            INSERT INTO OwedMoney (person_id, total_cents, debt_count) VALUES (NEW.owed_by, NEW.amount_cents, 1)
+                ON CONFLICT (person_id) DO UPDATE SET total_cents = total_cents + excluded.total_cents, debt_count = debt_count + 1;
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_cents, debt_count) VALUES (NEW.owed_by, NEW.owed_to, NEW.amount_cents, 1)
+                ON CONFLICT (owed_by, owed_to) DO UPDATE SET total_cents = total_cents + excluded.total_cents, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_delete_balances AFTER DELETE ON DebtMapping WHEN OLD.settled = 0
+        BEGIN
+            UPDATE OwedMoney SET total_cents = total_cents - OLD.amount_cents, debt_count = debt_count - 1 WHERE person_id = OLD.owed_by;
+            DELETE FROM OwedMoney WHERE person_id = OLD.owed_by AND debt_count <= 0;
+            UPDATE PairwiseBalances SET total_cents = total_cents - OLD.amount_cents, debt_count = debt_count - 1
+                WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to;
+            DELETE FROM PairwiseBalances WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to AND debt_count <= 0;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_remove_balances AFTER UPDATE OF owed_by, owed_to, amount_cents, settled ON DebtMapping
+        WHEN OLD.settled = 0
+        BEGIN
+            UPDATE OwedMoney SET total_cents = total_cents - OLD.amount_cents, debt_count = debt_count - 1 WHERE person_id = OLD.owed_by;
+            DELETE FROM OwedMoney WHERE person_id = OLD.owed_by AND debt_count <= 0;
+            UPDATE PairwiseBalances SET total_cents = total_cents - OLD.amount_cents, debt_count = debt_count - 1
+                WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to;
+            DELETE FROM PairwiseBalances WHERE owed_by = OLD.owed_by AND owed_to = OLD.owed_to AND debt_count <= 0;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_add_balances AFTER UPDATE OF owed_by, owed_to, amount_cents, settled ON DebtMapping
+        WHEN NEW.settled = 0
+        BEGIN
+            INSERT INTO OwedMoney (person_id, total_cents, debt_count) VALUES (NEW.owed_by, NEW.amount_cents, 1)
+                ON CONFLICT (person_id) DO UPDATE SET total_cents = total_cents + excluded.total_cents, debt_count = debt_count + 1;
+            INSERT INTO PairwiseBalances (owed_by, owed_to, total_cents, debt_count) VALUES (NEW.owed_by, NEW.owed_to, NEW.amount_cents, 1)
+                ON CONFLICT (owed_by, owed_to) DO UPDATE SET total_cents = total_cents + excluded.total_cents, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_insert_spending AFTER INSERT ON DebtMapping
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            SELECT strftime('%Y-%m', purchase_date), NEW.owed_by, item_id, NEW.amount_cents, 1
+            FROM OriginOfOwedMoney WHERE origin_id = NEW.origin_id AND strftime('%Y-%m', purchase_date) IS NOT NULL
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = spent_cents + excluded.spent_cents, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_delete_spending AFTER DELETE ON DebtMapping
+        WHEN NOT EXISTS (SELECT 1 FROM SettledDebts WHERE origin_id = OLD.origin_id AND owed_by = OLD.owed_by AND owed_to = OLD.owed_to)
+        BEGIN
+            UPDATE MonthlySpending SET spent_cents = spent_cents - OLD.amount_cents, debt_count = debt_count - 1
+                WHERE (month, person_id, item_id) =
+                    (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0 AND (month, person_id, item_id) =
+                (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_debtmapping_update_spending AFTER UPDATE OF owed_by, amount_cents, origin_id ON DebtMapping
+        BEGIN
+            UPDATE MonthlySpending SET spent_cents = spent_cents - OLD.amount_cents, debt_count = debt_count - 1
+                WHERE (month, person_id, item_id) =
+                    (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0 AND (month, person_id, item_id) =
+                (SELECT strftime('%Y-%m', purchase_date), OLD.owed_by, item_id FROM OriginOfOwedMoney WHERE origin_id = OLD.origin_id);
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            SELECT strftime('%Y-%m', purchase_date), NEW.owed_by, item_id, NEW.amount_cents, 1
+            FROM OriginOfOwedMoney WHERE origin_id = NEW.origin_id AND strftime('%Y-%m', purchase_date) IS NOT NULL
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = spent_cents + excluded.spent_cents, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_update_spending AFTER UPDATE OF purchase_date, item_id ON OriginOfOwedMoney
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            SELECT strftime('%Y-%m', OLD.purchase_date), owed_by, OLD.item_id, -SUM(amount_cents), -COUNT(*)
+            FROM DebtMapping WHERE origin_id = OLD.origin_id AND strftime('%Y-%m', OLD.purchase_date) IS NOT NULL GROUP BY owed_by
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = spent_cents + excluded.spent_cents, debt_count = debt_count + excluded.debt_count;
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            SELECT strftime('%Y-%m', NEW.purchase_date), owed_by, NEW.item_id, SUM(amount_cents), COUNT(*)
+            FROM DebtMapping WHERE origin_id = NEW.origin_id AND strftime('%Y-%m', NEW.purchase_date) IS NOT NULL GROUP BY owed_by
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = spent_cents + excluded.spent_cents, debt_count = debt_count + excluded.debt_count;
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0 AND month = strftime('%Y-%m', OLD.purchase_date);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_insert_spending AFTER INSERT ON HouseholdNeeds
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), COALESCE(NEW.purchased_by, 0), NEW.item_id, NEW.budget_cents, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = budgeted_cents + excluded.budgeted_cents, need_count = need_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_delete_spending AFTER DELETE ON HouseholdNeeds
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL
+        BEGIN
+            UPDATE MonthlySpending SET budgeted_cents = budgeted_cents - OLD.budget_cents, need_count = need_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_remove_spending AFTER UPDATE OF item_id, budget_cents, purchased_by, purchase_date ON HouseholdNeeds
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL
+        BEGIN
+            UPDATE MonthlySpending SET budgeted_cents = budgeted_cents - OLD.budget_cents, need_count = need_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_add_spending AFTER UPDATE OF item_id, budget_cents, purchased_by, purchase_date ON HouseholdNeeds
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), COALESCE(NEW.purchased_by, 0), NEW.item_id, NEW.budget_cents, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = budgeted_cents + excluded.budgeted_cents, need_count = need_count + 1;
+        END;
+        """,
+        # recompute the balances and spending from the converted amounts
+        """
+        INSERT INTO OwedMoney (person_id, total_cents, debt_count)
+        SELECT owed_by, SUM(amount_cents), COUNT(*) FROM DebtMapping WHERE settled = 0 GROUP BY owed_by;
+        """,
+        """
+        INSERT INTO PairwiseBalances (owed_by, owed_to, total_cents, debt_count)
+        SELECT owed_by, owed_to, SUM(amount_cents), COUNT(*) FROM DebtMapping WHERE settled = 0 GROUP BY owed_by, owed_to;
+        """,
+        """
+        INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+        SELECT month, owed_by, item_id, SUM(amount_cents), COUNT(*) FROM (
+            SELECT strftime('%Y-%m', oom.purchase_date) AS month, dm.owed_by, oom.item_id, dm.amount_cents
+            FROM DebtMapping dm JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
+            UNION ALL
+            SELECT strftime('%Y-%m', purchase_date), owed_by, item_id, amount_cents FROM SettledDebts
+        )
+        WHERE month IS NOT NULL AND item_id IS NOT NULL
+        GROUP BY month, owed_by, item_id;
+        """,
+        """
+        INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+        SELECT strftime('%Y-%m', purchase_date), COALESCE(purchased_by, 0), item_id, SUM(budget_cents), COUNT(*) FROM HouseholdNeeds
+        WHERE strftime('%Y-%m', purchase_date) IS NOT NULL
+        GROUP BY 1, 2, 3
+            ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = excluded.budgeted_cents, need_count = excluded.need_count;
+        """,
+    ],
+    # 7: a row version on debts (OriginOfOwedMoney, for the whole debt) and household needs, bumped by every change to them,
+    # so two people working on the same debt or need at once can tell when the other got there first (see util.ConflictError)
+    [
+        "ALTER TABLE OriginOfOwedMoney ADD COLUMN version INTEGER NOT NULL DEFAULT 0;",
+        "ALTER TABLE HouseholdNeeds ADD COLUMN version INTEGER NOT NULL DEFAULT 0;",
+    ],
+    # 8: ChangeJournal, an append-only record of every change to the tables people edit, so exports, caches and backups
+    # can pick up only what changed since they last looked (see journal.py). seq is AUTOINCREMENT so it is never reused,
+    # even after compaction. the derived tables (balances, spending) aren't journaled, they follow from the rest.
+    # what is already in the database is journaled as inserts, so replaying from the start gives back the whole database
+    [
+        """
+        CREATE TABLE IF NOT EXISTS ChangeJournal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+            row_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """,
+        *_journal_triggers("People", "person_id", ["person_id", "first_name", "last_name", "allergies", "misc_info"]),
+        *_journal_triggers("Items", "item_id", ["item_id", "item_name", "default_cost_cents"]),
+        *_journal_triggers("OriginOfOwedMoney", "origin_id", ["origin_id", "item_id", "purchase_date", "purchased_by", "version"]),
+        *_journal_triggers("DebtMapping", "rowid", ["origin_id", "owed_by", "owed_to", "amount_cents", "settled", "settled_at"]),
+        *_journal_triggers("HouseholdNeeds", "need_id", ["need_id", "item_id", "budget_cents", "purchased_by", "purchase_date", "is_purchased", "version"]),
+        *_journal_triggers("SettledDebts", "archive_id", ["archive_id", "origin_id", "item_id", "purchase_date", "purchased_by", "owed_by", "owed_to", "amount_cents", "settled_at"]),
+    ],
+    # 9: full-text indexes over item names (ItemSearch) and people's names and notes (PeopleSearch), kept in step by triggers.
+    # the rowid is the item_id / person_id. trigram tokens mean any part of a word can be searched for, LIKE '%...%' on them
+    # uses the index, and near-duplicate names can be found by how many trigrams they share (see search.py)
+    [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ItemSearch USING fts5(item_name, tokenize = 'trigram');",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS PeopleSearch USING fts5(full_name, misc_info, tokenize = 'trigram');",
+        # how many items each trigram is in, so the near-duplicate search can start from the rarest
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ItemSearchVocab USING fts5vocab(ItemSearch, 'row');",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_items_insert_search AFTER INSERT ON Items
+        BEGIN
+            INSERT INTO ItemSearch (rowid, item_name) VALUES (NEW.item_id, NEW.item_name);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_items_delete_search AFTER DELETE ON Items
+        BEGIN
+            DELETE FROM ItemSearch WHERE rowid = OLD.item_id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_items_update_search AFTER UPDATE OF item_id, item_name ON Items
+        BEGIN
+            DELETE FROM ItemSearch WHERE rowid = OLD.item_id;
+            INSERT INTO ItemSearch (rowid, item_name) VALUES (NEW.item_id, NEW.item_name);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_people_insert_search AFTER INSERT ON People
+        BEGIN
+            INSERT INTO PeopleSearch (rowid, full_name, misc_info) VALUES (NEW.person_id, NEW.first_name || ' ' || NEW.last_name, NEW.misc_info);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_people_delete_search AFTER DELETE ON People
+        BEGIN
+            DELETE FROM PeopleSearch WHERE rowid = OLD.person_id;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_people_update_search AFTER UPDATE OF person_id, first_name, last_name, misc_info ON People
+        BEGIN
+            DELETE FROM PeopleSearch WHERE rowid = OLD.person_id;
+            INSERT INTO PeopleSearch (rowid, full_name, misc_info) VALUES (NEW.person_id, NEW.first_name || ' ' || NEW.last_name, NEW.misc_info);
+        END;
+        """,
+        "INSERT INTO ItemSearch (rowid, item_name) SELECT item_id, item_name FROM Items;",
+        "INSERT INTO PeopleSearch (rowid, full_name, misc_info) SELECT person_id, first_name || ' ' || last_name, misc_info FROM People;",
+    ],
+    # 10: what was spent is what each purchase cost, by whoever paid, rather than the debts people owe for it
+    # (which left out the payer's own share of a split, and purchases nobody owes on). OriginOfOwedMoney gets the
+    # purchase's whole cost, and MonthlySpending.spent_cents / debt_count become the cost and number of purchases.
+    # archiving keeps the purchase now (see util.archive_settled_debts), so its spending stays where it was
+    [
+        "ALTER TABLE OriginOfOwedMoney ADD COLUMN amount_cents INTEGER;",
+        "DROP TRIGGER IF EXISTS trg_originofowedmoney_insert_journal;",
+        "DROP TRIGGER IF EXISTS trg_originofowedmoney_update_journal;",
+        "DROP TRIGGER IF EXISTS trg_originofowedmoney_delete_journal;",
+        *_journal_triggers("OriginOfOwedMoney", "origin_id", ["origin_id", "item_id", "purchase_date", "purchased_by", "version", "amount_cents"], seed=False),
+        "DROP TRIGGER IF EXISTS trg_debtmapping_insert_spending;",
+        "DROP TRIGGER IF EXISTS trg_debtmapping_delete_spending;",
+        "DROP TRIGGER IF EXISTS trg_debtmapping_update_spending;",
+        "DROP TRIGGER IF EXISTS trg_originofowedmoney_update_spending;",
+        # a debt logged on its own used to record whoever owed as the purchaser. it was bought by whoever is owed
+        # (a split already records whoever paid, who never owes on their own purchase)
+        "UPDATE SettledDebts SET purchased_by = owed_to WHERE purchased_by = owed_by;",
+        """
+        UPDATE OriginOfOwedMoney SET purchased_by = (
+            SELECT owed_to FROM DebtMapping dm WHERE dm.origin_id = OriginOfOwedMoney.origin_id AND dm.owed_by = OriginOfOwedMoney.purchased_by
+            UNION ALL
+            SELECT owed_to FROM SettledDebts sd WHERE sd.origin_id = OriginOfOwedMoney.origin_id AND sd.owed_by = OriginOfOwedMoney.purchased_by
+            LIMIT 1
+        )
+        WHERE EXISTS (SELECT 1 FROM DebtMapping dm WHERE dm.origin_id = OriginOfOwedMoney.origin_id AND dm.owed_by = OriginOfOwedMoney.purchased_by)
+            OR EXISTS (SELECT 1 FROM SettledDebts sd WHERE sd.origin_id = OriginOfOwedMoney.origin_id AND sd.owed_by = OriginOfOwedMoney.purchased_by);
+        """,
+        # purchases already archived away get their row back, costing what their archived debts add up to
+        """
+        INSERT INTO OriginOfOwedMoney (origin_id, item_id, purchase_date, purchased_by, amount_cents)
+        SELECT origin_id, MAX(item_id), MAX(purchase_date), MAX(purchased_by), SUM(amount_cents) FROM SettledDebts
+        WHERE origin_id NOT IN (SELECT origin_id FROM OriginOfOwedMoney)
+        GROUP BY origin_id
+        HAVING MAX(item_id) IS NOT NULL AND MAX(purchased_by) IS NOT NULL;
+        """,
+        # the rest cost what their debts add up to. the payer's share of an older split was never written down, so it stays out
+        """
+        UPDATE OriginOfOwedMoney SET amount_cents =
+            COALESCE((SELECT SUM(amount_cents) FROM DebtMapping dm WHERE dm.origin_id = OriginOfOwedMoney.origin_id), 0)
+            + COALESCE((SELECT SUM(amount_cents) FROM SettledDebts sd WHERE sd.origin_id = OriginOfOwedMoney.origin_id), 0)
+        WHERE amount_cents IS NULL;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_insert_spending AFTER INSERT ON OriginOfOwedMoney
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL AND NEW.amount_cents IS NOT NULL
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), NEW.purchased_by, NEW.item_id, NEW.amount_cents, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = spent_cents + excluded.spent_cents, debt_count = debt_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_delete_spending AFTER DELETE ON OriginOfOwedMoney
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL AND OLD.amount_cents IS NOT NULL
+        BEGIN
+            UPDATE MonthlySpending SET spent_cents = spent_cents - OLD.amount_cents, debt_count = debt_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), OLD.purchased_by, OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), OLD.purchased_by, OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_update_remove_spending AFTER UPDATE OF item_id, purchase_date, purchased_by, amount_cents ON OriginOfOwedMoney
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL AND OLD.amount_cents IS NOT NULL
+        BEGIN
+            UPDATE MonthlySpending SET spent_cents = spent_cents - OLD.amount_cents, debt_count = debt_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), OLD.purchased_by, OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), OLD.purchased_by, OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_originofowedmoney_update_add_spending AFTER UPDATE OF item_id, purchase_date, purchased_by, amount_cents ON OriginOfOwedMoney
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL AND NEW.amount_cents IS NOT NULL
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), NEW.purchased_by, NEW.item_id, NEW.amount_cents, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = spent_cents + excluded.spent_cents, debt_count = debt_count + 1;
+        END;
+        """,
+        # recompute the spending from the purchases, keeping the budgets
+        "UPDATE MonthlySpending SET spent_cents = 0, debt_count = 0;",
+        "DELETE FROM MonthlySpending WHERE need_count <= 0;",
+        """
+        INSERT INTO MonthlySpending (month, person_id, item_id, spent_cents, debt_count)
+        SELECT strftime('%Y-%m', purchase_date), purchased_by, item_id, SUM(amount_cents), COUNT(*) FROM OriginOfOwedMoney
+        WHERE strftime('%Y-%m', purchase_date) IS NOT NULL AND amount_cents IS NOT NULL
+        GROUP BY 1, 2, 3
+            ON CONFLICT (month, person_id, item_id) DO UPDATE SET spent_cents = excluded.spent_cents, debt_count = excluded.debt_count;
+        """,
+    ],
+    # 11: only needs that have been bought count towards what was budgeted, so a need still waiting on its desired
+    # purchase date isn't compared against spending that hasn't happened. a need assigned to nobody has a NULL
+    # purchased_by rather than 0, which isn't anyone (the rollup still files it under person 0)
+    [
+        "UPDATE HouseholdNeeds SET purchased_by = NULL WHERE purchased_by = 0;",
+        "DROP TRIGGER IF EXISTS trg_householdneeds_insert_spending;",
+        "DROP TRIGGER IF EXISTS trg_householdneeds_delete_spending;",
+        "DROP TRIGGER IF EXISTS trg_householdneeds_update_remove_spending;",
+        "DROP TRIGGER IF EXISTS trg_householdneeds_update_add_spending;",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_insert_spending AFTER INSERT ON HouseholdNeeds
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL AND NEW.is_purchased = 1
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), COALESCE(NEW.purchased_by, 0), NEW.item_id, NEW.budget_cents, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = budgeted_cents + excluded.budgeted_cents, need_count = need_count + 1;
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_delete_spending AFTER DELETE ON HouseholdNeeds
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL AND OLD.is_purchased = 1
+        BEGIN
+            UPDATE MonthlySpending SET budgeted_cents = budgeted_cents - OLD.budget_cents, need_count = need_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_remove_spending AFTER UPDATE OF item_id, budget_cents, purchased_by, purchase_date, is_purchased ON HouseholdNeeds
+        WHEN strftime('%Y-%m', OLD.purchase_date) IS NOT NULL AND OLD.is_purchased = 1
+        BEGIN
+            UPDATE MonthlySpending SET budgeted_cents = budgeted_cents - OLD.budget_cents, need_count = need_count - 1
+                WHERE (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+            DELETE FROM MonthlySpending WHERE debt_count <= 0 AND need_count <= 0
+                AND (month, person_id, item_id) = (strftime('%Y-%m', OLD.purchase_date), COALESCE(OLD.purchased_by, 0), OLD.item_id);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_householdneeds_update_add_spending AFTER UPDATE OF item_id, budget_cents, purchased_by, purchase_date, is_purchased ON HouseholdNeeds
+        WHEN strftime('%Y-%m', NEW.purchase_date) IS NOT NULL AND NEW.is_purchased = 1
+        BEGIN
+            INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+            VALUES (strftime('%Y-%m', NEW.purchase_date), COALESCE(NEW.purchased_by, 0), NEW.item_id, NEW.budget_cents, 1)
+                ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = budgeted_cents + excluded.budgeted_cents, need_count = need_count + 1;
+        END;
+        """,
+        # recompute the budgets from the bought needs, keeping the spending
+        "UPDATE MonthlySpending SET budgeted_cents = 0, need_count = 0;",
+        "DELETE FROM MonthlySpending WHERE debt_count <= 0;",
+        """
+        INSERT INTO MonthlySpending (month, person_id, item_id, budgeted_cents, need_count)
+        SELECT strftime('%Y-%m', purchase_date), COALESCE(purchased_by, 0), item_id, SUM(budget_cents), COUNT(*) FROM HouseholdNeeds
+        WHERE strftime('%Y-%m', purchase_date) IS NOT NULL AND is_purchased = 1
+        GROUP BY 1, 2, 3
+            ON CONFLICT (month, person_id, item_id) DO UPDATE SET budgeted_cents = excluded.budgeted_cents, need_count = excluded.need_count;
+        """,
+    ],
+]
+
+latest_version = len(migrations)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Gets the schema version stored in the database file.
+
+    Time complexity: O(1)
+    """
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Brings the database up to the latest schema version. Each migration runs in the same transaction as its
+    version bump, so a crash halfway through leaves the database on the previous version rather than half-migrated.
+
+    Args:
+        conn (sqlite3.Connection): connection to the database to migrate
+
+    Returns:
+        int: the number of migrations that were run (0 if the schema was already current)
+
+    Time complexity: O(1) when the schema is current, otherwise O(s) where s is the number of pending statements
+        (plus the cost of building any new indexes over existing rows)
+    """
+    version = get_schema_version(conn)
+    if version >= latest_version:
+        return 0
+
+    for new_version in range(version + 1, latest_version + 1):
+        if not conn.in_transaction:
+            conn.execute("BEGIN;")
+        for statement in migrations[new_version - 1]:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {new_version};")
+        conn.commit()
+
+    return latest_version - version
@@ -0,0 +1,97 @@
+"""
+Money as a whole number of cents.
+Every amount is stored in the database as INTEGER cents (see migration 6) and summed as integers, so totals are exact
+to the cent however many debts there are, where summing REAL dollars drifts.
+
+Money is an int (the cents), so it goes into sqlite, compares and sorts like one, but it prints and formats as dollars:
+str(amount) and f"${amount:.2f}" both show 4.50, not 450. Adding or subtracting Money (or plain int cents) gives Money.
+
+    Money.from_dollars("4.50")    # Money('4.50'), also takes floats, ints and Decimals
+    Money(450).dollars            # 4.5, for charts and JSON
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Union
+
+# anything from_dollars accepts
+Dollars = Union["Money", int, float, str, Decimal]
+
+
+class Money(int):
+    """
+    An amount of money in whole cents.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dollars(cls, value: Dollars) -> "Money":
+        """
+        Converts a dollar amount to Money, rounding half a cent up (away from zero).
+        Floats are read by their shortest decimal form, so 0.1 + 0.2 becomes 30 cents rather than being thrown off by
+        binary rounding. Money is returned as it is, since it is already in cents.
+
+        Raises:
+            ValueError: if the value isn't a finite number of dollars
+
+        Time complexity: O(1)
+        """
+        if isinstance(value, Money):
+            return value
+        try:
+            cents = (Decimal(str(value).strip().lstrip("$")) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            raise ValueError(f"'{value}' isn't an amount of money.") from None
+        return cls(cents)
+
+    @property
+    def dollars(self) -> float:
+        """
+        The amount in dollars as a float, for drawing and JSON. Exact to the cent (it's the nearest float to it).
+
+        Time complexity: O(1)
+        """
+        return int(self) / 100
+
+    def __str__(self) -> str:
+        cents = int(self)
+        return f"{'-' if cents < 0 else ''}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def __format__(self, spec: str) -> str:
+        return format(self.dollars, spec) if spec else str(self)
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            return Money(int(self) + int(other))
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, int):
+            return Money(int(self) - int(other))
+        return NotImplemented
+
+    def __rsub__(self, other):
+        if isinstance(other, int):
+            return Money(int(other) - int(self))
+        return NotImplemented
+
+    def __neg__(self) -> "Money":
+        return Money(-int(self))
+
+    def __abs__(self) -> "Money":
+        return Money(abs(int(self)))
+
+    def __reduce__(self):
+        return (Money, (int(self),))  # so Money survives being sent to a report worker process
+
+
+def money_or_none(cents: Union[int, None]) -> Union[Money, None]:
+    """
+    Wraps cents read from the database as Money, leaving NULL as None.
+
+    Time complexity: O(1)
+    """
+    return None if cents is None else Money(cents)
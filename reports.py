@@ -0,0 +1,183 @@
+"""
+Off-screen report rendering: writes the charts and tables visualise_household_data shows to PNG, SVG or HTML files
+instead of opening windows, so reports can be made on a server or from a nightly job.
+
+Figures are drawn straight onto matplotlib Figure objects (no pyplot, no GUI backend) and rendered in parallel
+by a process pool, one figure per task, so a report covering many households uses every core.
+
+Usage:
+    python main.py report --output reports/ --formats png,html
+    python main.py report --output reports/ --databases house1.db house2.db house3.db --workers 8
+"""
+import html
+import io
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import database
+from constants import report_formats
+from money import Money
+from util import get_total_owed_per_person, get_household_needs, get_monthly_spending, get_budget_vs_actual
+
+# the tables in every report: (file name, title, is_purchased)
+needs_tables = [
+    ("unpurchased_needs", "Unpurchased Household Needs", 0),
+    ("purchased_needs", "Purchased Household Needs", 1),
+]
+
+# the charts in every report: (file name, title, function in visualise.py that draws it)
+charts = [
+    ("total_owed", "Total Amount Owed by Each Person", "draw_total_owed"),
+    ("spending_over_time", "Spending Over Time", "draw_spending_over_time"),
+    ("budget_vs_actual", "Budget vs Actual Spending", "draw_budget_vs_actual"),
+]
+
+# one figure to render: (what to draw, its data, title, total budget, path to write without the extension, formats)
+RenderTask = Tuple[str, list, str, Money, str, Tuple[str, ...]]
+
+
+############################ GATHERING DATA #######################################
+def read_report_data(path: Optional[str] = None) -> Dict[str, list]:
+    """
+    Reads everything a report shows from one household's database.
+
+    Args:
+        path (str, optional): the database file. Defaults to the one currently in use.
+
+    Returns:
+        dict: the rows for every chart in charts, plus one list of (item name, budget) per table in needs_tables
+
+    Time complexity: O(n+h+s) where n is the number of people, h the number of household needs
+        and s the number of MonthlySpending rows
+    """
+    with database.using_database(path or database.get_database_path()):
+        data = {
+            "total_owed": get_total_owed_per_person(),
+            "spending_over_time": get_monthly_spending(),
+            "budget_vs_actual": get_budget_vs_actual(),
+        }
+        for name, _, is_purchased in needs_tables:
+            data[name] = get_household_needs(is_purchased)
+    return data
+
+def plan_renders(data: Dict[str, list], directory: str, formats: Sequence[str]) -> List[RenderTask]:
+    """
+    Splits one household's report into a task per figure: the charts, then every page of every table.
+
+    Time complexity: O(h) where h is the number of household needs
+    """
+    from visualise import paginate_needs, page_title
+
+    tasks = [(name, data[name], title, Money(0), os.path.join(directory, name), tuple(formats)) for name, title, _ in charts]
+    for name, title, _ in needs_tables:
+        total_budget = sum((budget for _, budget in data[name]), Money(0))
+        pages = paginate_needs(data[name])
+        for page, rows in enumerate(pages, start=1):
+            file_name = name if len(pages) == 1 else f"{name}_{page:03d}"
+            tasks.append(("needs_table", rows, page_title(title, page, len(pages)), total_budget,
+                          os.path.join(directory, file_name), tuple(formats)))
+    return tasks
+
+
+############################ RENDERING #######################################
+def _html_page(title: str, body: str) -> str:
+    """
+    Wraps some HTML in a page of its own.
+
+    Time complexity: O(b) where b is the length of the body
+    """
+    return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title></head>\n"
+            f"<body>\n<h1>{html.escape(title)}</h1>\n{body}\n</body></html>\n")
+
+def _html_table(rows: list, total_budget: Money) -> str:
+    """
+    A household needs table as a plain HTML table, which is much quicker to make (and to read) than a drawn one.
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    lines = ["<table>", "<tr><th>Item Name</th><th>Budget ($)</th></tr>"]
+    lines.extend(f"<tr><td>{html.escape(name)}</td><td>${budget:.2f}</td></tr>" for name, budget in rows)
+    lines.append(f"<tr><th>Total</th><th>${total_budget:.2f}</th></tr>")
+    lines.append("</table>")
+    return "\n".join(lines)
+
+def render_figure(task: RenderTask) -> List[str]:
+    """
+    Draws one figure and writes it in every format asked for. Runs in a worker process, so it only uses its arguments.
+    Image formats are written as they are. For "html", tables are written as HTML tables and charts are inlined as SVG.
+
+    Returns:
+        list of the files written
+
+    Time complexity: O(r) where r is the number of rows drawn
+    """
+    from matplotlib.figure import Figure
+    import visualise
+
+    kind, rows, title, total_budget, path, formats = task
+    chart_drawers = {name: getattr(visualise, drawer) for name, _, drawer in charts}
+
+    figure = None
+    if kind in chart_drawers:
+        figure = Figure(figsize=(8, 6) if kind == "total_owed" else (10, 6))
+        chart_drawers[kind](figure, rows)
+    elif any(file_format != "html" for file_format in formats):  # html tables don't need drawing
+        figure = Figure(figsize=visualise.needs_table_size(len(rows)))
+        visualise.draw_needs_table(figure, rows, title, total_budget)
+
+    written = []
+    for file_format in formats:
+        if file_format == "html":
+            if kind in chart_drawers:
+                svg = io.StringIO()
+                figure.savefig(svg, format="svg")
+                body = svg.getvalue()
+            else:
+                body = _html_table(rows, total_budget)
+            with open(f"{path}.html", "w", encoding="utf-8") as file:
+                file.write(_html_page(title, body))
+        else:
+            figure.savefig(f"{path}.{file_format}", format=file_format)
+        written.append(f"{path}.{file_format}")
+    return written
+
+def render_reports(output: str, databases: Optional[Sequence[str]] = None, formats: Sequence[str] = ("png",),
+                   workers: Optional[int] = None) -> Dict[str, object]:
+    """
+    Writes a full report for every household database given, each into its own folder under output
+    (or straight into output when there is only the current database).
+
+    Args:
+        output (str): folder to write into, created if needed
+        databases (list of str, optional): household database files. Defaults to the one currently in use.
+        formats (list of str, optional): any of report_formats
+        workers (int, optional): processes to render with. Defaults to one per core; 1 renders in this process.
+
+    Returns:
+        dict: the files written, how many figures were rendered, and how long it took
+
+    Time complexity: O(k*(n+h)) where k is the number of households, spread over the worker processes
+    """
+    unknown = [file_format for file_format in formats if file_format not in report_formats]
+    if unknown:
+        raise ValueError(f"Unknown report format(s) {', '.join(unknown)}. Choose from: {', '.join(report_formats)}")
+
+    start = time.perf_counter()
+    tasks = []
+    for path in databases or [None]:
+        directory = output if not databases else os.path.join(output, os.path.splitext(os.path.basename(path))[0])
+        os.makedirs(directory, exist_ok=True)
+        tasks.extend(plan_renders(read_report_data(path), directory, formats))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        written = [render_figure(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = list(pool.map(render_figure, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    files = [file for files in written for file in files]
+    return {"files": files, "figures": len(tasks), "seconds": time.perf_counter() - start}
@@ -0,0 +1,136 @@
+"""
+Memoises the read-only getters in util.py, so showing the same report twice in a row doesn't query the database twice.
+
+A cached result is only reused while nothing could have changed it. That means the same database file, the same
+PRAGMA data_version (which moves whenever another connection commits), the same total_changes on our own connection
+(which moves whenever we insert, update or delete anything), no rollback (which puts both of those back, see
+database.get_rollback_count) and no call to invalidate_results() in between (needed for things like dropping tables,
+which none of the others notice).
+Checking all that is one cheap pragma, with no disk reads.
+
+Each thread keeps its own cache, since each thread has its own connection and so its own view of what changed.
+"""
+import threading
+
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Hashable, Tuple
+
+import database
+from constants import result_cache_size
+
+_local = threading.local()  # per thread: the cache itself and the state of the database it was filled from
+_generation = 0  # bumped by invalidate_results(), for changes data_version and total_changes can't see
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+############################ INVALIDATING #######################################
+def invalidate_results() -> None:
+    """
+    Throws every cached result away, in every thread. Only needed for changes sqlite doesn't count as writes
+    (e.g. dropping and recreating tables); inserts, updates and deletes are noticed on their own.
+
+    Time complexity: O(1)
+    """
+    global _generation
+    _generation += 1
+
+def _database_state() -> Tuple[str, int, int, int, int]:
+    """
+    Everything that has to stay the same for a cached result to still be right.
+
+    Time complexity: O(1)
+    """
+    path = database.get_database_path()
+    conn = database.connect(path)
+    data_version = conn.execute("PRAGMA data_version;").fetchone()[0]
+    return (path, data_version, conn.total_changes, database.get_rollback_count(), _generation)
+
+def _thread_cache() -> "OrderedDict[Hashable, object]":
+    """
+    Gets this thread's cache, emptying it first if the database has changed since it was filled.
+
+    Time complexity: O(1)
+    """
+    state = _database_state()
+    if getattr(_local, "state", None) != state:
+        if getattr(_local, "results", None):
+            with _stats_lock:
+                _stats["invalidations"] += 1
+        _local.results = OrderedDict()
+        _local.state = state
+    return _local.results
+
+
+############################ CACHING #######################################
+def _copy(result: object) -> object:
+    """
+    A copy of a list or dict result, so a caller changing what it got back can't change the cached copy.
+    Rows that are dicts are copied too; tuples can't be changed so they are shared.
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    if isinstance(result, list):
+        return [dict(row) if isinstance(row, dict) else row for row in result]
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+def cached(func: Callable) -> Callable:
+    """
+    Decorator that remembers func's result for each set of arguments until the database changes.
+    Keeps at most result_cache_size results per thread, dropping the least recently used first.
+    Only for functions that read from the database and nothing else.
+
+    Time complexity: O(1) per call when cached (plus copying the result)
+    """
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        results = _thread_cache()
+        key = (name, args, tuple(sorted(kwargs.items())))
+        if key in results:
+            results.move_to_end(key)
+            with _stats_lock:
+                _stats["hits"] += 1
+            return _copy(results[key])
+
+        result = func(*args, **kwargs)
+        with _stats_lock:
+            _stats["misses"] += 1
+        # only keep it if nothing changed while func was running, otherwise it could already be out of date
+        if _database_state() == _local.state:
+            results[key] = result
+            if len(results) > result_cache_size:
+                results.popitem(last=False)
+                with _stats_lock:
+                    _stats["evictions"] += 1
+        return _copy(result)
+
+    return wrapper
+
+
+############################ REPORTING #######################################
+def get_cache_stats() -> Dict[str, float]:
+    """
+    Hits, misses, evictions and invalidations so far (over every thread), and the fraction of calls that were hits.
+
+    Time complexity: O(1)
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    calls = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / calls if calls else 0.0
+    return stats
+
+def reset_cache_stats() -> None:
+    """
+    Sets every counter back to zero. Cached results are kept.
+
+    Time complexity: O(1)
+    """
+    with _stats_lock:
+        for counter in _stats:
+            _stats[counter] = 0
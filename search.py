@@ -0,0 +1,218 @@
+"""
+Search over items, people and household needs, backed by the full-text indexes ItemSearch and PeopleSearch
+(migration 9), which triggers keep in step with the Items and People tables.
+The indexes are made of trigrams (every run of three characters), so typing any part of a word finds it without
+reading every row, and names can be compared by how many trigrams they share, which is what finds near-duplicates
+like "Toilet paper" and "toilet paper 24pk" before a second one is added.
+
+Usage:
+    python search.py toilet              # matching items, people and unpurchased needs
+    python search.py --similar "Toilet papr"
+"""
+import argparse
+import math
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from constants import page_size, search_candidates, similar_item_threshold
+from database import get_connection
+from instrumentation import instrument
+from money import Money, money_or_none
+from result_cache import cached
+from util import like_pattern
+
+
+############################ QUERIES #######################################
+def _normalise(text: str) -> str:
+    """
+    Lowercases text and squashes runs of spaces, so "Toilet  Paper" and "toilet paper" compare as the same.
+
+    Time complexity: O(n) where n is the length of the text
+    """
+    return " ".join(text.lower().split())
+
+def _quote(text: str) -> str:
+    """
+    Makes text a literal FTS5 string, so quotes and operators in what was typed aren't read as query syntax.
+
+    Time complexity: O(n) where n is the length of the text
+    """
+    return '"' + text.replace('"', '""') + '"'
+
+def _where(table: str, columns: List[str], text: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Builds the condition for a search: every word typed has to appear somewhere in one of the columns.
+    Words of three or more characters are looked up in the index (MATCH). Shorter ones have no trigram to look up,
+    so they only narrow down what the longer words found, or are LIKE'd through the whole index if there are no longer words.
+
+    Returns:
+        (SQL condition on the search table, its parameters)
+
+    Time complexity: O(w) where w is the number of words
+    """
+    words = _normalise(text).split()
+    long_words = [word for word in words if len(word) >= 3]
+    conditions, params = [], {}
+    if long_words:
+        conditions.append(f"{table} MATCH :match")
+        params["match"] = " ".join(_quote(word) for word in long_words)
+    for number, word in enumerate(word for word in words if len(word) < 3):
+        conditions.append("(" + " OR ".join(f"{table}.{column} LIKE :word{number} ESCAPE '\\'" for column in columns) + ")")
+        params[f"word{number}"] = like_pattern(word)
+    return " AND ".join(conditions) or "1", params
+
+@instrument
+@cached
+def search_items(text: str, limit: int = page_size) -> List[Tuple[int, str, Optional[Money]]]:
+    """
+    Finds items whose name contains every word typed, in any order and ignoring case, best matches first.
+    e.g. "pap toi" finds "Toilet paper" and "toilet paper 24pk".
+
+    Returns:
+        list of (item_id, item_name, default_cost)
+
+    Time complexity: O(k log k) where k is the number of items containing the longest words typed, found through the index
+    """
+    where, params = _where("ItemSearch", ["item_name"], text)
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT i.item_id, i.item_name, i.default_cost_cents
+            FROM ItemSearch JOIN Items i ON i.item_id = ItemSearch.rowid
+            WHERE {where}
+            ORDER BY ItemSearch.rank, length(i.item_name), i.item_id
+            LIMIT :limit;
+        """, {**params, "limit": limit}).fetchall()
+
+    return [(item_id, item_name, money_or_none(cents)) for item_id, item_name, cents in rows]
+
+@instrument
+@cached
+def search_people(text: str, limit: int = page_size) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    Finds people whose name, or whose notes (misc_info), contain every word typed, ignoring case.
+
+    Returns:
+        list of (person_id, full_name, misc_info)
+
+    Time complexity: O(k log k) where k is the number of people containing the longest words typed
+    """
+    where, params = _where("PeopleSearch", ["full_name", "misc_info"], text)
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT rowid, full_name, misc_info FROM PeopleSearch
+            WHERE {where}
+            ORDER BY rank, rowid
+            LIMIT :limit;
+        """, {**params, "limit": limit}).fetchall()
+
+    return [tuple(row) for row in rows]
+
+@instrument
+@cached
+def search_needs(text: str, limit: int = page_size) -> List[Tuple[int, str, Money]]:
+    """
+    Finds household needs still to be purchased whose item's name contains every word typed, by item name.
+
+    Returns:
+        list of (need_id, item_name, budget)
+
+    Time complexity: O(n log n) where n is the number of unpurchased needs. The list of needs still to be purchased stays short,
+        so they are read through their partial index and checked one by one rather than looked up in ItemSearch
+    """
+    words = _normalise(text).split()
+    conditions = "".join(f" AND i.item_name LIKE :word{number} ESCAPE '\\'" for number in range(len(words)))
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT hn.need_id, i.item_name, hn.budget_cents
+            FROM HouseholdNeeds hn JOIN Items i ON hn.item_id = i.item_id
+            WHERE hn.is_purchased = 0 {conditions}
+            ORDER BY i.item_name, hn.need_id
+            LIMIT :limit;
+        """, {**{f"word{number}": like_pattern(word) for number, word in enumerate(words)}, "limit": limit}).fetchall()
+
+    return [(need_id, item_name, Money(cents)) for need_id, item_name, cents in rows]
+
+
+############################ NEAR-DUPLICATES #######################################
+def _similarity(trigrams: Counter, other: Counter) -> float:
+    """
+    Dice coefficient of two names' trigrams: twice the trigrams they share over how many they have between them.
+    Repeats count, so "Milk 555pk" and "Milk 5555pk" aren't the same.
+
+    Time complexity: O(t) where t is the number of trigrams
+    """
+    total = sum(trigrams.values()) + sum(other.values())
+    return 2 * sum((trigrams & other).values()) / total if total else 0.0
+
+@instrument
+@cached
+def find_similar_items(name: str, limit: int = 5, threshold: float = similar_item_threshold) -> List[Tuple[int, str, float]]:
+    """
+    Finds items whose names look like this one, for suggesting an existing item instead of adding a duplicate.
+    Names are scored by the Dice coefficient of their trigrams (see _similarity): 1 for the same name ignoring case
+    and spacing, about 0.8 for "Toilet paper" against "toilet paper 24pk", and nearer 0 the less they have in common.
+
+    A name scoring at least the threshold has to share at least `needed` of this name's n distinct trigrams, so it
+    contains at least one of any n - needed + 1 of them. Only the rarest n - needed + 1 are looked up in the index,
+    and only names of a length that could score high enough are kept. The search_candidates of those sharing
+    the most are scored.
+
+    Args:
+        name (str): the name about to be added
+        limit (int, optional): the most suggestions to return
+        threshold (float, optional): the lowest score worth suggesting, above 0
+
+    Returns:
+        list of (item_id, item_name, score), most similar first
+
+    Time complexity: O(k) where k is the number of items containing one of the rarest trigrams looked up,
+        plus O(c) to score c candidates
+    """
+    normalised = _normalise(name)
+    trigrams = Counter(normalised[i:i + 3] for i in range(len(normalised) - 2))
+    if not trigrams:  # shorter than three characters, so only an exact match can be found
+        with get_connection() as conn:
+            rows = conn.execute("SELECT item_id, item_name FROM Items WHERE item_name = ? COLLATE NOCASE LIMIT ?;",
+                                (name.strip(), limit)).fetchall()
+        return [(item_id, item_name, 1.0) for item_id, item_name in rows]
+
+    distinct = sorted(trigrams)
+    needed = math.ceil(threshold * len(distinct) / (2 - threshold))
+    with get_connection() as conn:
+        counts = dict(conn.execute(f"SELECT term, doc FROM ItemSearchVocab WHERE term IN ({', '.join('?' * len(distinct))});", distinct))
+        rarest = sorted(distinct, key=lambda trigram: counts.get(trigram, 0))[:len(distinct) - needed + 1]
+        candidates = conn.execute("""
+            SELECT rowid, item_name FROM ItemSearch
+            WHERE ItemSearch MATCH :match AND length(item_name) BETWEEN :shortest AND :longest
+            ORDER BY rank
+            LIMIT :candidates;
+        """, {"match": " OR ".join(_quote(trigram) for trigram in rarest), "candidates": search_candidates,
+              # lengths whose trigram counts could give a high enough score, with some slack for spacing
+              "shortest": int(threshold * len(normalised) / (2 - threshold)),
+              "longest": math.ceil((2 - threshold) * len(normalised) / threshold) + 2}).fetchall()
+
+    scored = []
+    for item_id, item_name in candidates:
+        other = _normalise(item_name)
+        score = _similarity(trigrams, Counter(other[i:i + 3] for i in range(len(other) - 2)))
+        if score >= threshold:
+            scored.append((item_id, item_name, round(score, 3)))
+    scored.sort(key=lambda match: (-match[2], match[0]))
+    return scored[:limit]
+
+
+if __name__ == "__main__":
+    from actions import initialise_database, show_search_results
+
+    parser = argparse.ArgumentParser(description="Search items, people and household needs.")
+    parser.add_argument("text")
+    parser.add_argument("--similar", action="store_true", help="find items whose names look like this one instead")
+    args = parser.parse_args()
+
+    initialise_database()
+    if args.similar:
+        for item_id, item_name, score in find_similar_items(args.text):
+            print(f"{item_id}: {item_name} ({score:.0%} alike)")
+    else:
+        show_search_results(args.text)
@@ -0,0 +1,190 @@
+"""
+Works out the fewest transfers needed to settle every debt in the house.
+Instead of everyone paying back each debt separately, all debts are netted per person (what they are owed minus what they owe),
+then the biggest debtor repeatedly pays the biggest creditor until everyone is square. This never needs more than
+(people - 1) transfers.
+
+All the maths is done in whole cents so the transfers always add up exactly.
+"""
+import heapq
+import math
+
+from fractions import Fraction
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+from constants import split_methods
+from database import get_connection
+from money import Dollars, Money
+
+_numpy = False  # not looked for yet. see load_numpy
+
+def load_numpy():
+    """
+    Imports numpy the first time it is needed rather than at startup, since it is slow to import.
+    numpy is optional, so this returns None if it isn't installed and netting falls back to plain python.
+
+    Time complexity: O(1) after the first call
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = None
+    return _numpy
+
+
+############################ NETTING #######################################
+def split_amount(amount: Dollars, shares: Union[Sequence[int], Dict[int, Dollars]], method: str = "equal") -> Dict[int, Money]:
+    """
+    Divides an amount between people in whole cents that always add up to exactly the amount.
+    Cents left over from rounding go one each to whoever was rounded down the most (the first listed on a tie),
+    so nobody ends up more than a cent away from their exact share.
+
+    Args:
+        amount (Money or dollars): the total
+        shares (list or dict): for "equal", the people's ids. Otherwise person id -> their share: a weight for "weighted",
+            a percentage for "percentage" (adding up to 100) or dollars for "exact" (adding up to the amount)
+        method (str, optional): one of split_methods
+
+    Returns:
+        dict: person id -> their share as Money, in the order the people were given
+
+    Raises:
+        ValueError: if the method is unknown, there is nobody to split between, or the shares don't add up
+
+    Time complexity: O(p log p) where p is the number of people
+    """
+    if method not in split_methods:
+        raise ValueError(f"Unknown split '{method}'. Choose from: {', '.join(split_methods)}")
+    if not isinstance(shares, dict):
+        shares = dict.fromkeys(shares, 1)
+    if not shares:
+        raise ValueError("There has to be at least one person to split it between.")
+    total = Money.from_dollars(amount)
+    if total <= 0:
+        raise ValueError("The amount has to be more than 0.")
+
+    if method == "exact":
+        cents = {person: Money.from_dollars(share) for person, share in shares.items()}
+        if any(share < 0 for share in cents.values()):
+            raise ValueError("Nobody's share can be less than 0.")
+        if sum(cents.values()) != total:
+            raise ValueError(f"The shares add up to ${sum(cents.values(), Money(0))}, not ${total}.")
+        return cents
+
+    # exact fractions, so percentages like 33.3 don't pick up float error before rounding
+    weights = {person: Fraction(1) if method == "equal" else Fraction(str(share)) for person, share in shares.items()}
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("Nobody's share can be less than 0.")
+    if method == "percentage" and sum(weights.values()) != 100:
+        raise ValueError(f"The percentages add up to {float(sum(weights.values())):g}, not 100.")
+    if sum(weights.values()) == 0:
+        raise ValueError("At least one share has to be more than 0.")
+
+    exact = {person: total * weight / sum(weights.values()) for person, weight in weights.items()}
+    cents = {person: math.floor(share) for person, share in exact.items()}
+    left_over = total - sum(cents.values())
+    for person in sorted(exact, key=lambda person: exact[person] - cents[person], reverse=True)[:left_over]:
+        cents[person] += 1
+    return {person: Money(share) for person, share in cents.items()}
+
+def net_debts(owed_by: Sequence[int], owed_to: Sequence[int], cents: Sequence[int]) -> Dict[int, int]:
+    """
+    Nets a list of debts into one balance per person. Uses numpy when it is installed, which is much faster for millions of debts.
+
+    Args:
+        owed_by: person id of the debtor of each debt
+        owed_to: person id of the person owed for each debt
+        cents: amount of each debt in cents
+
+    Returns:
+        dict: person id -> net balance in cents (positive means they are owed money, negative means they owe). People who are square are left out.
+
+    Time complexity: O(d) where d is the number of debts
+    """
+    numpy = load_numpy()
+    if numpy is not None and len(cents) > 0:
+        owed_by_array = numpy.asarray(owed_by, dtype=numpy.int64)
+        owed_to_array = numpy.asarray(owed_to, dtype=numpy.int64)
+        weights = numpy.asarray(cents, dtype=numpy.float64)
+        size = int(max(owed_by_array.max(), owed_to_array.max())) + 1
+
+        # person ids are small positive integers, so they can index the totals directly.
+        # float64 sums of whole cents are exact below 2**53
+        totals = (numpy.bincount(owed_to_array, weights=weights, minlength=size)
+                  - numpy.bincount(owed_by_array, weights=weights, minlength=size)).astype(numpy.int64)
+        people = numpy.flatnonzero(totals)
+        return dict(zip(people.tolist(), totals[people].tolist()))
+
+    net: Dict[int, int] = {}
+    for debtor, creditor, amount in zip(owed_by, owed_to, cents):
+        net[debtor] = net.get(debtor, 0) - amount
+        net[creditor] = net.get(creditor, 0) + amount
+    return {person: balance for person, balance in net.items() if balance != 0}
+
+def get_net_balances() -> Dict[int, int]:
+    """
+    Nets every unresolved debt in the database into one balance per person.
+    Reads PairwiseBalances rather than every debt, since the triggers already keep it summed per pair.
+
+    Returns:
+        dict: person id -> net balance in cents (positive means they are owed money, negative means they owe)
+
+    Time complexity: O(b) where b is the number of pairs of people with a debt between them
+    """
+    with get_connection() as conn:
+        rows = conn.execute("SELECT owed_by, owed_to, total_cents FROM PairwiseBalances;").fetchall()
+
+    return net_debts([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+
+
+############################ PLANNING #######################################
+def plan_settlement(net: Dict[int, int]) -> List[Tuple[int, int, int]]:
+    """
+    Greedily matches the biggest debtor with the biggest creditor until everyone is square, using two heaps.
+
+    Args:
+        net: person id -> net balance in cents, as returned by net_debts/get_net_balances
+
+    Returns:
+        list of (payer id, payee id, cents) transfers, at most (people - 1) of them
+
+    Time complexity: O(n log n) where n is the number of people with a non-zero balance
+    """
+    if sum(net.values()) != 0:
+        raise ValueError("Net balances do not add up to zero, so they cannot be settled.")
+
+    # heapq is a min-heap, so both are stored negated to pop the biggest amount first
+    creditors = [(-balance, person) for person, balance in net.items() if balance > 0]
+    debtors = [(balance, person) for person, balance in net.items() if balance < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        credit, debt = -credit, -debt
+        amount = min(credit, debt)
+        transfers.append((debtor, creditor, amount))
+
+        # whoever isn't square yet goes back in the heap with what's left
+        if credit > amount:
+            heapq.heappush(creditors, (-(credit - amount), creditor))
+        if debt > amount:
+            heapq.heappush(debtors, (-(debt - amount), debtor))
+
+    return transfers
+
+def plan_settles(plan: Iterable[Tuple[int, int, int]], net: Dict[int, int]) -> bool:
+    """
+    Checks that carrying out every transfer in the plan would leave everyone square.
+
+    Time complexity: O(t+n) where t is the number of transfers and n the number of people with a balance
+    """
+    remaining = dict(net)
+    for payer, payee, cents in plan:
+        remaining[payer] = remaining.get(payer, 0) + cents
+        remaining[payee] = remaining.get(payee, 0) - cents
+    return all(balance == 0 for balance in remaining.values())
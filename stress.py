@@ -0,0 +1,199 @@
+"""
+Stress test for several programs using one database at once. Run with `python stress.py`.
+Starts a number of processes that all hammer the same throwaway database for a while, adding and settling debts,
+racing each other to mark the same household needs as purchased, and reading balances in between,
+then reports how each kind of operation fared and checks nothing was counted twice.
+
+    python stress.py                                  # 8 processes for 10 seconds
+    python stress.py --processes 16 --seconds 30
+    python stress.py --compare                        # also run with no busy timeout and no retries, to see the difference
+
+Every operation ends up as one of:
+    ok        it did what it set out to
+    already   someone else got there first (a need already purchased, a debt already settled)
+    conflict  the debt or need changed between reading its version and writing (util.ConflictError)
+    locked    it gave up waiting for the write lock ("database is locked")
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from typing import Dict, List
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import balances
+import database
+import util
+from constants import busy_timeout_ms, busy_retries
+from generate_data import generate
+
+operations = ("add_debt", "settle_debt", "add_need", "purchase", "read")
+weights = (30, 20, 10, 20, 20)  # how often each operation is picked, out of the total
+
+# made-up data to start from
+start_people, start_items, start_debts, start_needs = 20, 100, 5000, 50
+
+
+############################ ONE PROCESS #######################################
+def _do(operation: str, rng: random.Random, debts: int) -> str:
+    """
+    Runs one operation the way a person using the program would: read what's there, then change it.
+
+    Returns:
+        str: "ok" or "already"
+
+    Time complexity: O(1), apart from the reads
+    """
+    if operation == "add_debt":
+        owed_by, owed_to = rng.sample(range(1, start_people + 1), 2)
+        util.add_debt(owed_to, rng.randint(1, start_items), owed_by, owed_to, rng.randint(100, 5000) / 100, "2024-03-01")
+    elif operation == "settle_debt":
+        debt_id = rng.randint(1, debts)
+        if not util.settle_debt(debt_id, expected_version=util.get_debt_version(debt_id)):
+            return "already"
+    elif operation == "add_need":
+        util.add_household_need(rng.randint(1, start_items), rng.randint(100, 5000) / 100)
+    elif operation == "purchase":
+        # everyone looks at the same first few needs on the list, so they keep picking the same ones
+        page = util.get_needs_to_be_purchased_page(0, 3)
+        if not page:
+            return "already"
+        need_id = rng.choice(page)[0]
+        if not util.set_need_as_purchased(need_id, util.get_need_version(need_id)):
+            return "already"
+    else:
+        util.get_total_owed_per_person()
+        util.get_unresolved_debts_page(rng.randint(0, debts), 20)
+    return "ok"
+
+def _worker(path: str, seconds: float, seed: int, timeout_ms: int, retries: int) -> Dict[str, object]:
+    """
+    One process's share of the test: picks operations at random until the time is up.
+
+    Returns:
+        dict: per operation, how many ended each way and how long each took (seconds), plus the busy stats
+
+    Time complexity: O(n) where n is the number of operations it gets through
+    """
+    database.set_database_path(path)
+    database.set_busy_timeout(timeout_ms, retries)
+    rng = random.Random(seed)
+    results = {operation: {"ok": 0, "already": 0, "conflict": 0, "locked": 0, "latencies": []} for operation in operations}
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        try:
+            outcome = _do(operation, rng, start_debts)
+        except util.ConflictError:
+            outcome = "conflict"
+        except sqlite3.OperationalError as error:
+            if not database.is_busy_error(error):
+                raise
+            outcome = "locked"
+        results[operation][outcome] += 1
+        results[operation]["latencies"].append(time.perf_counter() - start)
+
+    database.close_connection()
+    return {"operations": results, "busy": database.get_busy_stats()}
+
+
+############################ THE WHOLE TEST #######################################
+def _percentile(values: List[float], percent: int) -> float:
+    """
+    Time complexity: O(n log n)
+    """
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+def run_stress(processes: int = 8, seconds: float = 10.0, timeout_ms: int = busy_timeout_ms, retries: int = busy_retries, seed: int = 0) -> Dict[str, object]:
+    """
+    Fills a throwaway database, lets `processes` processes loose on it for `seconds`, then checks the result.
+
+    Returns:
+        dict: per operation the counts and p50/p95/p99 latency in milliseconds, the busy stats added up over every
+        process, and "problems": everything that doesn't add up (balances that drifted, a need purchased twice
+        or a debt settled twice). An empty list of problems means the database came through intact.
+
+    Time complexity: O(n+d) where n is the number of operations run and d the number of debts
+    """
+    original_path = database.get_database_path()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        database.set_database_path(path)
+        generate(people=start_people, items=start_items, debts=start_debts, needs=start_needs, seed=seed)
+        with database.get_connection() as conn:
+            purchased_before = conn.execute("SELECT COUNT(*) FROM HouseholdNeeds WHERE is_purchased = 1;").fetchone()[0]
+            settled_before = conn.execute("SELECT COUNT(*) FROM DebtMapping WHERE settled = 1;").fetchone()[0]
+        database.close_connection()
+
+        # spawn rather than fork, so each process starts clean like a separately started program would
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(processes) as pool:
+            runs = pool.starmap(_worker, [(path, seconds, seed + number, timeout_ms, retries) for number in range(processes)])
+
+        report = {"processes": processes, "seconds": seconds, "busy_timeout_ms": timeout_ms, "retries": retries, "operations": {}}
+        for operation in operations:
+            counts = {outcome: sum(run["operations"][operation][outcome] for run in runs) for outcome in ("ok", "already", "conflict", "locked")}
+            latencies = sorted(latency for run in runs for latency in run["operations"][operation]["latencies"])
+            report["operations"][operation] = {**counts, **{f"p{percent}_ms": _percentile(latencies, percent) * 1000 for percent in (50, 95, 99)}}
+        report["busy"] = {key: sum(run["busy"][key] for run in runs) for key in ("waits", "retries", "gave_up")}
+
+        problems = [f"{table} {key}: stored {stored}, expected {expected}" for table, key, stored, expected in balances.check_balances()]
+        with database.get_connection() as conn:
+            purchased = conn.execute("SELECT COUNT(*) FROM HouseholdNeeds WHERE is_purchased = 1;").fetchone()[0] - purchased_before
+            settled = conn.execute("SELECT COUNT(*) FROM DebtMapping WHERE settled = 1;").fetchone()[0] - settled_before
+        if purchased != report["operations"]["purchase"]["ok"]:
+            problems.append(f"{report['operations']['purchase']['ok']} purchases succeeded but {purchased} needs were purchased")
+        if settled != report["operations"]["settle_debt"]["ok"]:
+            problems.append(f"{report['operations']['settle_debt']['ok']} settles succeeded but {settled} debts were settled")
+        report["problems"] = problems
+        database.close_connection()
+
+    database.set_database_path(original_path)
+    return report
+
+def print_report(report: Dict[str, object]) -> None:
+    """
+    Time complexity: O(1)
+    """
+    print(f"{report['processes']} processes for {report['seconds']:g} s, busy timeout {report['busy_timeout_ms']} ms, {report['retries']} retries:")
+    print(f"  {'operation':<12} {'ok':>7} {'already':>8} {'conflict':>9} {'locked':>7} {'success':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for operation, stats in report["operations"].items():
+        attempts = stats["ok"] + stats["already"] + stats["conflict"] + stats["locked"]
+        success = (stats["ok"] + stats["already"]) / attempts if attempts else 1.0  # "already" is a correct answer, not a failure
+        print(f"  {operation:<12} {stats['ok']:>7} {stats['already']:>8} {stats['conflict']:>9} {stats['locked']:>7} {success:>8.1%}"
+              f" {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+    busy = report["busy"]
+    print(f"  found the database locked {busy['waits']} times, retried {busy['retries']} times, gave up {busy['gave_up']} times")
+    for problem in report["problems"]:
+        print(f"  PROBLEM: {problem}")
+    if not report["problems"]:
+        print("  balances consistent, nothing purchased or settled twice")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hammer one sharehouse database from several processes at once.")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--busy-timeout", type=int, default=busy_timeout_ms, metavar="MS")
+    parser.add_argument("--retries", type=int, default=busy_retries)
+    parser.add_argument("--compare", action="store_true", help="also run with no busy timeout and no retries")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    reports = [run_stress(args.processes, args.seconds, args.busy_timeout, args.retries, args.seed)]
+    print_report(reports[0])
+    if args.compare:
+        reports.append(run_stress(args.processes, args.seconds, 0, 0, args.seed))
+        print_report(reports[1])
+
+    raise SystemExit(1 if any(report["problems"] for report in reports) else 0)
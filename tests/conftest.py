@@ -0,0 +1,24 @@
+"""
+Shared fixtures. The modules live at the top of the repo rather than in a package, so that goes on the path first.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from actions import initialise_database
+from database import close_connection, using_database
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    A freshly migrated database file that every util.py call in the test goes to. Yields its path.
+    """
+    path = str(tmp_path / "sharehouse.db")
+    with using_database(path):
+        initialise_database()
+        yield path
+    close_connection(path)
@@ -0,0 +1,83 @@
+"""
+Two connections to the same database file: one holding the write lock while the other waits, retries or gives up,
+and one changing a debt after the other read its version.
+"""
+import sqlite3
+import threading
+
+import pytest
+
+import constants
+from database import close_connection, get_busy_stats, set_busy_timeout, transaction, using_database
+from util import ConflictError, add_debt, add_item, add_person, delete_debt, get_debt_version, settle_debt
+
+
+@pytest.fixture
+def no_busy_timeout(database):
+    """
+    sqlite gives up on a held lock straight away, so only transaction()'s own retries are waited on.
+    """
+    set_busy_timeout(0)
+    yield database
+    set_busy_timeout(constants.busy_timeout_ms, constants.busy_retries)
+
+
+def _hold_write_lock(path):
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE;")
+    return other
+
+
+def test_transaction_retries_until_the_lock_is_released(no_busy_timeout):
+    set_busy_timeout(0, retries=5)  # at least 775 ms of backoff in all, well past when the lock is let go
+    other = _hold_write_lock(no_busy_timeout)
+    release = threading.Timer(0.1, other.commit)
+    before = get_busy_stats()
+
+    release.start()
+    try:
+        with transaction():
+            add_person("Ann", "Lee")
+    finally:
+        release.join()
+        other.close()
+
+    after = get_busy_stats()
+    assert after["waits"] == before["waits"] + 1
+    assert after["retries"] > before["retries"]
+    assert after["gave_up"] == before["gave_up"]
+
+
+def test_transaction_gives_up_while_the_lock_is_held(no_busy_timeout):
+    set_busy_timeout(0, retries=1)
+    other = _hold_write_lock(no_busy_timeout)
+    before = get_busy_stats()
+
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="database is locked"):
+            with transaction():
+                add_person("Ann", "Lee")
+    finally:
+        other.close()
+
+    assert get_busy_stats()["gave_up"] == before["gave_up"] + 1
+
+
+def test_stale_expected_version_is_a_conflict(database):
+    add_person("Ann", "Lee")
+    add_person("Bo", "Park")
+    debt_id = add_debt(2, add_item("Milk", None), 1, 2, 10, "2024-03-05")
+    version = get_debt_version(debt_id)
+
+    # someone else, on their own connection, settles the debt in between
+    def settle_elsewhere():
+        with using_database(database):
+            settle_debt(debt_id, expected_version=version)
+        close_connection()
+    other = threading.Thread(target=settle_elsewhere)
+    other.start()
+    other.join()
+
+    with pytest.raises(ConflictError, match="changed by someone else"):
+        delete_debt(debt_id, expected_version=version)
+    assert get_debt_version(debt_id) == version + 1
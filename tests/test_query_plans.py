@@ -0,0 +1,75 @@
+"""
+Checks that the hot getters are served by the indexes from migrations.py instead of full table scans.
+Each getter's SQL is recorded as util.py sends it (parameters included) and run through EXPLAIN QUERY PLAN.
+"""
+import inspect
+
+import pytest
+
+import database
+import search
+import util
+from generate_data import generate
+
+# (getter, arguments, an index one of its plans has to use or None if any plans without a scan past the outermost loop will do)
+planned_getters = [
+    (util.get_owed_amounts, (), "idx_owedmoney_person_id"),
+    (util.get_debt_details, (), None),
+    (util.get_unresolved_debts_with_details, (), "idx_debtmapping_settled"),
+    (util.get_unresolved_debts_page, (), "idx_debtmapping_settled"),
+    (util.get_needs_to_be_purchased, (), "idx_householdneeds_unpurchased"),
+    (util.get_total_owed_per_person, (), "idx_owedmoney_person_id"),
+    (util.get_household_needs, (0,), "idx_householdneeds_unpurchased"),
+    (util.get_household_needs, (1,), "idx_householdneeds_purchased"),
+    (util.get_monthly_spending, (), None),  # reads the whole MonthlySpending rollup, never the debts
+    (util.get_budget_vs_actual, (), None),
+    (util.get_items_page, (0, 20, "paper"), None),  # common enough to fill the page from the window of ids LIKE'd first
+    (util.get_items_page, (0, 20, "zzz"), "ItemSearch"),
+    (util.get_people_page, (0, 20, "zzz"), "PeopleSearch"),
+    (search.search_items, ("paper",), "ItemSearch"),
+    (search.search_needs, ("paper",), "idx_householdneeds_unpurchased"),
+]
+
+
+def explain_getter(func, *args):
+    """
+    Calls a getter while recording every SELECT it runs, then asks sqlite how it would execute each one.
+
+    Returns:
+        list of (sql, query plan lines) pairs
+    """
+    conn = database.connect()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        inspect.unwrap(func)(*args)  # past the result cache, which might not run any SQL at all
+    finally:
+        conn.set_trace_callback(None)
+
+    return [(sql, [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)])
+            for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def plan_is_indexed(plan):
+    """
+    A plan passes if only the outermost loop may be a plain scan (every join is a lookup by index or primary key).
+    """
+    return not any(line.startswith("SCAN") and "INDEX" not in line for line in plan[1:])
+
+
+@pytest.fixture
+def filled_database(database):
+    generate(people=20, items=200, debts=2000, needs=300)
+    return database
+
+
+@pytest.mark.parametrize("func, args, expected_index", planned_getters,
+                         ids=[f"{func.__name__}{args}" for func, args, _ in planned_getters])
+def test_getter_uses_its_index(filled_database, func, args, expected_index):
+    plans = explain_getter(func, *args)
+    assert plans, f"{func.__name__} ran no SELECT"
+    for sql, plan in plans:
+        assert plan_is_indexed(plan), f"{sql}\n" + "\n".join(plan)
+    # a search page LIKEs a window of ids before going to the index, so the index only has to be in one of its plans
+    if expected_index is not None:
+        assert any(expected_index in line for _, plan in plans for line in plan), "\n\n".join(sql for sql, _ in plans)
@@ -0,0 +1,74 @@
+"""
+Searching items and needs: the trigram index, the LIKE it falls back on, and the near-duplicate suggestions.
+"""
+import pytest
+
+import database
+from search import find_similar_items, search_items, search_needs
+from util import add_household_need, add_item, add_items_bulk, get_items_page
+
+
+def _names(page):
+    return [row[1] for _, row in page]
+
+
+def _statements(func, *args):
+    """
+    Runs func and returns the SQL it sent.
+    """
+    conn = database.connect()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func(*args)
+    finally:
+        conn.set_trace_callback(None)
+    return statements
+
+
+@pytest.fixture
+def items(database):
+    for name in ["Paper 50% off", "Paper 500 sheets", "x_y tape", "xay tape", "Toilet paper", "toilet paper 24pk", "Dish soap"]:
+        add_item(name, None)
+    return database
+
+
+@pytest.mark.parametrize("text, expected", [("50%", ["Paper 50% off"]), ("x_y", ["x_y tape"]), ("_", ["x_y tape"])])
+def test_percent_and_underscore_only_match_themselves(items, text, expected):
+    assert _names(get_items_page(search=text)) == expected
+    assert [name for _, name, _ in search_items(text)] == expected
+
+
+def test_needs_search_treats_underscore_as_itself(items):
+    for item_id in (3, 4):
+        add_household_need(item_id, 5)
+    assert [name for _, name, _ in search_needs("x_y")] == ["x_y tape"]
+
+
+def test_text_shorter_than_a_trigram_is_liked_instead(items):
+    statements = _statements(get_items_page, 0, 20, "ap")
+    assert not any("ItemSearch" in sql for sql in statements)
+    assert _names(get_items_page(search="ap")) == ["Paper 50% off", "Paper 500 sheets", "x_y tape", "xay tape", "Toilet paper",
+                                                   "toilet paper 24pk", "Dish soap"]
+    assert sorted(name for _, name, _ in search_items("Ap")) == sorted(_names(get_items_page(search="ap")))
+
+
+def test_pages_carry_on_through_the_index_after_the_window(database):
+    # matches both inside the ids LIKE'd first (see util._search_page) and well past them
+    add_items_bulk((f"Needle {i}" if i in (10, 900, 1500) else f"Thread {i}", None) for i in range(1, 2001))
+
+    assert _names(get_items_page(search="needle")) == ["Needle 10", "Needle 900", "Needle 1500"]
+    assert _names(get_items_page(limit=2, search="needle")) == ["Needle 10", "Needle 900"]
+    assert _names(get_items_page(after=900, search="needle")) == ["Needle 1500"]
+    assert len(get_items_page(search="thread")) == 20
+
+
+def test_similar_items_respect_the_threshold(items):
+    suggested = find_similar_items("Toilet papr")
+    assert [name for _, name, _ in suggested][:2] == ["Toilet paper", "toilet paper 24pk"]
+    assert all(score >= 0.5 for _, _, score in suggested)
+    assert "Dish soap" not in [name for _, name, _ in suggested]
+
+    # "toilet paper 24pk" scores about 0.8 against "Toilet paper"
+    assert [name for _, name, _ in find_similar_items("Toilet paper", threshold=0.7)] == ["Toilet paper", "toilet paper 24pk"]
+    assert find_similar_items("Toilet paper", threshold=0.9) == [(5, "Toilet paper", 1.0)]
@@ -0,0 +1,45 @@
+from balances import check_balances
+from money import Money
+from util import add_debt, add_household_need, add_item, add_person, add_split_expense, get_budget_vs_actual, get_monthly_spending, set_need_as_purchased
+
+
+def _spent(person_id):
+    return dict(get_monthly_spending(person_id))
+
+
+def test_debt_counts_as_spent_by_whoever_is_owed(database):
+    add_person("Ann", "Lee")
+    add_person("Bo", "Park")
+    item_id = add_item("Milk", None)
+
+    add_debt(2, item_id, 1, 2, 10, "2024-03-05")  # Ann owes Bo, so Bo paid
+
+    assert _spent(2) == {"2024-03": Money(1000)}
+    assert _spent(1) == {"2024-03": Money(0)}
+    assert check_balances() == []
+
+
+def test_split_counts_its_whole_cost_as_spent_by_whoever_paid(database):
+    for first, last in [("Ann", "Lee"), ("Bo", "Park"), ("Cy", "Wu")]:
+        add_person(first, last)
+    item_id = add_item("Pizza", None)
+
+    add_split_expense(item_id, 3, 30, "2024-04-01", [1, 2, 3])
+    add_debt(3, item_id, 1, 3, 5, "2024-04-02")
+
+    assert _spent(3) == {"2024-04": Money(3500)}
+    assert _spent(1) == {"2024-04": Money(0)}
+    assert _spent(2) == {"2024-04": Money(0)}
+    assert check_balances() == []
+
+
+def test_only_bought_needs_count_towards_the_budget(database):
+    add_person("Ann", "Lee")
+    item_id = add_item("Dish soap", None)
+
+    need_id = add_household_need(item_id, 6, None, "2024-05-10")
+    assert get_budget_vs_actual() == []
+
+    set_need_as_purchased(need_id)
+    assert get_budget_vs_actual() == [("2024-05", Money(600), Money(0))]
+    assert check_balances() == []
@@ -1,43 +1,49 @@
-import sqlite3
-
-from typing import Dict, List, Optional, Tuple, Union
-from constants import table_names
+import re
+
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from constants import table_names, page_size, search_window
+from database import get_connection, transaction
+from item_catalog import invalidate_catalog
+from instrumentation import instrument
+from result_cache import cached, invalidate_results
+from money import Dollars, Money, money_or_none
+from settlement import get_net_balances, plan_settles, split_amount
 
 ############################ VIEWING/RESETTING DATABASE #######################################
+@instrument
 def view_database() -> None:
     """
     View the database in list format. Just in case you need to double check if all the data in the database is correct.
     Mostly used for debugging purposes.
+    Rows are printed straight from the cursor as they are read, so even huge tables don't get loaded into memory.
     
     Returns: None
 
     Time complexity: O(t+r) where t is the total number of tables and r is the total number of rows.
         This is due to iterating through every row in order to print out the contents
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
-
-    # get all table names
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-
-    for table in tables:
-        table_name = table[0]
-        print(f"\nContents of table: {table_name}")
-
-        # through current table, go through each item
-        cursor.execute(f"SELECT * FROM {table_name};")
-        rows = cursor.fetchall()
-
-        if rows:
-            # print row if exists
-            for row in rows:
+    with get_connection() as conn:
+        # get all table names. a separate cursor, since the one below is reused for each table while this is still being read
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
+        cursor = conn.cursor()
+
+        for table in tables:
+            table_name = table[0]
+            print(f"\nContents of table: {table_name}")
+
+            # through current table, go through each item
+            cursor.execute(f"SELECT * FROM {table_name};")
+            found = False
+            for row in cursor:
                 print(row)
-        else:
-            print("No data found.")
+                found = True
 
-    conn.close()
+            if not found:
+                print("No data found.")
 
+@instrument
 def reset_database() -> None:
     """
     Resets the database by deleting all data in every table. 
@@ -48,15 +54,65 @@ def reset_database() -> None:
     Time complexity: O(t) where t is the number of tables
         Iterates through all tables and deletes all its contents.
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    for table in table_names:
-        cursor.execute(f"DELETE FROM {table};")
-        print(f"All entries deleted from {table}.")
+        for table in table_names:
+            cursor.execute(f"DELETE FROM {table};")
+            print(f"All entries deleted from {table}.")
 
-    conn.commit()
-    conn.close()
+    invalidate_catalog()
+    invalidate_results()
+
+def page_through(fetch_page: Callable[..., List[Tuple[int, tuple]]], format_row: Callable[[tuple], str], empty_message: str) -> None:
+    """
+    Prints a listing one page at a time, letting the user move to the next/previous page or filter it.
+    If everything fits on one page it is just printed, with no extra prompt.
+
+    Args:
+        fetch_page: one of the *_page getters below, called as fetch_page(after=..., limit=..., search=...)
+        format_row: turns one row into the line to print
+        empty_message: printed when there is nothing to show
+
+    Returns:
+        None
+
+    Time complexity: O(p) per page shown, where p is page_size. Only one page is held in memory at a time.
+    """
+    page_starts = [0]  # the key each page visited so far starts after, so we can go back
+    search = None
+
+    while True:
+        # ask for one extra row, which tells us whether there is a next page without counting everything
+        page = fetch_page(after=page_starts[-1], limit=page_size + 1, search=search)
+        has_next = len(page) > page_size
+        page = page[:page_size]
+
+        if not page:
+            print(f"No matches for '{search}'." if search else empty_message)
+        for _, row in page:
+            print(format_row(row))
+
+        if len(page_starts) == 1 and not has_next and search is None:
+            return
+
+        controls = []
+        if has_next:
+            controls.append("'n' next page")
+        if len(page_starts) > 1:
+            controls.append("'p' previous page")
+        controls.append("'f' filter" if search is None else f"'f' change filter (currently '{search}')")
+        choice = input(f"Page {len(page_starts)}. Enter {', '.join(controls)}, or press Enter when done: ").strip().lower()
+
+        if choice == "n" and has_next:
+            page_starts.append(page[-1][0])
+        elif choice == "p" and len(page_starts) > 1:
+            page_starts.pop()
+        elif choice == "f":
+            search = input("Show only entries containing (leave empty to show everything): ").strip() or None
+            page_starts = [0]
+        elif choice == "":
+            return
 
 def show_person_options():
     """
@@ -65,13 +121,10 @@ def show_person_options():
     Returns:
         None
 
-    Time complexity: O(n) where n is the total number of people in the sharehouse
-        Iterates through every person and prints out their names.
+    Time complexity: O(p) per page shown, where p is page_size
     """
-    people = get_people()
     print("Select a person from the following list by enterring the number next to it:")
-    for person in people:
-        print(f"{person['person_id']}: {person['full_name']}")
+    page_through(get_people_page, lambda person: f"{person[0]}: {person[1]}", "No people found.")
 
 def show_item_options():
     """
@@ -80,13 +133,10 @@ def show_item_options():
     Returns:
         None
 
-    Time complexity: O(m) where m is the total number of items
-        Iterates through every item and prints it out
+    Time complexity: O(p) per page shown, where p is page_size
     """
-    items = get_items()
     print("Select an item from the following list by enterring the number next to it:")
-    for it in items:
-        print(f"{it['item_id']}: {it['item_name']}")
+    page_through(get_items_page, lambda item: f"{item[0]}: {item[1]}", "No items found.")
 
 def show_unresolved_debts() -> None:
     """
@@ -95,18 +145,13 @@ def show_unresolved_debts() -> None:
     Returns:
         None
 
-    Time complexity: O(d) where d is the number of unresolved debts.
-        Iterates through all unresolved debts and prints it out
+    Time complexity: O(p) per page shown, where p is page_size
     """
-    unresolved_debts = get_unresolved_debts_with_details()
-    
-    if not unresolved_debts:
-        print("No unresolved debts found.")
-        return
-
-    for debt in unresolved_debts:
+    def format_debt(debt: Tuple[int, str, str, str, Money]) -> str:
         debt_id, owed_by_name, owed_to_name, item_name, amount = debt
-        print(f"{debt_id}: {owed_by_name} owes {owed_to_name} for {item_name} which costs ${amount}.")
+        return f"{debt_id}: {owed_by_name} owes {owed_to_name} for {item_name} which costs ${amount}."
+
+    page_through(get_unresolved_debts_page, format_debt, "No unresolved debts found.")
 
 def show_needs_to_be_purchased() -> None:
     """
@@ -115,239 +160,575 @@ def show_needs_to_be_purchased() -> None:
     Returns:
         None
 
-    Time complexity: O(h) where h is the number of household needs
+    Time complexity: O(p) per page shown, where p is page_size
     """
-    needs = get_needs_to_be_purchased()
+    def format_need(need: Tuple[int, str, Money]) -> str:
+        need_id, item_name, budget = need
+        return f"{need_id}: {item_name} with the budget ${budget}"
 
-    if needs:
-        for need_id, item_name, budget in needs:
-            print(f"{need_id}: {item_name} with the budget ${budget}")
-    else:
-        print("All household needs have been purchased!")
+    page_through(get_needs_to_be_purchased_page, format_need, "All household needs have been purchased!")
+
+############################ CHECKING DATES #######################################
+def check_date(value: Optional[str], required: bool = True) -> Optional[str]:
+    """
+    Makes sure a purchase date is a real date written YYYY-MM-DD, the only form the database accepts (see migration 5).
+    Dates in that form sort and compare correctly as plain text, which is what lets the date indexes and monthly rollups work.
+
+    Args:
+        value (str): the date as entered
+        required (bool, optional): whether leaving it blank is an error, rather than meaning no date
+
+    Returns:
+        str: the date with any surrounding spaces removed, or None if it was blank and that's allowed
+
+    Raises:
+        ValueError: if it isn't a real YYYY-MM-DD date, or is blank when required
+
+    Time complexity: O(1)
+    """
+    value = (value or "").strip()
+    if not value:
+        if required:
+            raise ValueError("A date is needed (YYYY-MM-DD).")
+        return None
+    try:
+        if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+            raise ValueError
+        date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{value}' isn't a date written YYYY-MM-DD.") from None
+    return value
+
+############################ CONFLICTS #######################################
+class ConflictError(ValueError):
+    """
+    Raised when a change was made on the strength of a debt or need as it was when read (its version, see
+    get_debt_version and get_need_version), but someone else has changed or removed it since.
+    Nothing is changed: read it again and decide whether the change still makes sense.
+    """
+
+def _check_version(conn, table: str, key: str, row_id: int, expected_version: Optional[int], what: str) -> None:
+    """
+    After a conditional update changed nothing, works out whether that was because of the version check.
+
+    Raises:
+        ConflictError: if expected_version was given and the row has since changed or gone
+
+    Time complexity: O(1)
+    """
+    if expected_version is None:
+        return
+    row = conn.execute(f"SELECT version FROM {table} WHERE {key} = ?;", (row_id,)).fetchone()
+    if row is None:
+        raise ConflictError(f"{what} {row_id} has been deleted by someone else.")
+    if row[0] != expected_version:
+        raise ConflictError(f"{what} {row_id} has been changed by someone else (version {row[0]}, expected {expected_version}).")
 
 ############################ ADDING OR REMOVING FROM DATABASE #######################################
 
+@instrument
 def add_person(first_name: str, last_name: str, allergies: Optional[str] = None, misc_info: Optional[str] = None) -> None:
     """
     Adds a new person to the database
     
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""INSERT INTO People (first_name, last_name, allergies, misc_info)
-                   VALUES (?, ?, ?, ?)""", (first_name, last_name, allergies, misc_info))
-    
-    conn.commit()
-    conn.close()
+        cursor.execute("""INSERT INTO People (first_name, last_name, allergies, misc_info)
+                       VALUES (?, ?, ?, ?)""", (first_name, last_name, allergies, misc_info))
 
+@instrument
 def delete_person(person_id: int) -> None:
     """
     Deletes a person from the database by person_id.
     
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("DELETE FROM People WHERE person_id = ?", (person_id,))
-    conn.commit()
-    conn.close()
+        cursor.execute("DELETE FROM People WHERE person_id = ?", (person_id,))
 
-def add_item(item_name: str, default_cost: float) -> None:
+@instrument
+def add_item(item_name: str, default_cost: Optional[Dollars]) -> int:
     """
     Adds a new item to the Items table.
+
+    Args:
+        item_name (str): what it's called
+        default_cost (Money or dollars, optional): what it usually costs
+
+    Returns:
+        int: the id sqlite gave the new item
     
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-    INSERT INTO Items (item_name, default_cost)
-    VALUES (?, ?)
-    """, (item_name, default_cost))
+        cursor.execute("""
+        INSERT INTO Items (item_name, default_cost_cents)
+        VALUES (?, ?)
+        """, (item_name, None if default_cost is None else Money.from_dollars(default_cost)))
 
-    conn.commit()
-    conn.close()
+    invalidate_catalog()
+    return cursor.lastrowid
 
+@instrument
 def delete_item(item_id: int) -> None:
     """
     Deletes an item from the Items table by item_id.
     
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("DELETE FROM Items WHERE item_id = ?", (item_id,))
-    conn.commit()
-    conn.close()
+        cursor.execute("DELETE FROM Items WHERE item_id = ?", (item_id,))
 
-def add_debt(person_id: int, item_id: int, owed_by: int, owed_to: int, amount: float, purchase_date: str) -> None:
+    invalidate_catalog()
+
+@instrument
+def add_debt(person_id: int, item_id: int, owed_by: int, owed_to: int, amount: Dollars, purchase_date: str) -> int:
     """
-    Adds a new debt to the DebtMapping table.
+    Adds a new debt to the DebtMapping table. The purchase behind it is recorded as bought by owed_to,
+    who paid for it and is owed the money back.
+
+    Args:
+        amount (Money or dollars): what owed_by owes, stored as whole cents
+
+    Returns:
+        int: the debt's origin_id, which is what delete_debt takes
     
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-    INSERT INTO OriginOfOwedMoney (item_id, purchase_date, purchased_by)
-    VALUES (?, ?, ?)
-    """, (item_id, purchase_date, owed_by))
+        cents = Money.from_dollars(amount)
+        cursor.execute("""
+        INSERT INTO OriginOfOwedMoney (item_id, purchase_date, purchased_by, amount_cents)
+        VALUES (?, ?, ?, ?)
+        """, (item_id, purchase_date, owed_to, cents))
 
-    origin_id = cursor.lastrowid  # getting id of inserted row to add to debt mapping
+        origin_id = cursor.lastrowid  # getting id of inserted row to add to debt mapping
 
-    cursor.execute("""
-    INSERT INTO DebtMapping (origin_id, owed_by, owed_to, amount)
-    VALUES (?, ?, ?, ?)
-    """, (origin_id, owed_by, owed_to, amount))
+        cursor.execute("""
+        INSERT INTO DebtMapping (origin_id, owed_by, owed_to, amount_cents)
+        VALUES (?, ?, ?, ?)
+        """, (origin_id, owed_by, owed_to, cents))
 
-    conn.commit()
-    conn.close()
+    return origin_id
 
-def delete_debt(debt_id: int) -> None:
+@instrument
+def add_split_expense(item_id: int, paid_by: int, amount: Dollars, purchase_date: str, shares: Union[Sequence[int], Dict[int, Dollars]], method: str = "equal") -> int:
     """
-    Deletes a debt from the DebtMapping table by debt_id.
-    
+    Adds one purchase shared between several people: a single OriginOfOwedMoney row for the whole cost (which is what
+    counts as spent, by whoever paid), and a DebtMapping row for each person sharing it (other than whoever paid)
+    for what they owe the payer. Everything is written in one transaction.
+
+    Args:
+        item_id (int): what was bought
+        paid_by (int): the person who paid, and who everyone else now owes. Include them in shares if they share it too.
+        amount (Money or dollars): the whole cost
+        purchase_date (str): YYYY-MM-DD
+        shares (list or dict): who shares it and how, see settlement.split_amount
+        method (str, optional): one of split_methods
+
+    Returns:
+        int: the purchase's origin_id, which is the debt number every share is listed under
+
+    Raises:
+        ValueError: if the shares don't work out, see settlement.split_amount
+
+    Time complexity: O(p log p) where p is the number of people sharing it
+    """
+    cents = split_amount(amount, shares, method)
+    with transaction() as conn:
+        cursor = conn.execute("""
+            INSERT INTO OriginOfOwedMoney (item_id, purchase_date, purchased_by, amount_cents)
+            VALUES (?, ?, ?, ?);
+        """, (item_id, purchase_date, paid_by, sum(cents.values())))
+        origin_id = cursor.lastrowid
+
+        conn.executemany("""
+            INSERT INTO DebtMapping (origin_id, owed_by, owed_to, amount_cents)
+            VALUES (?, ?, ?, ?);
+        """, [(origin_id, person, paid_by, share) for person, share in cents.items() if person != paid_by and share > 0])
+
+    return origin_id
+
+@instrument
+def delete_debt(debt_id: int, expected_version: Optional[int] = None) -> bool:
+    """
+    Deletes a debt entirely, along with where it came from, as if it had never been entered.
+    Only for debts entered by mistake: a debt that has been paid should be settled with settle_debt so its history is kept.
+
+    Args:
+        debt_id (int): the debt's number (its origin_id)
+        expected_version (int, optional): only delete it if it hasn't changed since it was read at this version
+
+    Returns:
+        bool: whether there was a debt to delete
+
+    Raises:
+        ConflictError: if expected_version was given and someone else has changed or deleted the debt since
+
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        unchanged = "(:version IS NULL OR (SELECT version FROM OriginOfOwedMoney WHERE origin_id = :id) = :version)"
+        params = {"id": debt_id, "version": expected_version}
+
+        # the shares go first, their triggers still need the origin to undo the monthly spending
+        cursor.execute(f"DELETE FROM DebtMapping WHERE origin_id = :id AND {unchanged};", params)
+        cursor.execute("DELETE FROM OriginOfOwedMoney WHERE origin_id = :id AND (:version IS NULL OR version = :version);", params)
+        if cursor.rowcount == 0:
+            _check_version(conn, "OriginOfOwedMoney", "origin_id", debt_id, expected_version, "Debt")
+            return False
+
+    return True
+
+def _utc_timestamp(ago: timedelta = timedelta(0)) -> str:
+    """
+    The time (or the time some while ago) in UTC, in the same format as sqlite's datetime('now').
+    Worked out here rather than in the SQL so the exact same value can be written to more than one copy of the database.
+
+    Time complexity: O(1)
+    """
+    return (datetime.now(timezone.utc) - ago).strftime("%Y-%m-%d %H:%M:%S")
+
+@instrument
+def settle_debt(debt_id: int, owed_by: Optional[int] = None, expected_version: Optional[int] = None) -> int:
+    """
+    Marks a debt as paid. It stops counting towards anyone's balance straight away and stays in DebtMapping,
+    flagged as settled with the time it was settled, until archive_settled_debts moves it into the history.
+
+    Args:
+        debt_id (int): the debt's number (its origin_id)
+        owed_by (int, optional): for a split purchase, settle only this person's share. Defaults to everyone's.
+        expected_version (int, optional): only settle it if the debt hasn't changed since it was read at this version
+
+    Returns:
+        int: the number of debts settled (0 if it didn't exist or was already settled, by someone else or earlier)
+
+    Raises:
+        ConflictError: if expected_version was given and someone else has changed or deleted the debt since
+
+    Time complexity: O(1)
+    """
+    with transaction() as conn:
+        # only unsettled shares are touched, so two people settling the same debt at once can't both count it
+        settled = conn.execute("""
+            UPDATE DebtMapping SET settled = 1, settled_at = :now
+            WHERE origin_id = :id AND settled = 0 AND (:owed_by IS NULL OR owed_by = :owed_by)
+                AND (:version IS NULL OR (SELECT version FROM OriginOfOwedMoney WHERE origin_id = :id) = :version);
+        """, {"now": _utc_timestamp(), "id": debt_id, "owed_by": owed_by, "version": expected_version}).rowcount
+
+        if settled:
+            conn.execute("UPDATE OriginOfOwedMoney SET version = version + 1 WHERE origin_id = ?;", (debt_id,))
+        else:
+            _check_version(conn, "OriginOfOwedMoney", "origin_id", debt_id, expected_version, "Debt")
+
+    return settled
+
+@instrument
+def archive_settled_debts(older_than_days: int = 0) -> int:
+    """
+    Moves settled debts out of DebtMapping into the SettledDebts history, along with the item, date and purchaser
+    from OriginOfOwedMoney, all in one transaction. Keeps DebtMapping down to the open debts however many years
+    of history build up. The OriginOfOwedMoney row stays, since it is what the purchase counts as spent.
+
+    Args:
+        older_than_days (int, optional): only archive debts settled at least this many days ago. 0 archives every settled debt.
 
-    cursor.execute("DELETE FROM DebtMapping WHERE origin_id = ?", (debt_id,))
-    conn.commit()
-    conn.close()
+    Returns:
+        int: the number of debts archived
 
-def add_household_need(item_id: int, budget: float, purchased_by: Optional[int] = None, purchase_date: Optional[str] = None, is_purchased: int = 0) -> None:
+    Time complexity: O(s) where s is the number of settled debts in DebtMapping
+    """
+    cutoff = _utc_timestamp(timedelta(days=older_than_days))
+    with transaction() as conn:
+        cursor = conn.execute("""
+            INSERT INTO SettledDebts (origin_id, item_id, purchase_date, purchased_by, owed_by, owed_to, amount_cents, settled_at)
+            SELECT dm.origin_id, oom.item_id, oom.purchase_date, oom.purchased_by, dm.owed_by, dm.owed_to, dm.amount_cents, dm.settled_at
+            FROM DebtMapping dm
+            LEFT JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
+            WHERE dm.settled = 1 AND COALESCE(dm.settled_at, '') <= ?;
+        """, (cutoff,))
+        archived = cursor.rowcount
+
+        conn.execute("DELETE FROM DebtMapping WHERE settled = 1 AND COALESCE(settled_at, '') <= ?;", (cutoff,))
+
+    return archived
+
+@instrument
+def add_household_need(item_id: int, budget: Dollars, purchased_by: Optional[int] = None, purchase_date: Optional[str] = None, is_purchased: int = 0) -> int:
     """
     Adds a new entry to the HouseholdNeeds table.
 
     Args:
         item_id (int): The ID of the item.
-        budget (float): The budget for the item.
+        budget (Money or dollars): The budget for the item.
         purchased_by (int, optional): The person ID of the purchaser. Default is None.
         purchase_date (str, optional): The date of purchase in YYYY-MM-DD format. Default is None.
         is_purchased (int, optional): Whether the item has been purchased (0 for No, 1 for Yes). Default is 0.
 
     Returns:
-        None
+        int: the id sqlite gave the new need
 
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        # insert the new household need
+        cursor.execute("""
+            INSERT INTO HouseholdNeeds (item_id, budget_cents, purchased_by, purchase_date, is_purchased)
+            VALUES (?, ?, ?, ?, ?);
+        """, (item_id, Money.from_dollars(budget), purchased_by, purchase_date, is_purchased))
 
-    # insert the new household need
-    cursor.execute("""
-        INSERT INTO HouseholdNeeds (item_id, budget, purchased_by, purchase_date, is_purchased)
-        VALUES (?, ?, ?, ?, ?);
-    """, (item_id, budget, purchased_by, purchase_date, is_purchased))
+    return cursor.lastrowid
 
-    conn.commit()
-    conn.close()
-    print("Household need added successfully.")
+
+############################ BULK ADDING TO DATABASE #######################################
+# each bulk function runs as one transaction with one commit, no matter how many rows it is given.
+# the rows can be any iterable (including a generator), and are inserted in chunks of bulk_chunk_size
+# so memory stays constant for huge imports.
+bulk_chunk_size = 5000
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    """
+    Splits any iterable into lists of at most size elements without ever loading the whole thing.
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+@instrument
+def add_people_bulk(people: Iterable[Tuple[str, str, Optional[str], Optional[str]]]) -> int:
+    """
+    Adds many people to the People table in a single transaction.
+
+    Args:
+        people: iterable of (first_name, last_name, allergies, misc_info) tuples
+
+    Returns:
+        int: the number of people added
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    count = 0
+    with transaction() as conn:
+        for chunk in _chunks(people, bulk_chunk_size):
+            conn.executemany("INSERT INTO People (first_name, last_name, allergies, misc_info) VALUES (?, ?, ?, ?);", chunk)
+            count += len(chunk)
+
+    return count
+
+@instrument
+def add_items_bulk(items: Iterable[Tuple[str, Optional[Dollars]]]) -> int:
+    """
+    Adds many items to the Items table in a single transaction.
+
+    Args:
+        items: iterable of (item_name, default_cost) tuples, with the cost as Money or dollars
+
+    Returns:
+        int: the number of items added
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    count = 0
+    with transaction() as conn:
+        for chunk in _chunks(items, bulk_chunk_size):
+            conn.executemany("INSERT INTO Items (item_name, default_cost_cents) VALUES (?, ?);",
+                             ((item_name, None if default_cost is None else Money.from_dollars(default_cost)) for item_name, default_cost in chunk))
+            count += len(chunk)
+
+    invalidate_catalog()
+    return count
+
+@instrument
+def add_debts_bulk(debts: Iterable[Tuple[int, int, int, Dollars, str]]) -> int:
+    """
+    Adds many debts in a single transaction. Each debt gets its own OriginOfOwedMoney row and a DebtMapping row pointing at it,
+    exactly like add_debt does, but the origin ids are handed out up front so both tables can be filled with executemany
+    instead of needing lastrowid after every insert.
+
+    Args:
+        debts: iterable of (item_id, owed_by, owed_to, amount, purchase_date) tuples, with the amount as Money or dollars
+
+    Returns:
+        int: the number of debts added
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    count = 0
+    with transaction() as conn:  # holds the write lock from the start, so nobody else can claim the ids we hand out
+
+        # AUTOINCREMENT never reuses ids, so continue from whichever is higher of the sequence and the current max
+        next_origin_id = conn.execute("""
+            SELECT MAX(
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'OriginOfOwedMoney'), 0),
+                COALESCE((SELECT MAX(origin_id) FROM OriginOfOwedMoney), 0)
+            ) + 1;
+        """).fetchone()[0]
+
+        for chunk in _chunks(debts, bulk_chunk_size):
+            origin_ids = range(next_origin_id, next_origin_id + len(chunk))
+            conn.executemany("""
+                INSERT INTO OriginOfOwedMoney (origin_id, item_id, purchase_date, purchased_by, amount_cents)
+                VALUES (?, ?, ?, ?, ?);
+            """, ((origin_id, item_id, purchase_date, owed_to, Money.from_dollars(amount))
+                  for origin_id, (item_id, owed_by, owed_to, amount, purchase_date) in zip(origin_ids, chunk)))
+            conn.executemany("""
+                INSERT INTO DebtMapping (origin_id, owed_by, owed_to, amount_cents)
+                VALUES (?, ?, ?, ?);
+            """, ((origin_id, owed_by, owed_to, Money.from_dollars(amount))
+                  for origin_id, (item_id, owed_by, owed_to, amount, purchase_date) in zip(origin_ids, chunk)))
+            next_origin_id += len(chunk)
+            count += len(chunk)
+
+    return count
+
+@instrument
+def add_household_needs_bulk(needs: Iterable[Tuple[int, Dollars, Optional[int], Optional[str], int]]) -> int:
+    """
+    Adds many household needs in a single transaction.
+
+    Args:
+        needs: iterable of (item_id, budget, purchased_by, purchase_date, is_purchased) tuples, with the budget as Money or dollars
+
+    Returns:
+        int: the number of needs added
+
+    Time complexity: O(r) where r is the number of rows
+    """
+    count = 0
+    with transaction() as conn:
+        for chunk in _chunks(needs, bulk_chunk_size):
+            conn.executemany("""
+                INSERT INTO HouseholdNeeds (item_id, budget_cents, purchased_by, purchase_date, is_purchased)
+                VALUES (?, ?, ?, ?, ?);
+            """, ((item_id, Money.from_dollars(budget), purchased_by, purchase_date, is_purchased)
+                  for item_id, budget, purchased_by, purchase_date, is_purchased in chunk))
+            count += len(chunk)
+
+    return count
 
 
 ############################ GETTING FROM DATABASE #######################################
+@instrument
+@cached
 def get_people() -> List[Dict[str, Union[int, str]]]:
     """
     Gets all people from the database and returns a list of dictionaries with their IDs and full names
     
     Time complexity: O(n) where n is the total number of people in the sharehouse
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("SELECT person_id, first_name, last_name FROM People;")
-    people = [
-        {"person_id": row[0], "full_name": f"{row[1]} {row[2]}"}
-        for row in cursor.fetchall()
-    ]
+        cursor.execute("SELECT person_id, first_name, last_name FROM People;")
+        people = [
+            {"person_id": row[0], "full_name": f"{row[1]} {row[2]}"}
+            for row in cursor.fetchall()
+        ]
 
-    conn.close()
     return people
 
-def get_owed_amounts() -> List[Dict[str, Union[int, str, float]]]:
+@instrument
+@cached
+def get_owed_amounts() -> List[Dict[str, Union[int, str, Money]]]:
     """
     Gets the total owed amount for each person from the database
     Returns: list of dictionaries with person ID, name, and amount owed
     
-    Time complexity: O(d) where d is the number of unresolved debts.
+    Time complexity: O(n) where n is the number of people who owe money.
+        The totals are kept up to date in OwedMoney by triggers, so no debts are summed here.
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-    SELECT People.person_id, first_name, last_name, SUM(amount)
-    FROM DebtMapping
-    JOIN People ON DebtMapping.owed_by = People.person_id
-    GROUP BY People.person_id;
-    """)
+        cursor.execute("""
+        SELECT People.person_id, first_name, last_name, OwedMoney.total_cents
+        FROM OwedMoney
+        JOIN People ON OwedMoney.person_id = People.person_id
+        ORDER BY OwedMoney.person_id;
+        """)
 
-    owed_amounts = [
-        {"person_id": row[0], "full_name": f"{row[1]} {row[2]}", "amount_owed": row[3] or 0}
-        for row in cursor.fetchall()
-    ]
+        owed_amounts = [
+            {"person_id": row[0], "full_name": f"{row[1]} {row[2]}", "amount_owed": Money(row[3] or 0)}
+            for row in cursor.fetchall()
+        ]
 
-    conn.close()
     return owed_amounts
 
-def get_debt_details() -> List[Dict[str, Union[int, str, float]]]:
+@instrument
+@cached
+def get_debt_details() -> List[Dict[str, Union[int, str, Money]]]:
     """
     Gets detailed debt records, including what was owed, who owes it, and to whom
     Returns a list of dictionaries with debt details
     
     Time complexity: O(d) where d is the number of debts that exist
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    SELECT 
-        DM.origin_id,
-        P1.first_name || ' ' || P1.last_name AS owed_by,
-        P2.first_name || ' ' || P2.last_name AS owed_to,
-        Items.item_name,
-        DM.amount
-    FROM DebtMapping DM
-    JOIN People P1 ON DM.owed_by = P1.person_id
-    JOIN People P2 ON DM.owed_to = P2.person_id
-    JOIN OriginOfOwedMoney OOM ON DM.origin_id = OOM.origin_id
-    JOIN Items ON OOM.item_id = Items.item_id;
-    """)
-
-    debt_details = [
-        {"origin_id": row[0], "owed_by": row[1], "owed_to": row[2], "item_name": row[3], "amount": row[4]}
-        for row in cursor.fetchall()
-    ]
-
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        SELECT 
+            DM.origin_id,
+            P1.first_name || ' ' || P1.last_name AS owed_by,
+            P2.first_name || ' ' || P2.last_name AS owed_to,
+            Items.item_name,
+            DM.amount_cents
+        FROM DebtMapping DM
+        JOIN People P1 ON DM.owed_by = P1.person_id
+        JOIN People P2 ON DM.owed_to = P2.person_id
+        JOIN OriginOfOwedMoney OOM ON DM.origin_id = OOM.origin_id
+        JOIN Items ON OOM.item_id = Items.item_id;
+        """)
+
+        debt_details = [
+            {"origin_id": row[0], "owed_by": row[1], "owed_to": row[2], "item_name": row[3], "amount": Money(row[4])}
+            for row in cursor.fetchall()
+        ]
+
     return debt_details
 
-def get_items() -> List[Dict[str, Union[int, str, float]]]:
+@instrument
+@cached
+def get_items() -> List[Dict[str, Union[int, str, Money]]]:
     """
     Gets all items from the database and returns a list of dictionaries with their details
-    Returns: list of dictionaries which include the item_id (int), the name of the item (str), and the default cost (float).
+    Returns: list of dictionaries which include the item_id (int), the name of the item (str), and the default cost (Money).
     
     Time complexity: O(m) where m is the total number of items
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("SELECT item_id, item_name, default_cost FROM Items;")
-    items = [
-        {"item_id": row[0], "item_name": row[1], "default_cost": row[2] or 0.0}
-        for row in cursor.fetchall()
-    ]
+        cursor.execute("SELECT item_id, item_name, default_cost_cents FROM Items;")
+        items = [
+            {"item_id": row[0], "item_name": row[1], "default_cost": Money(row[2] or 0)}
+            for row in cursor.fetchall()
+        ]
 
-    conn.close()
     return items
 
-def get_item_cost(item_id: int) -> Optional[float]:
+@instrument
+@cached
+def get_item_cost(item_id: int) -> Optional[Money]:
     """
     Gets the cost of an item from the database based on its item_id
     
@@ -355,116 +736,157 @@ def get_item_cost(item_id: int) -> Optional[float]:
         item_id (int): The ID of the item to fetch the cost for
 
     Returns:
-        float: The cost of the item if it exists, or None
+        Money: The cost of the item if it exists, or None
     
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("SELECT default_cost FROM Items WHERE item_id = ?;", (item_id,))
-    result = cursor.fetchone()
-    
-    conn.close()
+        cursor.execute("SELECT default_cost_cents FROM Items WHERE item_id = ?;", (item_id,))
+        result = cursor.fetchone()
 
     if result:
-        return result[0] or 0.0  # defaults to 0 if does not exist
+        return Money(result[0] or 0)  # defaults to 0 if does not exist
+
     return None  # Item not found
 
-def get_unresolved_debts_with_details() -> List[Tuple[int, str, str, str, float]]:
+@instrument
+@cached
+def get_unresolved_debts_with_details() -> List[Tuple[int, str, str, str, Money]]:
     """
     Retrieves all unresolved debts with full details from the database.
 
     Returns:
-        List[Tuple[int, str, str, str, float]]: A list of tuples where each tuple represents:
+        List[Tuple[int, str, str, str, Money]]: A list of tuples where each tuple represents:
             - origin_id (int): the id of the debt origin
             - owed_by_name (str): full name of debtor
             - owed_to_name (str): full name of person who is owed money
             - item_name (str): name of the item associated with the debt
-            - amount (float): the amount owed
+            - amount (Money): the amount owed
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # finds the full name of people, the item the debt is over, the actual debt, and the id of the debt.
+        cursor.execute("""
+            SELECT 
+                dm.origin_id,
+                owed_by.first_name || ' ' || owed_by.last_name AS owed_by_name,
+                owed_to.first_name || ' ' || owed_to.last_name AS owed_to_name,
+                it.item_name,
+                dm.amount_cents
+            FROM DebtMapping dm
+            JOIN People owed_by ON dm.owed_by = owed_by.person_id
+            JOIN People owed_to ON dm.owed_to = owed_to.person_id
+            JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
+            JOIN Items it ON oom.item_id = it.item_id
+            WHERE dm.settled = 0;
+        """)
+        unresolved_debts = [(origin_id, owed_by, owed_to, item_name, Money(cents))
+                            for origin_id, owed_by, owed_to, item_name, cents in cursor.fetchall()]
 
-    # finds the full name of people, the item the debt is over, the actual debt, and the id of the debt.
-    cursor.execute("""
-        SELECT 
-            dm.origin_id,
-            owed_by.first_name || ' ' || owed_by.last_name AS owed_by_name,
-            owed_to.first_name || ' ' || owed_to.last_name AS owed_to_name,
-            it.item_name,
-            dm.amount
-        FROM DebtMapping dm
-        JOIN People owed_by ON dm.owed_by = owed_by.person_id
-        JOIN People owed_to ON dm.owed_to = owed_to.person_id
-        JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
-        JOIN Items it ON oom.item_id = it.item_id
-        WHERE dm.amount > 0;  -- Assuming unresolved debts have an amount greater than 0
-    """)
-    unresolved_debts = cursor.fetchall()
-
-    conn.close()
     return unresolved_debts
 
-def get_needs_to_be_purchased() -> list[tuple[int, str, float]]:
+@instrument
+@cached
+def get_needs_to_be_purchased() -> list[tuple[int, str, Money]]:
     """
     Gets the household needs that need to be purchased.
     
     Args: None
 
     Returns:
-        list[tuple[int, str, float]]: A list of tuples containing:
+        list[tuple[int, str, Money]]: A list of tuples containing:
             - need_id (int): id associated with the household needed item
             - item_name (str): the item needed
-            - budget (float): the approximate budget of the item
+            - budget (Money): the approximate budget of the item
     
     Time complexity: O(h) where h is the number of needs in the database
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT 
+                HouseholdNeeds.need_id, 
+                Items.item_name, 
+                HouseholdNeeds.budget_cents
+            FROM HouseholdNeeds
+            JOIN Items ON HouseholdNeeds.item_id = Items.item_id
+            WHERE HouseholdNeeds.is_purchased = 0;
+        """)
+
+        needs = [(need_id, item_name, Money(cents)) for need_id, item_name, cents in cursor.fetchall()]
 
-    cursor.execute("""
-        SELECT 
-            HouseholdNeeds.need_id, 
-            Items.item_name, 
-            HouseholdNeeds.budget
-        FROM HouseholdNeeds
-        JOIN Items ON HouseholdNeeds.item_id = Items.item_id
-        WHERE HouseholdNeeds.is_purchased = 0;
-    """)
-
-    needs = cursor.fetchall()
-    conn.close()
     return needs
 
-def get_total_owed_per_person() -> list[tuple[str, float]]:
+@instrument
+@cached
+def get_total_owed_per_person() -> list[tuple[str, Money]]:
     """
     Retrieves the total amount owed by each person.
 
     Returns:
-        list[tuple[str, float]]: A list of tuples containing:
+        list[tuple[str, Money]]: A list of tuples containing:
             - Person's full name.
             - Total amount owed.
     
-    Time complexity: O(p) where p is the number of debts a singular person the user has selected owes
+    Time complexity: O(n) where n is the number of people who owe money
+        The totals are kept up to date in OwedMoney by triggers, so no debts are summed here.
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT 
+                p.first_name || ' ' || p.last_name AS full_name,
+                om.total_cents
+            FROM OwedMoney om
+            JOIN People p ON om.person_id = p.person_id
+            ORDER BY om.person_id;
+        """)
+
+        total_owed = [(full_name, Money(cents)) for full_name, cents in cursor.fetchall()]
 
-    cursor.execute("""
-        SELECT 
-            p.first_name || ' ' || p.last_name AS full_name,
-            SUM(dm.amount) AS total_owed
-        FROM DebtMapping dm
-        JOIN People p ON dm.owed_by = p.person_id
-        GROUP BY dm.owed_by;
-    """)
-
-    total_owed = cursor.fetchall()
-    conn.close()
     return total_owed
 
-def get_household_needs(is_purchased: int) -> list[tuple[str, float]]:
+@instrument
+@cached
+def get_pairwise_balances() -> list[tuple[str, str, Money]]:
+    """
+    Retrieves how much each person owes each other person, summed over all their debts.
+
+    Returns:
+        list[tuple[str, str, Money]]: A list of tuples containing:
+            - Full name of the person who owes.
+            - Full name of the person who is owed.
+            - Total amount owed between them.
+
+    Time complexity: O(b) where b is the number of pairs of people with a debt between them
+        Kept up to date in PairwiseBalances by triggers.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT 
+                owed_by.first_name || ' ' || owed_by.last_name AS owed_by_name,
+                owed_to.first_name || ' ' || owed_to.last_name AS owed_to_name,
+                pb.total_cents
+            FROM PairwiseBalances pb
+            JOIN People owed_by ON pb.owed_by = owed_by.person_id
+            JOIN People owed_to ON pb.owed_to = owed_to.person_id
+            ORDER BY pb.owed_by, pb.owed_to;
+        """)
+
+        balances = [(owed_by, owed_to, Money(cents)) for owed_by, owed_to, cents in cursor.fetchall()]
+
+    return balances
+
+@instrument
+@cached
+def get_household_needs(is_purchased: int) -> list[tuple[str, Money]]:
     """
     Retrieves household needs based on purchase status.
 
@@ -472,51 +894,357 @@ def get_household_needs(is_purchased: int) -> list[tuple[str, float]]:
         is_purchased (int): The purchase status (0 for not purchased, 1 for purchased).
 
     Returns:
-        list[tuple[str, float]]: A list of tuples containing:
+        list[tuple[str, Money]]: A list of tuples containing:
             - Item name.
             - Budget for the item.
     
     Time complexity: O(h) where h is the total number of needs in the house
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(f"""
+            SELECT 
+                i.item_name,
+                hn.budget_cents
+            FROM HouseholdNeeds hn
+            JOIN Items i ON hn.item_id = i.item_id
+            WHERE hn.is_purchased = {int(is_purchased)};
+        """)  # literal rather than ? so the partial indexes on is_purchased can be used
+
+        needs = [(item_name, Money(cents)) for item_name, cents in cursor.fetchall()]
 
-    cursor.execute("""
-        SELECT 
-            i.item_name,
-            hn.budget
-        FROM HouseholdNeeds hn
-        JOIN Items i ON hn.item_id = i.item_id
-        WHERE hn.is_purchased = ?;
-    """, (is_purchased,))
-
-    needs = cursor.fetchall()
-    conn.close()
     return needs
 
+@instrument
+@cached
+def get_debt_version(debt_id: int) -> Optional[int]:
+    """
+    Gets a debt's version, which goes up every time it is changed. Pass it back to settle_debt or delete_debt as
+    expected_version to make sure nobody else has changed the debt in between.
+
+    Returns:
+        int: the version, or None if there is no such debt
+
+    Time complexity: O(1)
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT version FROM OriginOfOwedMoney WHERE origin_id = ?;", (debt_id,)).fetchone()
+
+    return row[0] if row else None
+
+@instrument
+@cached
+def get_need_version(need_id: int) -> Optional[int]:
+    """
+    Gets a household need's version, which goes up every time it is changed. Pass it back to set_need_as_purchased
+    as expected_version to make sure nobody else has changed the need in between.
+
+    Returns:
+        int: the version, or None if there is no such need
+
+    Time complexity: O(1)
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT version FROM HouseholdNeeds WHERE need_id = ?;", (need_id,)).fetchone()
+
+    return row[0] if row else None
+
+
+@instrument
+@cached
+def get_monthly_spending(person_id: Optional[int] = None) -> list[tuple[str, Money]]:
+    """
+    What was spent each month (what every purchase cost, whether its debts are open, settled or archived, by its purchase date).
+    Read from the MonthlySpending rollup, so it costs the same however long the history is.
+
+    Args:
+        person_id (int, optional): only what this person paid for. Defaults to everyone.
+
+    Returns:
+        list[tuple[str, Money]]: (YYYY-MM, amount spent) for every month with any spending or budget, oldest first
+
+    Time complexity: O(s) where s is the number of MonthlySpending rows
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT month, SUM(CASE WHEN ? IS NULL OR person_id = ? THEN spent_cents ELSE 0 END) FROM MonthlySpending
+            GROUP BY month
+            ORDER BY month;
+        """, (person_id, person_id)).fetchall()
+
+    return [(month, Money(cents)) for month, cents in rows]
+
+@instrument
+@cached
+def get_budget_vs_actual() -> list[tuple[str, Money, Money]]:
+    """
+    What was budgeted for the household needs bought each month against what was actually spent, from the MonthlySpending rollup.
+
+    Returns:
+        list[tuple[str, Money, Money]]: (YYYY-MM, budgeted, spent) for every month with either, oldest first
+
+    Time complexity: O(s) where s is the number of MonthlySpending rows
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT month, SUM(budgeted_cents), SUM(spent_cents) FROM MonthlySpending
+            GROUP BY month
+            ORDER BY month;
+        """).fetchall()
+
+    return [(month, Money(budgeted), Money(spent)) for month, budgeted, spent in rows]
+
+
+############################ PAGINATED GETTERS #######################################
+# keyset pagination: each page starts after the last key of the one before (WHERE key > ? ORDER BY key LIMIT n)
+# rather than using OFFSET, so page 1000 is as quick as page 1 and only one page is ever held in memory.
+# each returns a list of (key, row) pairs, where the key is what the next page should start after.
+
+def like_pattern(text: str) -> str:
+    """
+    The LIKE pattern for text appearing anywhere in a column. The text's own %, _ and backslashes are escaped
+    with a backslash so they only match themselves, e.g. "50%" doesn't find everything containing "50".
+    Goes with ESCAPE '\\' on the LIKE.
+
+    Time complexity: O(n) where n is the length of the text
+    """
+    return "%" + re.sub(r"([\\%_])", r"\\\1", text) + "%"
+
+def _searches_index(search: Optional[str]) -> bool:
+    """
+    Whether a search can be looked up in a search index from migration 9. Text shorter than three characters has no
+    trigram to look up, and the index isn't used for a LIKE with an ESCAPE, which text with a %, _ or backslash in it
+    needs (without one there's nothing to escape, so the pattern is the same).
+
+    Time complexity: O(n) where n is the length of the text
+    """
+    return bool(search) and len(search) >= 3 and like_pattern(search) == f"%{search}%"
+
+def _search_filter(key: str, index: str, column: str, search: Optional[str]) -> str:
+    """
+    The condition a paged listing adds to its WHERE for a search (the text goes in as :pattern, from like_pattern).
+    Text that can be (see _searches_index) is looked up in the index, only as far as the page reaches in id order.
+    Otherwise the rows themselves are LIKE'd.
+
+    Time complexity: O(1)
+    """
+    if not search:
+        return ""
+    if not _searches_index(search):
+        return f"AND {column} LIKE :pattern ESCAPE '\\'"
+    return f"AND {key} IN (SELECT rowid FROM {index} WHERE {column} LIKE :pattern AND rowid > :after ORDER BY rowid LIMIT :limit)"
+
+def _search_page(conn, query: str, key: str, index: str, column: str, search: Optional[str], after: int, limit: int) -> list:
+    """
+    Runs a paged listing's query with its search condition (see _search_filter) where the query has {search}.
+    The index has to collect every row text is in before it can hand over the first few in id order, which for
+    common text costs more than LIKE'ing rows in id order until the page is full. So the next search_window ids
+    are LIKE'd first: if they fill the page that's the page, and if not the index carries on after them.
+
+    Time complexity: O(w + l) where w is search_window and l the limit, plus the index lookup if the window
+        doesn't fill the page
+    """
+    params = {"after": after, "limit": limit, "pattern": like_pattern(search or "")}
+    if not _searches_index(search):
+        return conn.execute(query.format(search=_search_filter(key, index, column, search)), params).fetchall()
+
+    rows = conn.execute(query.format(search=f"AND {key} <= :until AND {column} LIKE :pattern"),
+                        {**params, "until": after + search_window}).fetchall()
+    if len(rows) == limit:
+        return rows
+    return rows + conn.execute(query.format(search=_search_filter(key, index, column, search)),
+                               {**params, "after": after + search_window, "limit": limit - len(rows)}).fetchall()
+
+@instrument
+@cached
+def get_people_page(after: int = 0, limit: int = page_size, search: Optional[str] = None) -> List[Tuple[int, Tuple[int, str]]]:
+    """
+    Gets one page of people, optionally only those whose name contains the search text.
+
+    Returns:
+        list of (person_id, (person_id, full_name))
+
+    Time complexity: O(l) where l is the limit. A search of three or more characters goes through PeopleSearch (see _search_page)
+    """
+    with get_connection() as conn:
+        rows = _search_page(conn, """
+            SELECT person_id, first_name || ' ' || last_name AS full_name
+            FROM People
+            WHERE person_id > :after {search}
+            ORDER BY person_id
+            LIMIT :limit;
+        """, "person_id", "PeopleSearch", "full_name", search, after, limit)
+
+    return [(row[0], row) for row in rows]
+
+@instrument
+@cached
+def get_items_page(after: int = 0, limit: int = page_size, search: Optional[str] = None) -> List[Tuple[int, Tuple[int, str, Optional[Money]]]]:
+    """
+    Gets one page of items, optionally only those whose name contains the search text.
+
+    Returns:
+        list of (item_id, (item_id, item_name, default_cost))
+
+    Time complexity: O(l) where l is the limit. A search of three or more characters goes through ItemSearch (see _search_page)
+    """
+    with get_connection() as conn:
+        rows = _search_page(conn, """
+            SELECT item_id, item_name, default_cost_cents
+            FROM Items
+            WHERE item_id > :after {search}
+            ORDER BY item_id
+            LIMIT :limit;
+        """, "item_id", "ItemSearch", "item_name", search, after, limit)
+
+    return [(item_id, (item_id, item_name, money_or_none(cents))) for item_id, item_name, cents in rows]
+
+@instrument
+@cached
+def get_unresolved_debts_page(after: int = 0, limit: int = page_size, search: Optional[str] = None) -> List[Tuple[int, Tuple[int, str, str, str, Money]]]:
+    """
+    Gets one page of unresolved debts, optionally only those where either person's name or the item contains the search text.
+    Pages by DebtMapping's rowid, since one purchase (origin_id) isn't guaranteed to map to only one debt.
+
+    Returns:
+        list of (rowid, (origin_id, owed_by_name, owed_to_name, item_name, amount)), same rows as get_unresolved_debts_with_details
+
+    Time complexity: O(l) where l is the limit (more if a search skips over lots of non-matching debts)
+    """
+    search_filter = "AND (owed_by_name LIKE :pattern ESCAPE '\\' OR owed_to_name LIKE :pattern ESCAPE '\\' OR it.item_name LIKE :pattern ESCAPE '\\')" if search else ""
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT 
+                dm.rowid,
+                dm.origin_id,
+                owed_by.first_name || ' ' || owed_by.last_name AS owed_by_name,
+                owed_to.first_name || ' ' || owed_to.last_name AS owed_to_name,
+                it.item_name,
+                dm.amount_cents
+            FROM DebtMapping dm
+            JOIN People owed_by ON dm.owed_by = owed_by.person_id
+            JOIN People owed_to ON dm.owed_to = owed_to.person_id
+            JOIN OriginOfOwedMoney oom ON dm.origin_id = oom.origin_id
+            JOIN Items it ON oom.item_id = it.item_id
+            WHERE dm.rowid > :after AND dm.settled = 0
+                {search_filter}
+            ORDER BY dm.rowid
+            LIMIT :limit;
+        """, {"after": after, "limit": limit, "pattern": like_pattern(search or "")}).fetchall()
+
+    return [(rowid, (origin_id, owed_by, owed_to, item_name, Money(cents))) for rowid, origin_id, owed_by, owed_to, item_name, cents in rows]
+
+@instrument
+@cached
+def get_needs_to_be_purchased_page(after: int = 0, limit: int = page_size, search: Optional[str] = None) -> List[Tuple[int, Tuple[int, str, Money]]]:
+    """
+    Gets one page of household needs that still need to be purchased, optionally only those whose item contains the search text.
+
+    Returns:
+        list of (need_id, (need_id, item_name, budget)), same rows as get_needs_to_be_purchased
+
+    Time complexity: O(l) where l is the limit (more if a search skips over lots of non-matching needs)
+    """
+    search_filter = "AND Items.item_name LIKE :pattern ESCAPE '\\'" if search else ""
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT 
+                HouseholdNeeds.need_id, 
+                Items.item_name, 
+                HouseholdNeeds.budget_cents
+            FROM HouseholdNeeds
+            JOIN Items ON HouseholdNeeds.item_id = Items.item_id
+            WHERE HouseholdNeeds.need_id > :after AND HouseholdNeeds.is_purchased = 0
+                {search_filter}
+            ORDER BY HouseholdNeeds.need_id
+            LIMIT :limit;
+        """, {"after": after, "limit": limit, "pattern": like_pattern(search or "")}).fetchall()
+
+    return [(need_id, (need_id, item_name, Money(cents))) for need_id, item_name, cents in rows]
+
+def iterate_pages(fetch_page: Callable[..., List[Tuple[int, tuple]]], search: Optional[str] = None, batch_size: int = 1000) -> Iterator[tuple]:
+    """
+    Generator that yields every row a *_page getter can return, fetching batch_size rows at a time.
+    Use this instead of the get_* functions that return lists when you need to go through everything
+    but don't want the whole table in memory.
+
+    Usage:
+        for origin_id, owed_by, owed_to, item, amount in iterate_pages(get_unresolved_debts_page):
+            ...
+
+    Time complexity: O(r) where r is the number of rows, with O(batch_size) memory
+    """
+    after = 0
+    while True:
+        page = fetch_page(after=after, limit=batch_size, search=search)
+        for _, row in page:
+            yield row
+        if len(page) < batch_size:
+            return
+        after = page[-1][0]
 
 ############################### SETTERS FOR DATABASE ##########################
 
-def set_need_as_purchased(need_id: int) -> None:
+@instrument
+def set_need_as_purchased(need_id: int, expected_version: Optional[int] = None) -> bool:
     """
     Sets a household need as purchased by updating its is_purchased state to 1.
+    Only a need that is still unpurchased is changed, so when two people mark the same need at once exactly one of them
+    gets True back and the other finds out it has already been bought.
 
     Args:
         need_id (int): id associated with the household needed item
+        expected_version (int, optional): only mark it if it hasn't changed since it was read at this version
 
     Returns:
-        None
-    
+        bool: whether it was marked (False if it doesn't exist or was already purchased)
+
+    Raises:
+        ConflictError: if expected_version was given and someone else has changed or deleted the need since
+
     Time complexity: O(1)
     """
-    conn = sqlite3.connect("sharehouse.db")
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            UPDATE HouseholdNeeds
+            SET is_purchased = 1, version = version + 1
+            WHERE need_id = :id AND is_purchased = 0 AND (:version IS NULL OR version = :version);
+        """, {"id": need_id, "version": expected_version})
+        if cursor.rowcount == 0:
+            _check_version(conn, "HouseholdNeeds", "need_id", need_id, expected_version, "Household need")
+            return False
+
+    return True
+
+@instrument
+def apply_settlement_plan(plan: List[Tuple[int, int, int]]) -> int:
+    """
+    Records that every transfer in a settlement plan has been paid, which settles every unresolved debt at once.
+    That includes debts that cancel each other out, which an empty plan (nobody has to pay anything) settles too.
+    Runs as one transaction, and first checks the plan still settles the current balances, so a debt added
+    after the plan was made can't be settled by accident.
+    The debts are marked settled rather than deleted, so they stay in the history (see archive_settled_debts).
+
+    Args:
+        plan (List[Tuple[int, int, int]]): (payer id, payee id, cents) transfers from settlement.plan_settlement
+
+    Returns:
+        int: the number of debts that were settled
+
+    Time complexity: O(b+d) where b is the number of owing pairs and d is the number of debts
+    """
+    with transaction() as conn:  # holds the write lock, so nobody can add a debt between the check and the update
+
+        if not plan_settles(plan, get_net_balances()):
+            raise ValueError("The balances have changed since this settlement plan was made. Please make a new one.")
 
-    cursor.execute("""
-        UPDATE HouseholdNeeds
-        SET is_purchased = 1
-        WHERE need_id = ?;
-    """, (need_id,))
+        conn.execute("""
+            UPDATE OriginOfOwedMoney SET version = version + 1
+            WHERE origin_id IN (SELECT origin_id FROM DebtMapping WHERE settled = 0);
+        """)
+        cursor = conn.execute("UPDATE DebtMapping SET settled = 1, settled_at = ? WHERE settled = 0;", (_utc_timestamp(),))
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    return cursor.rowcount
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Graphs and tables for visualising the household data.
+Kept separate from actions.py so matplotlib (which is slow to import) is only loaded when something is actually drawn.
+
+Every chart and table is drawn onto a figure passed in, so the same drawing code serves both the on-screen windows here
+and the off-screen report files in reports.py.
+"""
+from typing import List, Tuple
+
+from matplotlib.figure import Figure
+
+from constants import table_rows_per_page
+from money import Money
+
+
+############################ DRAWING #######################################
+def draw_total_owed(figure: Figure, total_owed: list[tuple[str, Money]]) -> None:
+    """
+    Draws a bar chart for the total amount owed by each person onto a figure.
+
+    Args:
+        figure (Figure): the figure to draw on
+        total_owed (list[tuple[str, Money]]): A list of tuples containing person's full name and amount owed.
+
+    Time complexity: O(n) where n is the number of total people in the sharehouse
+    """
+    names = [entry[0] for entry in total_owed]
+    amounts = [entry[1].dollars for entry in total_owed]
+
+    axes = figure.add_subplot()
+    axes.bar(names, amounts, color='skyblue')
+    axes.set_title('Total Amount Owed by Each Person')
+    axes.set_xlabel('Person')
+    axes.set_ylabel('Total Owed ($)')
+    axes.tick_params(axis='x', labelrotation=45)
+    for label in axes.get_xticklabels():
+        label.set_horizontalalignment('right')
+    figure.tight_layout()
+
+def draw_spending_over_time(figure: Figure, monthly_spending: list[tuple[str, Money]]) -> None:
+    """
+    Draws a line chart of how much was spent each month onto a figure.
+
+    Args:
+        figure (Figure): the figure to draw on
+        monthly_spending (list[tuple[str, Money]]): (YYYY-MM, amount spent) for each month, oldest first
+
+    Time complexity: O(k) where k is the number of months
+    """
+    months = [entry[0] for entry in monthly_spending]
+    amounts = [entry[1].dollars for entry in monthly_spending]
+
+    axes = figure.add_subplot()
+    axes.plot(range(len(months)), amounts, marker='o', color='seagreen')
+    axes.set_title('Spending Over Time')
+    axes.set_xlabel('Month')
+    axes.set_ylabel('Spent ($)')
+    _thin_month_labels(axes, months)
+    figure.tight_layout()
+
+def draw_budget_vs_actual(figure: Figure, budget_vs_actual: list[tuple[str, Money, Money]]) -> None:
+    """
+    Draws side by side bars of what was budgeted for household needs and what was actually spent each month onto a figure.
+
+    Args:
+        figure (Figure): the figure to draw on
+        budget_vs_actual (list[tuple[str, Money, Money]]): (YYYY-MM, budgeted, spent) for each month, oldest first
+
+    Time complexity: O(k) where k is the number of months
+    """
+    months = [entry[0] for entry in budget_vs_actual]
+    positions = range(len(months))
+    width = 0.4
+
+    axes = figure.add_subplot()
+    axes.bar([position - width / 2 for position in positions], [entry[1].dollars for entry in budget_vs_actual], width, label='Budgeted', color='lightgray')
+    axes.bar([position + width / 2 for position in positions], [entry[2].dollars for entry in budget_vs_actual], width, label='Spent', color='skyblue')
+    axes.set_title('Budget vs Actual Spending')
+    axes.set_xlabel('Month')
+    axes.set_ylabel('Amount ($)')
+    axes.legend()
+    _thin_month_labels(axes, months)
+    figure.tight_layout()
+
+def _thin_month_labels(axes, months: list[str], most: int = 24) -> None:
+    """
+    Labels the x axis with the months (drawn at 0, 1, 2...), only labelling every few months once there are
+    more than `most` of them so years of history don't overlap.
+
+    Time complexity: O(k) where k is the number of months
+    """
+    step = max(1, -(-len(months) // most))
+    ticks = list(range(0, len(months), step))
+    axes.set_xticks(ticks, [months[tick] for tick in ticks], rotation=45, horizontalalignment='right')
+
+def paginate_needs(needs: list[tuple[str, Money]], rows_per_page: int = table_rows_per_page) -> List[list[tuple[str, Money]]]:
+    """
+    Splits the needs into pages of at most rows_per_page rows. There is always at least one (possibly empty) page.
+
+    Time complexity: O(h) where h is the total number of household needs
+    """
+    return [needs[start:start + rows_per_page] for start in range(0, len(needs), rows_per_page)] or [[]]
+
+def page_title(title: str, page: int, pages: int) -> str:
+    """
+    The title for one page of a table, e.g. "Purchased Household Needs (page 2 of 5)".
+
+    Time complexity: O(1)
+    """
+    return title if pages == 1 else f"{title} (page {page} of {pages})"
+
+def draw_needs_table(figure: Figure, rows: list[tuple[str, Money]], title: str, total_budget: Money) -> None:
+    """
+    Draws one page of a household needs table onto a figure, with the total budget of every page at the bottom.
+    The figure should be sized with needs_table_size so the rows fit.
+
+    Args:
+        figure (Figure): the figure to draw on
+        rows (list[tuple[str, Money]]): the item names and budgets on this page
+        title (str): Title for the table.
+        total_budget (Money): the budget of every need in the table, not just this page
+
+    Time complexity: O(r) where r is the number of rows on the page
+    """
+    # collecting data
+    headers = ["Item Name", "Budget ($)"]
+    table_data = [[entry[0], f"${entry[1]:.2f}"] for entry in rows]
+
+    # creating table
+    axes = figure.add_subplot()
+    axes.axis("off")  # Remove axes
+    axes.set_title(title, fontsize=14, weight='bold')
+
+    # adding data to table
+    table = axes.table(
+        cellText=table_data + [["Total", f"${total_budget:.2f}"]],
+        colLabels=headers,
+        loc="center",
+        cellLoc="center",
+        colLoc="center"
+    )
+
+    # formatting
+    table.auto_set_font_size(False)
+    table.set_fontsize(12)
+    table.auto_set_column_width(col=list(range(len(headers))))
+
+def needs_table_size(rows: int) -> Tuple[float, float]:
+    """
+    Figure size in inches for a table page with this many rows (plus the header and total rows).
+    Pages never hold more than table_rows_per_page rows, so this stays a sensible size however many needs there are.
+
+    Time complexity: O(1)
+    """
+    return (6, min(rows, table_rows_per_page) * 0.35 + 1.5)
+
+
+############################ SHOWING ON SCREEN #######################################
+def plot_total_owed(total_owed: list[tuple[str, Money]]) -> None:
+    """
+    A bar chart for the total amount owed by each person in the sharehouse
+
+    Args:
+        total_owed (list[tuple[str, Money]]): A list of tuples containing person's full name and amount owed.
+
+    Time complexity: O(n) where n is the number of total people in the sharehouse
+    """
+    import matplotlib.pyplot as plt
+
+    draw_total_owed(plt.figure(figsize=(8, 6)), total_owed)
+    plt.show()
+
+def plot_spending_over_time(monthly_spending: list[tuple[str, Money]]) -> None:
+    """
+    A line chart of how much was spent each month.
+
+    Time complexity: O(k) where k is the number of months
+    """
+    import matplotlib.pyplot as plt
+
+    draw_spending_over_time(plt.figure(figsize=(10, 6)), monthly_spending)
+    plt.show()
+
+def plot_budget_vs_actual(budget_vs_actual: list[tuple[str, Money, Money]]) -> None:
+    """
+    Bars of what was budgeted against what was spent each month.
+
+    Time complexity: O(k) where k is the number of months
+    """
+    import matplotlib.pyplot as plt
+
+    draw_budget_vs_actual(plt.figure(figsize=(10, 6)), budget_vs_actual)
+    plt.show()
+
+def display_needs_table(needs: list[tuple[str, Money]], title: str) -> None:
+    """
+    Displays a table for household needs and specifically household needs.
+    Long tables are split into pages of table_rows_per_page rows, shown one window after another.
+
+    Args:
+        needs (list[tuple[str, Money]]): A list of tuples containing item names and their budgets.
+        title (str): Title for the table.
+
+    Time complexity: O(h) where h is the total number of household needs
+    """
+    import matplotlib.pyplot as plt
+
+    total_budget = sum((entry[1] for entry in needs), Money(0))
+    pages = paginate_needs(needs)
+    for page, rows in enumerate(pages, start=1):
+        draw_needs_table(plt.figure(figsize=needs_table_size(len(rows))), rows, page_title(title, page, len(pages)), total_budget)
+        plt.show()